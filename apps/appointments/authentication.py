@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare, salted_hmac
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+User = get_user_model()
+
+FEED_KEY_SALT = 'apps.appointments.calendar-feed'
+
+
+def feed_key_max_age():
+    return getattr(settings, 'CALENDAR_FEED_KEY_MAX_AGE', 90 * 24 * 3600)
+
+
+def _fingerprint(user):
+    # Changes with the password hash, so a password change revokes every feed URL.
+    return salted_hmac(FEED_KEY_SALT, user.password).hexdigest()[:16]
+
+
+def calendar_feed_key(user):
+    """
+    Signed key that lets calendar apps fetch the user's feed without a JWT.
+    It expires after ``CALENDAR_FEED_KEY_MAX_AGE`` seconds and when the user's
+    password changes.
+    """
+    return signing.dumps([str(user.pk), _fingerprint(user)], salt=FEED_KEY_SALT)
+
+
+def calendar_feed_key_expiry():
+    """When a key signed now stops working."""
+    return timezone.now() + timedelta(seconds=feed_key_max_age())
+
+
+class CalendarFeedKeyAuthentication(BaseAuthentication):
+    """
+    Authenticates calendar clients by the `?key=` embedded in their feed URL,
+    since calendar apps cannot send Authorization headers.
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get('key')
+        if not key:
+            return None
+        try:
+            user_id, fingerprint = signing.loads(key, salt=FEED_KEY_SALT, max_age=feed_key_max_age())
+            user = User.objects.get(pk=user_id, is_active=True)
+        except (signing.BadSignature, User.DoesNotExist, TypeError, ValueError):
+            # SignatureExpired is a BadSignature; keys signed before fingerprints are not lists.
+            raise AuthenticationFailed("Invalid calendar key.")
+        if not constant_time_compare(fingerprint, _fingerprint(user)):
+            raise AuthenticationFailed("Invalid calendar key.")
+        return (user, None)
@@ -0,0 +1,148 @@
+"""
+In-process availability index used by the booking hot path.
+
+Each (doctor, date) pair is loaded from the database once, then kept in sync
+by the appointment views.  Overlap checks are answered from memory (leave
+checks go to the unavailability calendar in ``unavailability.py``):
+confirmed slots of a day are kept sorted by start time and never overlap each
+other, so a single binary search finds the only slot that can collide with a
+requested interval.
+"""
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from time import monotonic
+
+from django.conf import settings
+
+from .models import Appointment
+from .unavailability import unavailability
+
+
+class DayAvailability:
+    """Confirmed slots of one doctor on one date."""
+
+    __slots__ = ('starts', 'slots', 'loaded_at')
+
+    def __init__(self):
+        self.starts = []  # Start times, kept parallel to ``slots`` for bisect
+        self.slots = []   # (start_time, end_time, appointment_id), sorted by start
+        self.loaded_at = monotonic()
+
+    def add(self, start, end, appointment_id):
+        i = bisect_left(self.starts, start)
+        self.starts.insert(i, start)
+        self.slots.insert(i, (start, end, appointment_id))
+
+    def remove(self, start, appointment_id):
+        i = bisect_left(self.starts, start)
+        while i < len(self.slots) and self.starts[i] == start:
+            if self.slots[i][2] == appointment_id:
+                del self.starts[i]
+                del self.slots[i]
+                return
+            i += 1
+
+    def overlaps(self, start, end, exclude=None):
+        # Slots starting before `end` are slots[:i]; since they are disjoint
+        # and sorted, the latest of them is the only one that can reach past `start`.
+        i = bisect_left(self.starts, end)
+        while i:
+            i -= 1
+            slot_start, slot_end, appointment_id = self.slots[i]
+            if appointment_id == exclude:
+                continue
+            return slot_end > start
+        return False
+
+
+class AvailabilityIndex:
+    """
+    Bounded LRU of ``DayAvailability`` entries keyed by (doctor_id, date).
+
+    Entries older than ``APPOINTMENT_INDEX_TTL`` seconds are reloaded so that
+    writes made outside the appointment views (admin, other processes) are
+    picked up eventually.
+    """
+
+    def __init__(self, max_days=None, ttl=None):
+        self.max_days = max_days or getattr(settings, 'APPOINTMENT_INDEX_MAX_DAYS', 10000)
+        self.ttl = ttl or getattr(settings, 'APPOINTMENT_INDEX_TTL', 300)
+        self._lock = threading.Lock()
+        self._days = OrderedDict()
+        self._locations = {}  # appointment_id -> (key, start_time)
+        self._generation = 0
+
+    def _load(self, key):
+        doctor_id, date = key
+        day = DayAvailability()
+        for start, end, appointment_id in Appointment.objects.filter(
+            doctor_id=doctor_id, date=date, status='confirmed'
+        ).values_list('start_time', 'end_time', 'id'):
+            day.add(start, end, appointment_id)
+        return day
+
+    def _day(self, doctor_id, date):
+        key = (doctor_id, date)
+        with self._lock:
+            day = self._days.get(key)
+            if day is not None and monotonic() - day.loaded_at < self.ttl:
+                self._days.move_to_end(key)
+                return day
+            generation = self._generation
+
+        day = self._load(key)
+
+        with self._lock:
+            # A write landed while we were reading; serve this result but do not cache it.
+            if generation != self._generation:
+                return day
+            self._evict(key)
+            self._days[key] = day
+            for start, end, appointment_id in day.slots:
+                self._locations[appointment_id] = (key, start)
+            while len(self._days) > self.max_days:
+                self._evict(next(iter(self._days)))
+            return day
+
+    def _evict(self, key):
+        day = self._days.pop(key, None)
+        if day is not None:
+            for slot in day.slots:
+                self._locations.pop(slot[2], None)
+
+    def is_on_leave(self, doctor_id, date):
+        return unavailability.is_unavailable(doctor_id, date)
+
+    def has_conflict(self, doctor_id, date, start_time, end_time, exclude=None):
+        day = self._day(doctor_id, date)
+        with self._lock:
+            return day.overlaps(start_time, end_time, exclude=exclude)
+
+    def sync(self, appointment):
+        """Reflect a saved appointment (created, moved, confirmed or cancelled)."""
+        with self._lock:
+            self._generation += 1
+            location = self._locations.pop(appointment.pk, None)
+            if location is not None:
+                key, start = location
+                day = self._days.get(key)
+                if day is not None:
+                    day.remove(start, appointment.pk)
+
+            if appointment.status != 'confirmed':
+                return
+            key = (appointment.doctor_id, appointment.date)
+            day = self._days.get(key)
+            if day is not None:
+                day.add(appointment.start_time, appointment.end_time, appointment.pk)
+                self._locations[appointment.pk] = (key, appointment.start_time)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._days.clear()
+            self._locations.clear()
+
+
+availability_index = AvailabilityIndex()
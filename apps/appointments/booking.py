@@ -0,0 +1,257 @@
+"""
+Race-free appointment booking.
+
+Overlap checks and inserts for a (doctor, date) pair are serialized twice:
+inside the process by one of a fixed set of striped locks, and across
+processes by an UPDATE on that pair's ``DoctorDay`` row, which holds a row
+lock (or SQLite's write lock) until the transaction commits.  Bookings for
+other doctors or dates never wait on each other's locks.  Slot holds of other
+patients are checked under the same locks, so a hold placed while a booking
+runs is either seen by it or placed after it.
+
+The same row carries the day's ``booked`` counter.  Every write that adds an
+appointment to a day, cancels one or moves one between days adjusts it in
+its own transaction, and a booking is refused once the counter reaches the
+doctor's ``max_patients_per_day``.
+"""
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from apps.doctors.models import Doctor
+from .availability import DayAvailability
+from .holds import HELD_MESSAGE, get_hold_store
+from .models import Appointment, DoctorDay
+from .unavailability import unavailable_days
+
+LOCK_STRIPES = getattr(settings, 'APPOINTMENT_BOOKING_LOCK_STRIPES', 256)
+
+_stripes = [threading.Lock() for _ in range(LOCK_STRIPES)]
+
+
+LEAVE_MESSAGE = "The doctor is on leave on the selected date."
+TAKEN_MESSAGE = "This time slot is already booked."
+FULL_MESSAGE = "The doctor is fully booked on the selected date."
+
+# Daily limit of users with the doctor role but no Doctor profile
+UNLIMITED = 2 ** 31 - 1
+
+class SlotUnavailable(Exception):
+    """The requested slot overlaps an existing booking."""
+
+
+def _stripe(doctor_id, date):
+    return hash((str(doctor_id), date)) % LOCK_STRIPES
+
+
+@contextmanager
+def doctor_day_lock(doctor_id, date):
+    """Hold the in-process stripe for (doctor_id, date)."""
+    with _stripes[_stripe(doctor_id, date)]:
+        yield
+
+
+@contextmanager
+def doctor_days_lock(keys):
+    """Hold the stripes of several (doctor_id, date) keys, taken in a fixed order."""
+    stripes = sorted({_stripe(doctor_id, date) for doctor_id, date in keys})
+    for index in stripes:
+        _stripes[index].acquire()
+    try:
+        yield
+    finally:
+        for index in reversed(stripes):
+            _stripes[index].release()
+
+
+def lock_doctor_day(doctor_id, date):
+    """
+    Lock the reservation row of (doctor_id, date) for the current transaction,
+    creating it on first use.
+    """
+    rows = DoctorDay.objects.filter(doctor_id=doctor_id, date=date)
+    if rows.update(version=F('version') + 1):
+        return
+    try:
+        with transaction.atomic():
+            DoctorDay.objects.create(doctor_id=doctor_id, date=date, version=1)
+    except IntegrityError:
+        # Another booker created the row first; wait for its lock instead.
+        rows.update(version=F('version') + 1)
+
+
+def lock_doctor_days(keys):
+    """Lock the reservation rows of several sorted (doctor_id, date) keys."""
+    DoctorDay.objects.bulk_create(
+        [DoctorDay(doctor_id=doctor_id, date=date) for doctor_id, date in keys],
+        ignore_conflicts=True,
+    )
+    for doctor_id, date in keys:
+        DoctorDay.objects.filter(doctor_id=doctor_id, date=date).update(version=F('version') + 1)
+
+
+def daily_limit():
+    """``max_patients_per_day`` of a DoctorDay row's doctor, as an expression."""
+    return Coalesce(
+        Subquery(Doctor.objects.filter(pk=OuterRef('doctor_id')).values('max_patients_per_day')[:1]),
+        Value(UNLIMITED),
+    )
+
+
+def reserve_place(doctor_id, date):
+    """
+    Take one of the doctor's places on a locked day. Returns False, changing
+    nothing, when the daily limit is already reached.
+    """
+    return bool(DoctorDay.objects.filter(
+        doctor_id=doctor_id, date=date, booked__lt=daily_limit()
+    ).update(booked=F('booked') + 1))
+
+
+def release_places(doctor_id, date, count=1):
+    """Give back places on a locked day after appointments were cancelled or moved."""
+    DoctorDay.objects.filter(doctor_id=doctor_id, date=date).update(
+        booked=Greatest(F('booked') - count, Value(0))
+    )
+
+
+def slot_taken(doctor_id, date, start_time, end_time, exclude=None):
+    """
+    Authoritative overlap check; only meaningful while the day is locked.
+    Besides confirmed overlaps, any appointment starting at the same time
+    counts because of the (doctor, date, start_time) unique constraint,
+    which cancelled appointments are exempt from.
+    """
+    clashes = Appointment.objects.filter(doctor_id=doctor_id, date=date).filter(
+        Q(status='confirmed', start_time__lt=end_time, end_time__gt=start_time)
+        | (Q(start_time=start_time) & ~Q(status='cancelled'))
+    )
+    if exclude is not None:
+        clashes = clashes.exclude(pk=exclude)
+    return clashes.exists()
+
+
+def book_appointment(doctor, patient, date, start_time, end_time, **extra):
+    """
+    Create an appointment unless its slot is taken, held by another patient
+    or the doctor's day is full, raising ``SlotUnavailable``.
+    """
+    with doctor_day_lock(doctor.pk, date), transaction.atomic():
+        lock_doctor_day(doctor.pk, date)
+        if slot_taken(doctor.pk, date, start_time, end_time):
+            raise SlotUnavailable(TAKEN_MESSAGE)
+        if get_hold_store().blocking(doctor.pk, date, start_time, end_time, patient.pk):
+            raise SlotUnavailable(HELD_MESSAGE)
+        if extra.get('status', 'pending') in Appointment.BOOKED_STATUSES and not reserve_place(doctor.pk, date):
+            raise SlotUnavailable(FULL_MESSAGE)
+        return Appointment.objects.create(
+            doctor=doctor,
+            patient=patient,
+            date=date,
+            start_time=start_time,
+            end_time=end_time,
+            **extra
+        )
+
+
+def book_appointments(patient, items):
+    """
+    Book several appointments for one patient in a single transaction.
+
+    ``items`` are dicts with ``doctor`` (a User), ``date``, ``start_time`` and
+    ``end_time``.  Every touched doctor-day is locked once, unavailable days,
+    booking counters and existing appointments of all of them are fetched in
+    six queries, and the accepted items are inserted with one
+    ``bulk_create``.  Returns one ``(appointment, error)`` pair per item, in
+    input order.
+    """
+    keys = sorted({(item['doctor'].pk, item['date']) for item in items})
+    if not keys:
+        return []
+
+    with doctor_days_lock(keys), transaction.atomic():
+        lock_doctor_days(keys)
+
+        doctor_ids = {doctor_id for doctor_id, _ in keys}
+        dates = {date for _, date in keys}
+        unavailable = unavailable_days(doctor_ids, min(dates), max(dates))
+        places = {
+            (doctor_id, date): [booked, limit]
+            for doctor_id, date, booked, limit in DoctorDay.objects.filter(
+                doctor_id__in=doctor_ids, date__in=dates
+            ).annotate(limit=daily_limit()).values_list('doctor_id', 'date', 'booked', 'limit')
+        }
+        days = {key: DayAvailability() for key in keys}
+        starts = defaultdict(set)
+        for doctor_id, date, start, end, status, pk in Appointment.objects.filter(
+            doctor_id__in=doctor_ids, date__in=dates
+        ).exclude(status='cancelled').values_list('doctor_id', 'date', 'start_time', 'end_time', 'status', 'id'):
+            key = (doctor_id, date)
+            if key not in days:
+                continue
+            starts[key].add(start)
+            if status == 'confirmed':
+                days[key].add(start, end, pk)
+
+        holds = get_hold_store()
+        results = []
+        accepted = []
+        taken = defaultdict(int)
+        for item in items:
+            key = (item['doctor'].pk, item['date'])
+            if key[1] in unavailable[key[0]]:
+                results.append((None, LEAVE_MESSAGE))
+                continue
+            if item['start_time'] in starts[key] or days[key].overlaps(item['start_time'], item['end_time']):
+                results.append((None, TAKEN_MESSAGE))
+                continue
+            if holds.blocking(*key, item['start_time'], item['end_time'], patient.pk):
+                results.append((None, HELD_MESSAGE))
+                continue
+            appointment = Appointment(patient=patient, **item)
+            if appointment.status in Appointment.BOOKED_STATUSES:
+                if places[key][0] >= places[key][1]:
+                    results.append((None, FULL_MESSAGE))
+                    continue
+                places[key][0] += 1
+                taken[key] += 1
+            starts[key].add(appointment.start_time)
+            if appointment.status == 'confirmed':
+                days[key].add(appointment.start_time, appointment.end_time, appointment.pk)
+            accepted.append(appointment)
+            results.append((appointment, None))
+
+        Appointment.objects.bulk_create(accepted)
+        for (doctor_id, date), count in taken.items():
+            DoctorDay.objects.filter(doctor_id=doctor_id, date=date).update(booked=F('booked') + count)
+    return results
+
+
+def reschedule_appointment(appointment, doctor, date, start_time, end_time):
+    """
+    Move an appointment to another slot, possibly of another doctor or date,
+    raising ``SlotUnavailable`` if that slot is taken or that day is full.
+    """
+    old_key, new_key = (appointment.doctor_id, appointment.date), (doctor.pk, date)
+    keys = sorted({old_key, new_key})
+    with doctor_days_lock(keys), transaction.atomic():
+        lock_doctor_days(keys)
+        if slot_taken(doctor.pk, date, start_time, end_time, exclude=appointment.pk):
+            raise SlotUnavailable(TAKEN_MESSAGE)
+        # Re-read the status under the lock; only places actually held are moved.
+        status = Appointment.objects.filter(pk=appointment.pk).values_list('status', flat=True).first()
+        if new_key != old_key and status in Appointment.BOOKED_STATUSES:
+            if not reserve_place(*new_key):
+                raise SlotUnavailable(FULL_MESSAGE)
+            release_places(*old_key)
+        appointment.doctor = doctor
+        appointment.date = date
+        appointment.start_time = start_time
+        appointment.end_time = end_time
+        appointment.save(update_fields=['doctor', 'date', 'start_time', 'end_time', 'updated_at'])
+    return appointment
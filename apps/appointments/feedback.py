@@ -0,0 +1,27 @@
+"""
+Patient feedback on completed appointments.
+
+The feedback row and the doctor's rating aggregates are written in one
+transaction, so the aggregates always match the feedback table; deletions
+(e.g. in the admin, or by cascade) take the rating back through a signal
+handler in ``signals.py``.  ``reconcile_doctor_ratings`` recounts them
+after writes that bypass both.
+"""
+from django.db import transaction
+
+from apps.doctors.ratings import record_rating
+from .models import Feedback
+
+
+def submit_feedback(appointment, rating, comments=None, anonymous=False):
+    with transaction.atomic():
+        feedback = Feedback.objects.create(
+            appointment=appointment,
+            doctor_id=appointment.doctor_id,
+            patient_id=appointment.patient_id,
+            rating=rating,
+            comments=comments,
+            anonymous=anonymous,
+        )
+        record_rating(appointment.doctor_id, rating)
+    return feedback
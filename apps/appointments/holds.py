@@ -0,0 +1,213 @@
+"""
+Temporary slot holds.
+
+While a patient fills in the booking form, the slot they picked is held for
+a few minutes so other patients cannot book it.  Holds live outside the main
+database in one of two stores, selected by ``SLOT_HOLD_BACKEND``:
+
+* ``local``  - an in-process dictionary; fastest, but only shared by the
+  threads of one process.
+* ``sqlite`` - a small SQLite file (``SLOT_HOLD_SQLITE_PATH``) shared by all
+  worker processes of a host.
+
+Neither store needs a sweeper: expired holds are dropped whenever the day
+they belong to is read, and every new hold first trims all expired ones.
+"""
+import heapq
+import sqlite3
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+
+HELD_MESSAGE = "This time slot is being held by another patient."
+
+Hold = namedtuple('Hold', ['id', 'patient_id', 'doctor_id', 'date', 'start_time', 'end_time', 'expires_at'])
+
+
+def _overlaps(hold, start_time, end_time):
+    return hold.start_time < end_time and hold.end_time > start_time
+
+
+class LocalHoldStore:
+    """Holds kept in this process, indexed by (doctor_id, date)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._days = {}      # (doctor_id, date) -> {hold_id: Hold}
+        self._holds = {}     # hold_id -> Hold
+        self._patients = {}  # patient_id -> hold_id
+        self._expiry = []    # heap of (expires_at, hold_id)
+
+    def _drop(self, hold):
+        self._holds.pop(hold.id, None)
+        if self._patients.get(hold.patient_id) == hold.id:
+            del self._patients[hold.patient_id]
+        day = self._days.get((hold.doctor_id, hold.date))
+        if day is not None:
+            day.pop(hold.id, None)
+            if not day:
+                del self._days[(hold.doctor_id, hold.date)]
+
+    def _day(self, doctor_id, date, now):
+        day = self._days.get((doctor_id, date), {})
+        for hold in [hold for hold in day.values() if hold.expires_at <= now]:
+            self._drop(hold)
+        return self._days.get((doctor_id, date), {})
+
+    def _trim(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, hold_id = heapq.heappop(self._expiry)
+            hold = self._holds.get(hold_id)
+            if hold is not None and hold.expires_at <= now:
+                self._drop(hold)
+
+    def place(self, patient_id, doctor_id, date, start_time, end_time, ttl, replace=True):
+        """
+        Hold a slot for a patient, replacing their previous hold. Returns None
+        if taken, or without ``replace`` if the patient already holds a slot.
+        """
+        now = time.time()
+        with self._lock:
+            self._trim(now)
+            for hold in self._day(doctor_id, date, now).values():
+                if hold.patient_id != patient_id and _overlaps(hold, start_time, end_time):
+                    return None
+            previous = self._holds.get(self._patients.get(patient_id))
+            if previous is not None:
+                if not replace:
+                    return None
+                self._drop(previous)
+            hold = Hold(str(uuid.uuid4()), patient_id, doctor_id, date, start_time, end_time, now + ttl)
+            self._holds[hold.id] = hold
+            self._patients[patient_id] = hold.id
+            self._days.setdefault((doctor_id, date), {})[hold.id] = hold
+            heapq.heappush(self._expiry, (hold.expires_at, hold.id))
+            return hold
+
+    def blocking(self, doctor_id, date, start_time, end_time, patient_id):
+        """Return an active hold of another patient overlapping the slot, if any."""
+        with self._lock:
+            for hold in self._day(doctor_id, date, time.time()).values():
+                if hold.patient_id != patient_id and _overlaps(hold, start_time, end_time):
+                    return hold
+        return None
+
+    def release(self, hold_id, patient_id):
+        with self._lock:
+            hold = self._holds.get(hold_id)
+            if hold is None or hold.patient_id != patient_id:
+                return False
+            self._drop(hold)
+            return True
+
+    def consume(self, patient_id, doctor_id, date, start_time, end_time):
+        """Drop the patient's holds that overlap a slot they have just booked."""
+        with self._lock:
+            for hold in list(self._day(doctor_id, date, time.time()).values()):
+                if hold.patient_id == patient_id and _overlaps(hold, start_time, end_time):
+                    self._drop(hold)
+
+
+class SQLiteHoldStore:
+    """Holds kept in a SQLite file shared by every process on the host."""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS slot_hold (
+            id TEXT PRIMARY KEY,
+            patient_id TEXT NOT NULL UNIQUE,
+            doctor_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS slot_hold_day ON slot_hold (doctor_id, date);
+        CREATE INDEX IF NOT EXISTS slot_hold_expiry ON slot_hold (expires_at);
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(self.SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _overlapping(self, connection, doctor_id, date, start_time, end_time, now):
+        connection.execute(
+            'DELETE FROM slot_hold WHERE doctor_id = ? AND date = ? AND expires_at <= ?',
+            (str(doctor_id), date.isoformat(), now),
+        )
+        return [Hold(*row) for row in connection.execute(
+            'SELECT * FROM slot_hold WHERE doctor_id = ? AND date = ? AND start_time < ? AND end_time > ?',
+            (str(doctor_id), date.isoformat(), end_time.isoformat(), start_time.isoformat()),
+        )]
+
+    def place(self, patient_id, doctor_id, date, start_time, end_time, ttl, replace=True):
+        now = time.time()
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('DELETE FROM slot_hold WHERE expires_at <= ?', (now,))
+            if any(hold.patient_id != str(patient_id)
+                   for hold in self._overlapping(connection, doctor_id, date, start_time, end_time, now)):
+                connection.execute('ROLLBACK')
+                return None
+            if not replace and connection.execute(
+                'SELECT 1 FROM slot_hold WHERE patient_id = ?', (str(patient_id),)
+            ).fetchone():
+                connection.execute('ROLLBACK')
+                return None
+            hold = Hold(str(uuid.uuid4()), str(patient_id), str(doctor_id), date.isoformat(),
+                        start_time.isoformat(), end_time.isoformat(), now + ttl)
+            connection.execute('DELETE FROM slot_hold WHERE patient_id = ?', (hold.patient_id,))
+            connection.execute('INSERT INTO slot_hold VALUES (?, ?, ?, ?, ?, ?, ?)', hold)
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return Hold(hold.id, patient_id, doctor_id, date, start_time, end_time, hold.expires_at)
+
+    def blocking(self, doctor_id, date, start_time, end_time, patient_id):
+        for hold in self._overlapping(self._connection, doctor_id, date, start_time, end_time, time.time()):
+            if hold.patient_id != str(patient_id):
+                return hold
+        return None
+
+    def release(self, hold_id, patient_id):
+        cursor = self._connection.execute(
+            'DELETE FROM slot_hold WHERE id = ? AND patient_id = ?', (str(hold_id), str(patient_id))
+        )
+        return cursor.rowcount > 0
+
+    def consume(self, patient_id, doctor_id, date, start_time, end_time):
+        self._connection.execute(
+            'DELETE FROM slot_hold WHERE patient_id = ? AND doctor_id = ? AND date = ? '
+            'AND start_time < ? AND end_time > ?',
+            (str(patient_id), str(doctor_id), date.isoformat(), end_time.isoformat(), start_time.isoformat()),
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_hold_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if getattr(settings, 'SLOT_HOLD_BACKEND', 'local') == 'sqlite':
+                    _store = SQLiteHoldStore(settings.SLOT_HOLD_SQLITE_PATH)
+                else:
+                    _store = LocalHoldStore()
+    return _store
@@ -0,0 +1,137 @@
+"""
+iCalendar (RFC 5545) feeds of appointments and leaves.
+
+Events are produced by generators over server-side cursors, so a feed of any
+length is streamed with flat memory.  Every feed also has a cheap version
+tag (row counts and latest ``updated_at`` of its rows) used as its ETag.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Appointment, Leave
+
+PRODID = '-//Smart Healthcare//Appointments//EN'
+UID_DOMAIN = 'smart-healthcare'
+CHUNK_SIZE = 500
+
+STATUS_MAP = {
+    'pending': 'TENTATIVE',
+    'confirmed': 'CONFIRMED',
+    'completed': 'CONFIRMED',
+    'cancelled': 'CANCELLED',
+}
+
+
+def escape(text):
+    return (
+        str(text).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+    )
+
+
+def fold(line):
+    """Fold a content line to 75 octets as required by RFC 5545."""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    while len(encoded) > 75:
+        cut = 75 if not parts else 74
+        # Do not split a multi-byte character.
+        while cut and (encoded[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(encoded[:cut].decode('utf-8'))
+        encoded = encoded[cut:]
+    parts.append(encoded.decode('utf-8'))
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _utc(day, clock):
+    moment = timezone.make_aware(datetime.combine(day, clock), timezone.get_default_timezone())
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _stamp(moment):
+    return moment.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def appointment_event(pk, day, start, end, status, updated_at, summary):
+    return ''.join(fold(line) for line in (
+        'BEGIN:VEVENT',
+        f'UID:appointment-{pk}@{UID_DOMAIN}',
+        f'DTSTAMP:{_stamp(updated_at)}',
+        f'DTSTART:{_utc(day, start)}',
+        f'DTEND:{_utc(day, end)}',
+        f'SUMMARY:{escape(summary)}',
+        f'STATUS:{STATUS_MAP[status]}',
+        'END:VEVENT',
+    ))
+
+
+def leave_event(pk, day, reason, updated_at):
+    return ''.join(fold(line) for line in (
+        'BEGIN:VEVENT',
+        f'UID:leave-{pk}@{UID_DOMAIN}',
+        f'DTSTAMP:{_stamp(updated_at)}',
+        f"DTSTART;VALUE=DATE:{day.strftime('%Y%m%d')}",
+        f"DTEND;VALUE=DATE:{(day + timedelta(days=1)).strftime('%Y%m%d')}",
+        f'SUMMARY:{escape("Leave" + (f": {reason}" if reason else ""))}',
+        'TRANSP:OPAQUE',
+        'END:VEVENT',
+    ))
+
+
+def _feed_querysets(user, role, date_from, date_to):
+    owner = 'doctor' if role == 'doctor' else 'patient'
+    appointments = Appointment.objects.filter(**{owner: user, 'date__range': (date_from, date_to)})
+    leaves = Leave.objects.filter(doctor=user, date__range=(date_from, date_to)) if role == 'doctor' else Leave.objects.none()
+    return appointments, leaves
+
+
+def feed_version(user, role, date_from, date_to):
+    """Version tag of a feed; changes whenever one of its rows is added, changed or removed."""
+    appointments, leaves = _feed_querysets(user, role, date_from, date_to)
+    parts = [str(user.pk), role, date_from.isoformat(), date_to.isoformat()]
+    for queryset in (appointments, leaves):
+        summary = queryset.aggregate(rows=Count('pk'), latest=Max('updated_at'))
+        parts += [str(summary['rows']), summary['latest'].isoformat() if summary['latest'] else '-']
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()
+
+
+def iter_feed(user, role, date_from, date_to):
+    """Yield the feed as encoded chunks of roughly ``CHUNK_SIZE`` events."""
+    appointments, leaves = _feed_querysets(user, role, date_from, date_to)
+    name = 'patient__full_name' if role == 'doctor' else 'doctor__full_name'
+
+    yield ''.join(fold(line) for line in (
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        f'PRODID:{PRODID}',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(user.full_name)} appointments',
+    )).encode('utf-8')
+
+    buffer = []
+    rows = appointments.order_by('date', 'start_time').values_list(
+        'id', 'date', 'start_time', 'end_time', 'status', 'updated_at', name
+    ).iterator(chunk_size=CHUNK_SIZE)
+    for pk, day, start, end, status, updated_at, other in rows:
+        summary = f'Appointment with {other}' if role == 'doctor' else f'Appointment with Dr. {other}'
+        buffer.append(appointment_event(pk, day, start, end, status, updated_at, summary))
+        if len(buffer) >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+
+    for pk, day, reason, updated_at in leaves.order_by('date').values_list(
+        'id', 'date', 'reason', 'updated_at'
+    ).iterator(chunk_size=CHUNK_SIZE):
+        buffer.append(leave_event(pk, day, reason, updated_at))
+        if len(buffer) >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+
+    buffer.append(fold('END:VCALENDAR'))
+    yield ''.join(buffer).encode('utf-8')
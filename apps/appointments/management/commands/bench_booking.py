@@ -0,0 +1,99 @@
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from apps.appointments.booking import book_appointment, SlotUnavailable
+from apps.appointments.models import Appointment
+
+User = get_user_model()
+
+BENCH_DOMAIN = '@bench-booking.local'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure booking throughput with many concurrent bookers competing for "
+        "overlapping slots. Creates and deletes its own users; run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bookers', type=int, default=64, help='Concurrent booking threads.')
+        parser.add_argument('--attempts', type=int, default=20, help='Booking attempts per thread.')
+        parser.add_argument('--doctors', type=int, default=16, help='Doctors the bookers spread over.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        User.objects.filter(email__endswith=BENCH_DOMAIN).delete()
+        password = make_password(None)
+        doctors = User.objects.bulk_create([
+            User(email=f'doctor{i}{BENCH_DOMAIN}', role='doctor', password=password)
+            for i in range(options['doctors'])
+        ])
+        patients = User.objects.bulk_create([
+            User(email=f'patient{i}{BENCH_DOMAIN}', role='patient', password=password)
+            for i in range(options['bookers'])
+        ])
+        day = date.today() + timedelta(days=1)
+        # 30-minute slots starting every 15 minutes between 10:00 and 18:00, so bookers collide.
+        starts = [datetime(2000, 1, 1, 10) + timedelta(minutes=15 * i) for i in range(31)]
+
+        counts = {'booked': 0, 'conflicts': 0, 'errors': 0}
+        counts_lock = threading.Lock()
+        barrier = threading.Barrier(options['bookers'])
+
+        def booker(patient):
+            local = dict.fromkeys(counts, 0)
+            barrier.wait()
+            try:
+                for _ in range(options['attempts']):
+                    start = random.choice(starts)
+                    try:
+                        book_appointment(
+                            random.choice(doctors), patient, day,
+                            start.time(), (start + timedelta(minutes=30)).time(),
+                            status='confirmed',
+                        )
+                        local['booked'] += 1
+                    except SlotUnavailable:
+                        local['conflicts'] += 1
+                    except Exception:
+                        local['errors'] += 1
+            finally:
+                connection.close()
+            with counts_lock:
+                for key, value in local.items():
+                    counts[key] += value
+
+        threads = [threading.Thread(target=booker, args=(patient,)) for patient in patients]
+        began = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - began
+
+        overlaps = 0
+        for doctor in doctors:
+            previous_end = None
+            for start_time, end_time in Appointment.objects.filter(
+                doctor=doctor, date=day, status='confirmed'
+            ).order_by('start_time').values_list('start_time', 'end_time'):
+                if previous_end is not None and start_time < previous_end:
+                    overlaps += 1
+                previous_end = end_time
+
+        attempts = options['bookers'] * options['attempts']
+        self.stdout.write(
+            f"{options['bookers']} bookers x {options['attempts']} attempts over {options['doctors']} doctors "
+            f"on {connection.vendor}: {elapsed:.2f}s, {attempts / elapsed:.0f} attempts/s, "
+            f"{counts['booked']} booked, {counts['conflicts']} conflicts, {counts['errors']} errors, "
+            f"{overlaps} overlapping bookings"
+        )
+        User.objects.filter(email__endswith=BENCH_DOMAIN).delete()
@@ -0,0 +1,71 @@
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+
+from apps.appointments.waitlist import DoctorWaitlist
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare offering freed slots from the per-date waitlist heaps with a "
+        "linear scan of all entries. Runs in memory; touches no database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entries', type=int, default=100000, help='Waitlist entries of one doctor.')
+        parser.add_argument('--days', type=int, default=60, help='Dates the entry windows are spread over.')
+        parser.add_argument('--window', type=int, default=14, help='Longest window of one entry, in days.')
+        parser.add_argument('--offers', type=int, default=10000, help='Cancelled slots to offer.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        start = date.today()
+        epoch = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        entries = []
+        for i in range(options['entries']):
+            date_from = start + timedelta(days=rng.randrange(options['days']))
+            date_to = date_from + timedelta(days=rng.randrange(options['window']))
+            entries.append((uuid.UUID(int=rng.getrandbits(128)), date_from, date_to,
+                            rng.choice((0, 0, 0, 1, 2)), epoch + timedelta(seconds=i)))
+        offers = [start + timedelta(days=rng.randrange(options['days'])) for _ in range(options['offers'])]
+
+        began = time.perf_counter()
+        queue = DoctorWaitlist()
+        for entry in entries:
+            queue.push(*entry)
+        built = time.perf_counter() - began
+
+        began = time.perf_counter()
+        heap_picks = [queue.pop(day) for day in offers]
+        heap_time = time.perf_counter() - began
+
+        # Linear scan: what a query without the queue has to do per offer.
+        waiting = {entry[0]: entry for entry in entries}
+        sample = offers[:min(len(offers), 200)]
+        began = time.perf_counter()
+        scan_picks = []
+        for day in sample:
+            best = min(
+                (entry for entry in waiting.values() if entry[1] <= day <= entry[2]),
+                key=lambda entry: (-entry[3], entry[4], entry[0]),
+                default=None,
+            )
+            scan_picks.append(best[0] if best else None)
+            if best:
+                del waiting[best[0]]
+        scan_time = time.perf_counter() - began
+
+        agree = scan_picks == heap_picks[:len(sample)]
+        self.stdout.write(
+            f"{options['entries']} entries, windows up to {options['window']} days: "
+            f"queue built in {built:.2f}s\n"
+            f"heap:  {len(offers)} offers in {heap_time * 1000:.1f} ms "
+            f"({heap_time / len(offers) * 1e6:.1f} us/offer)\n"
+            f"scan:  {len(sample)} offers in {scan_time * 1000:.1f} ms "
+            f"({scan_time / len(sample) * 1e6:.1f} us/offer)\n"
+            f"same picks as scan: {agree}"
+        )
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.appointments.waitlist import expire_offers
+
+
+class Command(BaseCommand):
+    help = (
+        "Mark waitlist offers whose hold lapsed as expired and offer their slots to the next "
+        "waiting patients. Polls until stopped, or runs once with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Expire what is due and exit.')
+        parser.add_argument('--interval', type=float, default=30, help='Seconds between polls.')
+
+    def handle(self, *args, **options):
+        while True:
+            expired = expire_offers()
+            if expired or options['once']:
+                self.stdout.write(f"Expired {expired} offers.")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from apps.appointments.models import Appointment, DoctorDay
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the per-day booking counters (DoctorDay.booked) from the appointments "
+        "table with one grouped count. Needed after appointments were changed outside "
+        "the booking code, e.g. deleted in the admin. Best run while no bookings are being made."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without writing them.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        counts = {
+            (row['doctor_id'], row['date']): row['booked']
+            for row in Appointment.objects.filter(status__in=Appointment.BOOKED_STATUSES)
+            .values('doctor_id', 'date').annotate(booked=Count('id')).order_by()
+        }
+
+        changed = []
+        for pk, doctor_id, date, booked in DoctorDay.objects.values_list('id', 'doctor_id', 'date', 'booked').iterator():
+            actual = counts.pop((doctor_id, date), 0)
+            if actual != booked:
+                changed.append(DoctorDay(id=pk, booked=actual))
+        missing = [DoctorDay(doctor_id=doctor_id, date=date, booked=booked) for (doctor_id, date), booked in counts.items()]
+
+        if not options['dry_run']:
+            DoctorDay.objects.bulk_update(changed, ['booked'], batch_size=options['batch_size'])
+            DoctorDay.objects.bulk_create(missing, batch_size=options['batch_size'])
+
+        self.stdout.write(
+            f"{'Would fix' if options['dry_run'] else 'Fixed'} {len(changed)} counters, "
+            f"{'would create' if options['dry_run'] else 'created'} {len(missing)} missing days."
+        )
@@ -0,0 +1,38 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from apps.appointments.models import Feedback
+from apps.doctors.models import Doctor
+from apps.doctors.ratings import RATINGS, set_ratings
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the doctors' rating aggregates (Doctor.rating_*) from the feedback table "
+        "with one grouped count. Needed after feedback was changed outside the feedback code, "
+        "e.g. with QuerySet.update() or raw SQL."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report differences without writing them.')
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        counted = defaultdict(dict)
+        for row in Feedback.objects.values('doctor_id', 'rating').annotate(n=Count('id')).order_by():
+            counted[row['doctor_id']][row['rating']] = row['n']
+
+        fields = [f'rating_{rating}' for rating in RATINGS]
+        changed = {}
+        for doctor_id, *stored in Doctor.objects.values_list('pk', *fields).iterator():
+            histogram = counted.get(doctor_id, {})
+            if [histogram.get(rating, 0) for rating in RATINGS] != stored:
+                changed[doctor_id] = histogram
+
+        if not options['dry_run']:
+            set_ratings(changed)
+
+        self.stdout.write(f"{'Would fix' if options['dry_run'] else 'Fixed'} the ratings of {len(changed)} doctors.")
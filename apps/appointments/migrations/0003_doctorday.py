@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_alter_appointment_options_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='booking_days', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 12:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0003_doctorday'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'status', 'date', 'start_time'], name='appointment_doctor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['patient', 'date', 'start_time', 'id'], name='appointment_patient_date_idx'),
+        ),
+    ]
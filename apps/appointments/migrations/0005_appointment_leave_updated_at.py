@@ -0,0 +1,23 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0004_appointment_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='leave',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
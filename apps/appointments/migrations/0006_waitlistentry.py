@@ -0,0 +1,37 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0005_appointment_leave_updated_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('urgency', models.PositiveSmallIntegerField(choices=[(0, 'Routine'), (1, 'Soon'), (2, 'Urgent')], default=0)),
+                ('status', models.CharField(choices=[('waiting', 'Waiting'), ('offered', 'Offered'), ('withdrawn', 'Withdrawn')], default='waiting', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('offered_date', models.DateField(blank=True, null=True)),
+                ('offered_start_time', models.TimeField(blank=True, null=True)),
+                ('offered_end_time', models.TimeField(blank=True, null=True)),
+                ('offer_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='doctor_waitlist', to=settings.AUTH_USER_MODEL)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='waitlist_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'status', 'date_to'], name='waitlist_doctor_status_idx')],
+            },
+        ),
+    ]
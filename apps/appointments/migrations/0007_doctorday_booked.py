@@ -0,0 +1,33 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:06
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_booked(apps, schema_editor):
+    Appointment = apps.get_model('appointments', 'Appointment')
+    DoctorDay = apps.get_model('appointments', 'DoctorDay')
+    counts = Appointment.objects.exclude(status='cancelled').values('doctor_id', 'date').annotate(booked=Count('id'))
+    DoctorDay.objects.bulk_create(
+        [DoctorDay(doctor_id=row['doctor_id'], date=row['date'], booked=row['booked']) for row in counts],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['doctor', 'date'],
+        update_fields=['booked'],
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0006_waitlistentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='doctorday',
+            name='booked',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_booked, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0009_appointment_doctor_date_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='waitlistentry',
+            name='status',
+            field=models.CharField(choices=[('waiting', 'Waiting'), ('offered', 'Offered'), ('booked', 'Booked'), ('expired', 'Expired'), ('withdrawn', 'Withdrawn')], default='waiting', max_length=10),
+        ),
+    ]
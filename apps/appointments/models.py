@@ -13,6 +13,15 @@ class Appointment(models.Model):
         ('completed', 'Completed'),
         ('cancelled', 'Cancelled'),
     ]
+    # Allowed status changes, keyed by target status:
+    # pending -> confirmed -> completed, and any status -> cancelled.
+    TRANSITIONS = {
+        'confirmed': ('pending',),
+        'completed': ('confirmed',),
+        'cancelled': ('pending', 'confirmed', 'completed'),
+    }
+    # Statuses that take one of the doctor's daily places (see DoctorDay.booked)
+    BOOKED_STATUSES = ('pending', 'confirmed', 'completed')
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doctor_appointments')
     patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='patient_appointments')
@@ -20,9 +29,22 @@ class Appointment(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
-        unique_together = ('doctor', 'date', 'start_time')  # Ensure no overlapping appointments
+        constraints = [
+            # One active appointment per start; cancelled ones stay as history and free the slot.
+            models.UniqueConstraint(
+                fields=['doctor', 'date', 'start_time'], condition=~models.Q(status='cancelled'),
+                name='appointment_active_slot_unique',
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the doctor and patient appointment lists, in
+            # their (date, start_time, id) order; a status filter is applied on the scan.
+            models.Index(fields=['doctor', 'date', 'start_time', 'id'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'date', 'start_time', 'id'], name='appointment_patient_date_idx'),
+        ]
 
     def __str__(self):
         return f"Appointment: {self.patient.full_name} with {self.doctor.full_name} on {self.date}"
@@ -32,9 +54,104 @@ class Leave(models.Model):
     date = models.DateField()
     reason = models.TextField(blank=True, null=True)
     is_approved = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('doctor', 'date')
 
     def __str__(self):
         return f"Leave: {self.doctor.full_name} on {self.date}"
+
+
+class DoctorDay(models.Model):
+    """
+    Reservation row for one doctor on one date.
+
+    Bookings lock this row before checking for overlaps, so concurrent
+    bookings for the same doctor and date run one at a time while other
+    doctors and dates are unaffected.  ``booked`` counts the day's
+    appointments in ``Appointment.BOOKED_STATUSES`` and is changed in the same
+    transaction as the appointments themselves, so the doctor's daily limit
+    is enforced without counting appointments.
+    """
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='booking_days')
+    date = models.DateField()
+    version = models.PositiveIntegerField(default=0)  # Bumped by every booking that locks the row
+    booked = models.PositiveIntegerField(default=0)  # Appointments taking a place on this day
+
+    class Meta:
+        unique_together = ('doctor', 'date')
+
+    def __str__(self):
+        return f"{self.doctor_id} on {self.date}: {self.booked} booked (v{self.version})"
+
+
+class WaitlistEntry(models.Model):
+    """
+    A patient waiting for any slot with a doctor between two dates. When an
+    appointment in that window is cancelled, the slot is offered to the most
+    urgent, longest-waiting entry.
+    """
+    URGENCY_CHOICES = [
+        (0, 'Routine'),
+        (1, 'Soon'),
+        (2, 'Urgent'),
+    ]
+    STATUS_CHOICES = [
+        ('waiting', 'Waiting'),
+        ('offered', 'Offered'),
+        ('booked', 'Booked'),
+        ('expired', 'Expired'),
+        ('withdrawn', 'Withdrawn'),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doctor_waitlist')
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='waitlist_entries')
+    date_from = models.DateField()
+    date_to = models.DateField()
+    urgency = models.PositiveSmallIntegerField(choices=URGENCY_CHOICES, default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='waiting')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # The slot offered to the patient, held for them until `offer_expires_at`
+    offered_date = models.DateField(blank=True, null=True)
+    offered_start_time = models.TimeField(blank=True, null=True)
+    offered_end_time = models.TimeField(blank=True, null=True)
+    offer_expires_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', 'status', 'date_to'], name='waitlist_doctor_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Waitlist: {self.patient_id} for {self.doctor_id} ({self.date_from} - {self.date_to})"
+
+
+class Feedback(models.Model):
+    """
+    A patient's rating of one of their completed appointments, at most one per
+    appointment. The doctor's aggregates are kept by ``apps.doctors.ratings``
+    (see ``apps.appointments.feedback``).
+    """
+    RATING_CHOICES = [(rating, str(rating)) for rating in range(1, 6)]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE, related_name='feedback')
+    doctor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='doctor_feedback')
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name='given_feedback')
+    rating = models.PositiveSmallIntegerField(choices=RATING_CHOICES)
+    comments = models.TextField(blank=True, null=True)
+    anonymous = models.BooleanField(default=False)  # Hide the patient's name from the doctor's feedback list
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['doctor', '-created_at'], name='feedback_doctor_created_idx'),
+        ]
+        constraints = [
+            models.CheckConstraint(condition=models.Q(rating__gte=1, rating__lte=5), name='feedback_rating_range'),
+        ]
+
+    def __str__(self):
+        return f"Feedback: {self.rating}/5 for {self.doctor_id} ({self.appointment_id})"
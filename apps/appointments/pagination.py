@@ -0,0 +1,83 @@
+import base64
+import uuid
+from collections import OrderedDict
+from datetime import date, time
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class AppointmentKeysetPagination(BasePagination):
+    """
+    Forward-only keyset pagination on (date, start_time, id).
+
+    The cursor carries the sort key of the last row of the previous page, so
+    every page is a range scan on a composite index starting at that key;
+    there is no COUNT(*) and no OFFSET, and deep pages cost the same as the first.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, settings.REST_FRAMEWORK['PAGE_SIZE']))
+        except ValueError:
+            size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        return max(1, min(size, self.max_page_size))
+
+    def encode_cursor(self, appointment):
+        raw = f"{appointment.date.isoformat()}|{appointment.start_time.isoformat()}|{appointment.pk}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        try:
+            day, start, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            return date.fromisoformat(day), time.fromisoformat(start), uuid.UUID(pk)
+        except (ValueError, UnicodeDecodeError):
+            raise NotFound("Invalid cursor.")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('date', 'start_time', 'id')
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            day, start, pk = self.decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(date__gt=day)
+                | Q(date=day, start_time__gt=start)
+                | Q(date=day, start_time=start, id__gt=pk)
+            )
+
+        page = list(queryset[:page_size + 1])
+        self.has_next = len(page) > page_size
+        page = page[:page_size]
+        self.next_cursor = self.encode_cursor(page[-1]) if self.has_next else None
+        return page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,14 @@
+from rest_framework.renderers import BaseRenderer
+
+
+class ICalendarRenderer(BaseRenderer):
+    """
+    Lets calendar clients negotiate `text/calendar`. Feeds themselves are
+    streamed by the view; this only renders error responses.
+    """
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return str(data).encode(self.charset)
@@ -1,36 +1,49 @@
 from rest_framework import serializers
-from .models import Appointment, Leave
+from .models import Appointment, Feedback, Leave, WaitlistEntry
+from .availability import availability_index
+from .booking import book_appointment, reschedule_appointment, SlotUnavailable
+from django.conf import settings
 from django.utils.timezone import now
 from datetime import datetime, timedelta
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+def validate_slot_times(data):
+    # Ensure the date is not in the past
+    if data['date'] < datetime.now().date():
+        raise serializers.ValidationError("Appointments cannot be booked for past dates.")
+
+    # Ensure start_time is before end_time
+    if data['start_time'] >= data['end_time']:
+        raise serializers.ValidationError("Start time must be before end time.")
+
 
 class AppointmentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Appointment
         fields = ['id', 'doctor', 'patient', 'date', 'start_time', 'end_time', 'status']
         read_only_fields = ['id', 'patient', 'status']  # `patient` is read-only because it will be set automatically
+        # (doctor, date, start_time) is checked by the booking code under the day lock,
+        # where cancelled appointments do not hold their slot.
+        validators = []
 
     def validate(self, data):
-        # Ensure the date is not in the past
-        if data['date'] < datetime.now().date():
-            raise serializers.ValidationError("Appointments cannot be booked for past dates.")
-
-        # Ensure start_time is before end_time
-        if data['start_time'] >= data['end_time']:
-            raise serializers.ValidationError("Start time must be before end time.")
+        validate_slot_times(data)
 
         # Ensure the doctor is not on leave for the given date
         doctor = data['doctor']
-        if Leave.objects.filter(doctor=doctor, date=data['date']).exists():
+        if availability_index.is_on_leave(doctor.pk, data['date']):
             raise serializers.ValidationError("The doctor is on leave on the selected date.")
 
         # Ensure the slot is not already booked
-        if Appointment.objects.filter(
-            doctor=doctor,
-            date=data['date'],
-            start_time__lt=data['end_time'],
-            end_time__gt=data['start_time'],
-            status="confirmed"
-        ).exists():
+        if availability_index.has_conflict(
+            doctor.pk,
+            data['date'],
+            data['start_time'],
+            data['end_time'],
+            exclude=self.instance.pk if self.instance else None,
+        ):
             raise serializers.ValidationError("This time slot is already booked.")
 
         return data
@@ -38,7 +51,135 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         # Set the patient as the logged-in user
         validated_data['patient'] = self.context['request'].user
-        return super().create(validated_data)
+        try:
+            return book_appointment(**validated_data)
+        except SlotUnavailable as exc:
+            raise serializers.ValidationError(str(exc))
+
+    def update(self, instance, validated_data):
+        # Moves go through the day locks so both days' booking counters stay right
+        try:
+            return reschedule_appointment(
+                instance,
+                validated_data.get('doctor', instance.doctor),
+                validated_data.get('date', instance.date),
+                validated_data.get('start_time', instance.start_time),
+                validated_data.get('end_time', instance.end_time),
+            )
+        except SlotUnavailable as exc:
+            raise serializers.ValidationError(str(exc))
+
+class AppointmentBulkItemSerializer(serializers.Serializer):
+    """One entry of a bulk booking; the doctor is resolved by the view in a single query."""
+    doctor = serializers.UUIDField()
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, data):
+        validate_slot_times(data)
+        return data
+
+
+class AppointmentBulkSerializer(serializers.Serializer):
+    appointments = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=500)
+
+
+class SlotHoldSerializer(serializers.Serializer):
+    """Slot a patient wants to hold while completing the booking."""
+    doctor = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(role='doctor'))
+    date = serializers.DateField()
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+    ttl = serializers.IntegerField(min_value=1, max_value=settings.SLOT_HOLD_MAX_TTL, default=settings.SLOT_HOLD_TTL)
+
+    def validate(self, data):
+        validate_slot_times(data)
+        doctor = data['doctor']
+        if availability_index.is_on_leave(doctor.pk, data['date']):
+            raise serializers.ValidationError("The doctor is on leave on the selected date.")
+        if availability_index.has_conflict(doctor.pk, data['date'], data['start_time'], data['end_time']):
+            raise serializers.ValidationError("This time slot is already booked.")
+        return data
+
+
+class AppointmentTransitionSerializer(serializers.Serializer):
+    """Bulk status change; appointments are selected by ids, by date or by both."""
+    status = serializers.ChoiceField(choices=sorted(Appointment.TRANSITIONS))
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False, max_length=500)
+    date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if 'ids' not in data and 'date' not in data:
+            raise serializers.ValidationError("Provide ids, a date, or both.")
+        return data
+
+
+class AppointmentListQuerySerializer(serializers.Serializer):
+    """Filters of the doctor and patient appointment lists."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    status = serializers.MultipleChoiceField(choices=Appointment.STATUS_CHOICES, required=False)
+
+    def to_internal_value(self, data):
+        # Accept both ?status=a&status=b and ?status=a,b
+        if hasattr(data, 'getlist') and 'status' in data:
+            data = data.copy()
+            data.setlist('status', [value for raw in data.getlist('status') for value in raw.split(',') if value])
+        return super().to_internal_value(data)
+
+
+class CalendarFeedQuerySerializer(serializers.Serializer):
+    """Date range of a calendar feed; defaults to the last 90 and the next 365 days."""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        today = now().date()
+        data.setdefault('date_from', today - timedelta(days=90))
+        data.setdefault('date_to', today + timedelta(days=365))
+        if data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        return data
+
+
+class WaitlistEntrySerializer(serializers.ModelSerializer):
+    doctor = serializers.PrimaryKeyRelatedField(queryset=User.objects.filter(role='doctor'))
+
+    class Meta:
+        model = WaitlistEntry
+        fields = [
+            'id', 'doctor', 'date_from', 'date_to', 'urgency', 'status', 'created_at',
+            'offered_date', 'offered_start_time', 'offered_end_time', 'offer_expires_at',
+        ]
+        read_only_fields = [
+            'id', 'status', 'created_at',
+            'offered_date', 'offered_start_time', 'offered_end_time', 'offer_expires_at',
+        ]
+
+    def validate(self, data):
+        if data['date_from'] < now().date():
+            raise serializers.ValidationError("The waitlist window cannot start in the past.")
+        if data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        if (data['date_to'] - data['date_from']).days > settings.WAITLIST_MAX_WINDOW_DAYS:
+            raise serializers.ValidationError(
+                f"The waitlist window cannot exceed {settings.WAITLIST_MAX_WINDOW_DAYS} days."
+            )
+        return data
+
+
+class FeedbackSerializer(serializers.ModelSerializer):
+    patient_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Feedback
+        fields = ['id', 'appointment', 'rating', 'comments', 'anonymous', 'patient_name', 'created_at']
+        read_only_fields = ['id', 'appointment', 'created_at']
+
+    def get_patient_name(self, obj):
+        return None if obj.anonymous else obj.patient.full_name
+
 
 class LeaveSerializer(serializers.ModelSerializer):
     class Meta:
@@ -51,3 +192,32 @@ class LeaveSerializer(serializers.ModelSerializer):
         if data['date'] < now().date():
             raise serializers.ValidationError("Leave cannot be scheduled for past dates.")
         return data
+
+
+class DoctorAvailabilityQuerySerializer(serializers.Serializer):
+    """Query parameters of the doctor availability lookup."""
+    date = serializers.DateField(required=False)
+
+    def validate(self, data):
+        data.setdefault('date', now().date())
+        return data
+
+
+class SlotSearchSerializer(serializers.Serializer):
+    """Query parameters of the free-slot search."""
+    specialization = serializers.CharField(required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    duration = serializers.IntegerField(default=30, min_value=5, max_value=480)
+    step = serializers.IntegerField(required=False, min_value=5, max_value=480)
+    cursor = serializers.UUIDField(required=False)
+    page_size = serializers.IntegerField(default=50, min_value=1, max_value=200)
+
+    def validate(self, data):
+        data.setdefault('date_from', now().date())
+        data.setdefault('date_to', data['date_from'] + timedelta(days=6))
+        if data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        if (data['date_to'] - data['date_from']).days > 30:
+            raise serializers.ValidationError("The search range cannot exceed 31 days.")
+        return data
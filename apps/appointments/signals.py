@@ -0,0 +1,80 @@
+"""
+Keep the unavailability calendar in step with its source tables.
+
+Every save or delete of a leave or schedule row recomputes the affected day
+of that doctor; when an update moves a row to another date or doctor, the
+day it left is recomputed as well.  Refreshes run after commit so a rolled
+back write never reaches the calendar.  Bulk schedule generation bypasses
+the model signals and drops the bitsets of the doctors it touched instead.
+
+Deleted feedback takes its rating back from the doctor's aggregates in the
+deleting transaction (see ``feedback.py``).
+"""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.doctors.models import DoctorLeave, ScheduleException, WeeklySchedule
+from apps.doctors.ratings import record_rating
+from apps.doctors.scheduling import schedules_generated
+from .models import Feedback, Leave
+from .unavailability import unavailability
+
+SOURCES = {
+    Leave: 'date',
+    DoctorLeave: 'leave_date',
+    WeeklySchedule: 'date',
+    ScheduleException: 'date',
+}
+
+
+def _key(instance):
+    return instance.doctor_id, getattr(instance, SOURCES[type(instance)])
+
+
+def _refresh(doctor_id, day):
+    transaction.on_commit(partial(unavailability.refresh, doctor_id, day))
+
+
+@receiver(pre_save, sender=Leave)
+@receiver(pre_save, sender=DoctorLeave)
+@receiver(pre_save, sender=WeeklySchedule)
+@receiver(pre_save, sender=ScheduleException)
+def remember_previous_day(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    field = SOURCES[sender]
+    instance._unavailability_previous = sender.objects.filter(pk=instance.pk).values_list('doctor_id', field).first()
+
+
+@receiver(post_save, sender=Leave)
+@receiver(post_save, sender=DoctorLeave)
+@receiver(post_save, sender=WeeklySchedule)
+@receiver(post_save, sender=ScheduleException)
+def refresh_saved_day(sender, instance, **kwargs):
+    key = _key(instance)
+    previous = getattr(instance, '_unavailability_previous', None)
+    if previous is not None and previous != key:
+        _refresh(*previous)
+    _refresh(*key)
+
+
+@receiver(post_delete, sender=Leave)
+@receiver(post_delete, sender=DoctorLeave)
+@receiver(post_delete, sender=WeeklySchedule)
+@receiver(post_delete, sender=ScheduleException)
+def refresh_deleted_day(sender, instance, **kwargs):
+    _refresh(*_key(instance))
+
+
+@receiver(schedules_generated)
+def drop_generated_doctors(sender, doctor_ids, **kwargs):
+    for doctor_id in doctor_ids:
+        unavailability.invalidate(doctor_id)
+
+
+@receiver(post_delete, sender=Feedback)
+def take_back_rating(sender, instance, **kwargs):
+    record_rating(instance.doctor_id, instance.rating, sign=-1)
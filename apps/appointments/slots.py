@@ -0,0 +1,166 @@
+"""
+Free-slot search across many doctors and dates.
+
+A page of doctors is loaded with a handful of bulk queries (schedule rows,
+templates and exceptions, both leave tables and booked appointments).  Every (doctor, date) pair becomes a
+row of a minute-resolution grid; working windows and bookings are painted
+onto it with difference arrays, and a cumulative sum of busy minutes tells
+for every candidate start at once whether the whole slot is free.  The grid
+is built ``GRID_ROWS`` rows at a time with 16-bit counters, so a request's
+memory stays a few megabytes however many doctors and days it covers.
+"""
+from datetime import time, timedelta
+
+import numpy as np
+from django.utils import timezone
+
+from apps.doctors.models import Doctor, DoctorLeave
+from apps.doctors.scheduling import iter_working_hours
+from .models import Appointment, Leave
+
+MINUTES_PER_DAY = 24 * 60
+# (doctor, date) rows painted at once: about 3 MB per int16 array of the grid.
+GRID_ROWS = 1024
+
+# Appointment statuses that occupy a slot; mirrors AppointmentSerializer.validate.
+BLOCKING_STATUSES = ('confirmed',)
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def _clock(minutes):
+    return time(minutes // 60 % 24, minutes % 60)  # The end of the day, 1440, is 00:00
+
+
+def _end_minutes(value):
+    # An end of 00:00 is midnight at the end of the day, the grid's last column.
+    return _minutes(value) or MINUTES_PER_DAY
+
+
+def _intervals(rows):
+    """``(row, start, end)`` tuples as an (n, 3) array."""
+    return np.asarray(rows, dtype=np.intp).reshape(-1, 3)
+
+
+def _paint(n_rows, intervals):
+    """Return a boolean grid with [start, end) of every given (row, start, end) set."""
+    diff = np.zeros((n_rows, MINUTES_PER_DAY + 1), dtype=np.int16)
+    if len(intervals):
+        np.add.at(diff, (intervals[:, 0], intervals[:, 1]), 1)
+        np.add.at(diff, (intervals[:, 0], intervals[:, 2]), -1)
+    return np.cumsum(diff, axis=1, dtype=np.int16)[:, :MINUTES_PER_DAY] > 0
+
+
+def find_free_slots(doctor_ids, date_from, date_to, duration, step=None):
+    """
+    Compute free slots of ``duration`` minutes for every doctor between two
+    dates (inclusive).  Candidate starts are aligned to ``step`` minutes from
+    midnight (defaults to ``duration``).
+
+    Returns ``{doctor_id: [(date, start_time, end_time), ...]}``.
+    """
+    step = step or duration
+    doctor_ids = list(doctor_ids)
+    n_days = (date_to - date_from).days + 1
+    if not doctor_ids or n_days <= 0:
+        return {}
+
+    ordinal = {doctor_id: i for i, doctor_id in enumerate(doctor_ids)}
+    n_rows = len(doctor_ids) * n_days
+
+    def row(doctor_id, day):
+        return ordinal[doctor_id] * n_days + (day - date_from).days
+
+    windows = _intervals([
+        (row(doctor_id, day), _minutes(start), _end_minutes(end))
+        for doctor_id, day, start, end in iter_working_hours(doctor_ids, date_from, date_to)
+        if _minutes(start) < _end_minutes(end)
+    ])
+    booked = _intervals([
+        (row(doctor_id, day), _minutes(start), _end_minutes(end))
+        for doctor_id, day, start, end in Appointment.objects.filter(
+            doctor_id__in=doctor_ids, date__range=(date_from, date_to), status__in=BLOCKING_STATUSES
+        ).values_list('doctor_id', 'date', 'start_time', 'end_time')
+    ])
+    leave_rows = [
+        row(doctor_id, day)
+        for doctor_id, day in Leave.objects.filter(
+            doctor_id__in=doctor_ids, date__range=(date_from, date_to)
+        ).values_list('doctor_id', 'date')
+    ]
+    leave_rows += [
+        row(doctor_id, day)
+        for doctor_id, day in DoctorLeave.objects.filter(
+            doctor_id__in=doctor_ids, leave_date__range=(date_from, date_to)
+        ).values_list('doctor_id', 'leave_date')
+    ]
+    leave_rows = np.asarray(leave_rows, dtype=np.intp)
+
+    starts = np.arange(0, MINUTES_PER_DAY - duration + 1, step)  # The last slot may end at 24:00
+    now = timezone.localtime()
+    today = (now.date() - date_from).days
+
+    results = {doctor_id: [] for doctor_id in doctor_ids}
+    for first in range(0, n_rows, GRID_ROWS):
+        last = min(first + GRID_ROWS, n_rows)
+
+        def block(intervals):
+            selected = intervals[(intervals[:, 0] >= first) & (intervals[:, 0] < last)]
+            selected[:, 0] -= first
+            return selected
+
+        unavailable = ~_paint(last - first, block(windows)) | _paint(last - first, block(booked))
+        unavailable[leave_rows[(leave_rows >= first) & (leave_rows < last)] - first] = True
+
+        # Busy minutes in [s, s + duration) for every row and candidate start s.
+        busy_before = np.zeros((last - first, MINUTES_PER_DAY + 1), dtype=np.int16)
+        np.cumsum(unavailable, axis=1, dtype=np.int16, out=busy_before[:, 1:])
+        free = (busy_before[:, starts + duration] - busy_before[:, starts]) == 0
+
+        # Nothing in the past can be booked.
+        day_offsets = np.arange(first, last) % n_days
+        free[day_offsets < today] = False
+        free[np.ix_(day_offsets == today, starts <= _minutes(now))] = False
+
+        for row_index, start_index in zip(*np.nonzero(free)):
+            row_index += first
+            doctor_id = doctor_ids[row_index // n_days]
+            day = date_from + timedelta(days=int(row_index % n_days))
+            start = int(starts[start_index])
+            results[doctor_id].append((day, _clock(start), _clock(start + duration)))
+    return results
+
+
+def search_free_slots(date_from, date_to, duration, specialization=None, cursor=None, page_size=50, step=None):
+    """
+    Return one page of doctors with free slots, ordered by doctor id.
+
+    Pages are keyed on the last doctor id of the previous page, so each page
+    only touches its own doctors.  Returns ``(results, next_cursor)``.
+    """
+    doctors = Doctor.objects.filter(is_active=True).select_related('user', 'specialization').order_by('user_id')
+    if specialization:
+        doctors = doctors.filter(specialization__name__iexact=specialization)
+    if cursor:
+        doctors = doctors.filter(user_id__gt=cursor)
+    doctors = list(doctors[:page_size + 1])
+    next_cursor = doctors[page_size - 1].user_id if len(doctors) > page_size else None
+    doctors = doctors[:page_size]
+
+    slots = find_free_slots([doctor.user_id for doctor in doctors], date_from, date_to, duration, step=step)
+    results = [
+        {
+            'doctor_id': str(doctor.user_id),
+            'full_name': doctor.user.full_name,
+            'specialization': doctor.specialization.name,
+            'slots': [
+                {'date': day.isoformat(), 'start_time': start.isoformat(), 'end_time': end.isoformat()}
+                for day, start, end in slots[doctor.user_id]
+            ],
+        }
+        for doctor in doctors
+        if slots[doctor.user_id]
+    ]
+    return results, next_cursor
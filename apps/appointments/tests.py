@@ -1,3 +1,387 @@
+import tempfile
+import uuid
+from datetime import time, timedelta
+from pathlib import Path
+from unittest import mock
+
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.doctors.models import Doctor, Specialization, WeeklySchedule
+from apps.users.models import User
+from .availability import availability_index
+from . import holds, slots
+from .booking import (
+    FULL_MESSAGE, TAKEN_MESSAGE, SlotUnavailable, book_appointment, book_appointments, lock_doctor_day,
+    reschedule_appointment, reserve_place,
+)
+from .holds import HELD_MESSAGE, LocalHoldStore, SQLiteHoldStore
+from .slots import find_free_slots
+from .models import Appointment, DoctorDay, Leave, WaitlistEntry
+from .transitions import CONFLICT, INVALID_TRANSITION, NOT_FOUND, UPDATED, transition_appointments
+from .waitlist import expire_offers, offer_booked, offer_cancelled_slot, offer_slot, waitlist_queues, withdraw
+
+
+def create_doctor(name='doctor', max_patients_per_day=10):
+    user = User.objects.create_user(f'{name}@example.com', 'password', role='doctor', full_name=name)
+    specialization, _ = Specialization.objects.get_or_create(name='Cardiology', defaults={'description': 'Heart'})
+    Doctor.objects.create(
+        user=user, specialization=specialization, license_number=f'L-{name}',
+        years_of_experience=5, consultation_fee=100, max_patients_per_day=max_patients_per_day,
+    )
+    return user
+
+
+def create_patient(name='patient'):
+    return User.objects.create_user(f'{name}@example.com', 'password', role='patient', full_name=name)
+
+
+class AppointmentTestCase(TestCase):
+    def setUp(self):
+        availability_index.clear()
+        self.doctor = create_doctor()
+        self.patient = create_patient()
+        self.day = timezone.localdate() + timedelta(days=1)
+
+    def book(self, start, end, patient=None, **extra):
+        return book_appointment(self.doctor, patient or self.patient, self.day, start, end, **extra)
+
+
+class BookingTests(AppointmentTestCase):
+    def test_overlapping_confirmed_appointment_is_refused(self):
+        self.book(time(10, 0), time(10, 30), status='confirmed')
+        with self.assertRaisesMessage(SlotUnavailable, TAKEN_MESSAGE):
+            self.book(time(10, 15), time(10, 45))
+
+    def test_same_start_is_refused_whatever_the_status(self):
+        self.book(time(10, 0), time(10, 30))
+        with self.assertRaisesMessage(SlotUnavailable, TAKEN_MESSAGE):
+            self.book(time(10, 0), time(10, 15))
+
+    def test_overlapping_pending_appointments_are_accepted(self):
+        self.book(time(10, 0), time(10, 30))
+        self.book(time(10, 15), time(10, 45))
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 2)
+
+    def test_daily_limit(self):
+        Doctor.objects.filter(user=self.doctor).update(max_patients_per_day=2)
+        self.book(time(9, 0), time(9, 30))
+        self.book(time(10, 0), time(10, 30))
+        with self.assertRaisesMessage(SlotUnavailable, FULL_MESSAGE):
+            self.book(time(11, 0), time(11, 30))
+        self.assertEqual(DoctorDay.objects.get(doctor=self.doctor, date=self.day).booked, 2)
+
+    def test_cancelling_gives_the_place_back(self):
+        Doctor.objects.filter(user=self.doctor).update(max_patients_per_day=1)
+        appointment = self.book(time(9, 0), time(9, 30))
+        transition_appointments(self.doctor, 'cancelled', ids=[appointment.pk])
+        self.book(time(10, 0), time(10, 30))
+        self.assertEqual(DoctorDay.objects.get(doctor=self.doctor, date=self.day).booked, 1)
+
+    def test_cancelled_slot_can_be_booked_again(self):
+        other = create_patient('other')
+        for patient in (self.patient, other):
+            appointment = self.book(time(9, 0), time(9, 30), patient=patient)
+            transition_appointments(self.doctor, 'cancelled', ids=[appointment.pk])
+        rebooked = self.book(time(9, 0), time(9, 30))
+        # The cancelled appointments stay as the patients' history.
+        self.assertEqual(
+            sorted(Appointment.objects.filter(doctor=self.doctor).values_list('status', flat=True)),
+            ['cancelled', 'cancelled', 'pending'],
+        )
+        self.assertEqual(rebooked.status, 'pending')
+        with self.assertRaisesMessage(SlotUnavailable, TAKEN_MESSAGE):
+            self.book(time(9, 0), time(9, 30), patient=other)
+
+    def test_cancelled_slot_in_a_batch_and_a_reschedule(self):
+        cancelled = self.book(time(9, 0), time(9, 30))
+        moved = self.book(time(11, 0), time(11, 30))
+        transition_appointments(self.doctor, 'cancelled', ids=[cancelled.pk])
+        item = {'doctor': self.doctor, 'date': self.day, 'start_time': time(9, 0), 'end_time': time(9, 30)}
+        [(booked, error)] = book_appointments(create_patient('other'), [item])
+        self.assertIsNone(error)
+
+        transition_appointments(self.doctor, 'cancelled', ids=[booked.pk])
+        reschedule_appointment(moved, self.doctor, self.day, time(9, 0), time(9, 30))
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor, start_time=time(9, 0)).count(), 3)
+
+    def test_reserve_place_stops_at_the_limit(self):
+        Doctor.objects.filter(user=self.doctor).update(max_patients_per_day=1)
+        lock_doctor_day(self.doctor.pk, self.day)
+        self.assertTrue(reserve_place(self.doctor.pk, self.day))
+        self.assertFalse(reserve_place(self.doctor.pk, self.day))
+        self.assertEqual(DoctorDay.objects.get(doctor=self.doctor, date=self.day).booked, 1)
+
+    def test_batch_checks_items_against_each_other(self):
+        Doctor.objects.filter(user=self.doctor).update(max_patients_per_day=2)
+        item = {'doctor': self.doctor, 'date': self.day, 'status': 'confirmed'}
+        results = book_appointments(self.patient, [
+            {**item, 'start_time': time(9, 0), 'end_time': time(9, 30)},
+            {**item, 'start_time': time(9, 15), 'end_time': time(9, 45)},
+            {**item, 'start_time': time(10, 0), 'end_time': time(10, 30)},
+            {**item, 'start_time': time(11, 0), 'end_time': time(11, 30)},
+        ])
+        self.assertEqual([error for _, error in results], [None, TAKEN_MESSAGE, None, FULL_MESSAGE])
+        self.assertEqual(Appointment.objects.filter(doctor=self.doctor).count(), 2)
+        self.assertEqual(DoctorDay.objects.get(doctor=self.doctor, date=self.day).booked, 2)
+
+
+class TransitionTests(AppointmentTestCase):
+    def status(self, appointment):
+        return Appointment.objects.values_list('status', flat=True).get(pk=appointment.pk)
+
+    def test_allowed_and_refused_transitions(self):
+        pending = self.book(time(9, 0), time(9, 30))
+        confirmed = self.book(time(10, 0), time(10, 30), status='confirmed')
+        missing = uuid.uuid4()
+        results, changed = transition_appointments(
+            self.doctor, 'completed', ids=[pending.pk, confirmed.pk, missing]
+        )
+        self.assertEqual(results, {
+            pending.pk: (INVALID_TRANSITION, 'pending'),
+            confirmed.pk: (UPDATED, 'confirmed'),
+            missing: (NOT_FOUND, None),
+        })
+        self.assertEqual([appointment.pk for appointment in changed], [confirmed.pk])
+        self.assertEqual(self.status(pending), 'pending')
+        self.assertEqual(self.status(confirmed), 'completed')
+
+    def test_confirming_overlapping_appointments(self):
+        first = self.book(time(9, 0), time(9, 30))
+        second = self.book(time(9, 15), time(9, 45))
+        results, _ = transition_appointments(self.doctor, 'confirmed', ids=[first.pk, second.pk])
+        self.assertEqual(results[first.pk], (UPDATED, 'pending'))
+        self.assertEqual(results[second.pk], (CONFLICT, 'pending'))
+        self.assertEqual(self.status(second), 'pending')
+
+    def test_other_doctors_appointments_are_not_found(self):
+        other = book_appointment(create_doctor('other'), self.patient, self.day, time(9, 0), time(9, 30))
+        results, changed = transition_appointments(self.doctor, 'cancelled', ids=[other.pk])
+        self.assertEqual(results, {other.pk: (NOT_FOUND, None)})
+        self.assertEqual(changed, [])
+        self.assertEqual(self.status(other), 'pending')
+
+    def test_cancelling_a_day(self):
+        self.book(time(9, 0), time(9, 30))
+        self.book(time(10, 0), time(10, 30), status='confirmed')
+        results, changed = transition_appointments(self.doctor, 'cancelled', date=self.day)
+        self.assertEqual(len(changed), 2)
+        self.assertEqual({outcome for outcome, _ in results.values()}, {UPDATED})
+        self.assertEqual(DoctorDay.objects.get(doctor=self.doctor, date=self.day).booked, 0)
+
+
+class FreeSlotTests(AppointmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.evening = create_doctor('evening')
+        self.away = create_doctor('away')
+        self.days = [self.day, self.day + timedelta(days=1)]
+        for doctor, start, end in ((self.doctor, time(9, 0), time(11, 0)),
+                                   (self.evening, time(22, 0), time(0, 0)),
+                                   (self.away, time(9, 0), time(10, 0))):
+            for day in self.days:
+                WeeklySchedule.objects.create(
+                    doctor_id=doctor.pk, date=day, day_of_week=day.weekday(), start_time=start, end_time=end
+                )
+        self.book(time(9, 30), time(10, 0), status='confirmed')
+        self.book(time(10, 30), time(11, 0))  # Pending appointments do not block
+        Leave.objects.create(doctor=self.away, date=self.days[1])
+
+    def search(self):
+        return find_free_slots([self.doctor.pk, self.evening.pk, self.away.pk], *self.days, 30)
+
+    def starts(self, found, doctor):
+        return [(day, start) for day, start, _ in found[doctor.pk]]
+
+    def test_free_slots(self):
+        found = self.search()
+        first, second = self.days
+        self.assertEqual(self.starts(found, self.doctor), [
+            (first, time(9, 0)), (first, time(10, 0)), (first, time(10, 30)),
+            (second, time(9, 0)), (second, time(9, 30)), (second, time(10, 0)), (second, time(10, 30)),
+        ])
+        self.assertEqual(found[self.evening.pk][-1], (second, time(23, 30), time(0, 0)))
+        self.assertEqual(len(found[self.evening.pk]), 8)
+        self.assertEqual(self.starts(found, self.away), [(first, time(9, 0)), (first, time(9, 30))])
+
+    def test_grid_blocks_do_not_change_the_slots(self):
+        found = self.search()
+        for rows in (1, 4):
+            with mock.patch.object(slots, 'GRID_ROWS', rows):
+                self.assertEqual(self.search(), found)
+
+
+class KeysetPaginationTests(AppointmentTestCase):
+    def setUp(self):
+        super().setUp()
+        # Ties on (date, start_time) between doctors are broken by id.
+        for name in ('first', 'second', 'third'):
+            doctor = create_doctor(name)
+            for day in (self.day, self.day + timedelta(days=1)):
+                for start in (time(9, 0), time(10, 0)):
+                    Appointment.objects.create(
+                        doctor=doctor, patient=self.patient, date=day, start_time=start, end_time=time(start.hour, 30)
+                    )
+        self.client = APIClient()
+        self.client.force_authenticate(self.patient)
+
+    def test_pages_cover_every_appointment_once_in_order(self):
+        url = f"{reverse('patient_appointments')}?page_size=5"
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 5)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+        expected = Appointment.objects.filter(patient=self.patient).order_by('date', 'start_time', 'id')
+        self.assertEqual(seen, [str(pk) for pk in expected.values_list('id', flat=True)])
+
+    def test_filters_apply_to_every_page(self):
+        response = self.client.get(reverse('patient_appointments'), {'date_from': self.day + timedelta(days=1)})
+        self.assertEqual(len(response.data['results']), 6)
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('patient_appointments'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class HoldStoreTests:
+    """Shared by the tests of both hold stores; ``store`` is set by setUp."""
+
+    def setUp(self):
+        super().setUp()
+        self.other = create_patient('other')
+        self.now = 1_000_000.0
+        clock = mock.patch.object(holds, 'time', mock.Mock(time=lambda: self.now))
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def place(self, patient, start, end, ttl=60, **kwargs):
+        return self.store.place(patient.pk, self.doctor.pk, self.day, start, end, ttl, **kwargs)
+
+    def blocking(self, patient, start, end):
+        return self.store.blocking(self.doctor.pk, self.day, start, end, patient.pk)
+
+    def test_hold_blocks_other_patients_until_it_expires(self):
+        self.assertIsNotNone(self.place(self.patient, time(9, 0), time(9, 30)))
+        self.assertIsNotNone(self.blocking(self.other, time(9, 15), time(9, 45)))
+        self.assertIsNone(self.blocking(self.patient, time(9, 15), time(9, 45)))
+        self.assertIsNone(self.place(self.other, time(9, 0), time(9, 30)))
+
+        self.now += 60
+        self.assertIsNone(self.blocking(self.other, time(9, 15), time(9, 45)))
+        self.assertIsNotNone(self.place(self.other, time(9, 0), time(9, 30)))
+
+    def test_new_hold_replaces_the_patients_previous_one(self):
+        self.place(self.patient, time(9, 0), time(9, 30))
+        self.place(self.patient, time(10, 0), time(10, 30))
+        self.assertIsNone(self.blocking(self.other, time(9, 0), time(9, 30)))
+        self.assertIsNotNone(self.blocking(self.other, time(10, 0), time(10, 30)))
+
+    def test_hold_is_kept_without_replace(self):
+        self.place(self.patient, time(9, 0), time(9, 30))
+        self.assertIsNone(self.place(self.patient, time(10, 0), time(10, 30), replace=False))
+        self.assertIsNotNone(self.blocking(self.other, time(9, 0), time(9, 30)))
+
+    def test_release_and_consume(self):
+        hold = self.place(self.patient, time(9, 0), time(9, 30))
+        self.assertFalse(self.store.release(hold.id, self.other.pk))
+        self.assertTrue(self.store.release(hold.id, self.patient.pk))
+        self.place(self.patient, time(9, 0), time(9, 30))
+        self.store.consume(self.patient.pk, self.doctor.pk, self.day, time(9, 0), time(9, 30))
+        self.assertIsNone(self.blocking(self.other, time(9, 0), time(9, 30)))
+
+
+class LocalHoldStoreTests(HoldStoreTests, AppointmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = LocalHoldStore()
+
+    def test_booking_a_held_slot(self):
+        self.place(self.patient, time(9, 0), time(9, 30))
+        with mock.patch.object(holds, '_store', self.store):
+            with self.assertRaisesMessage(SlotUnavailable, HELD_MESSAGE):
+                self.book(time(9, 0), time(9, 30), patient=self.other)
+            self.book(time(9, 0), time(9, 30))
+
+
+class SQLiteHoldStoreTests(HoldStoreTests, AppointmentTestCase):
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.store = SQLiteHoldStore(Path(directory.name) / 'holds.sqlite3')
+        self.addCleanup(lambda: self.store._connection.close())
+
+
+class WaitlistTests(AppointmentTestCase):
+    def setUp(self):
+        super().setUp()
+        self.store = LocalHoldStore()
+        store = mock.patch.object(holds, '_store', self.store)
+        store.start()
+        self.addCleanup(store.stop)
+        waitlist_queues._doctors.clear()
+        self.addCleanup(waitlist_queues._doctors.clear)
+
+        self.routine = self.wait(create_patient('routine'), urgency=0)
+        self.urgent = self.wait(create_patient('urgent'), urgency=2)
+        self.appointment = self.book(time(9, 0), time(9, 30), status='confirmed')
+        transition_appointments(self.doctor, 'cancelled', ids=[self.appointment.pk])
+
+    def wait(self, patient, urgency):
+        return WaitlistEntry.objects.create(
+            doctor=self.doctor, patient=patient, date_from=self.day, date_to=self.day + timedelta(days=2),
+            urgency=urgency,
+        )
+
+    def status(self, entry):
+        return WaitlistEntry.objects.values_list('status', flat=True).get(pk=entry.pk)
+
+    def test_most_urgent_entry_is_offered_the_slot_and_holds_it(self):
+        offered = offer_cancelled_slot(self.appointment)
+        self.assertEqual(offered.pk, self.urgent.pk)
+        self.assertEqual((offered.offered_date, offered.offered_start_time), (self.day, time(9, 0)))
+        self.assertEqual(self.status(self.routine), 'waiting')
+        self.assertIsNotNone(self.store.blocking(self.doctor.pk, self.day, time(9, 0), time(9, 30), self.patient.pk))
+        self.assertIsNone(offer_slot(self.doctor.pk, self.day, time(9, 0), time(9, 30)))
+
+    def test_booked_offer(self):
+        offered = offer_cancelled_slot(self.appointment)
+        appointment = book_appointment(self.doctor, offered.patient, self.day, time(9, 0), time(9, 30))
+        self.assertEqual(offer_booked(appointment), 1)
+        self.assertEqual(self.status(offered), 'booked')
+
+    def test_lapsed_offer_goes_to_the_next_entry(self):
+        offer_cancelled_slot(self.appointment)
+        self.assertEqual(expire_offers(), 0)
+        WaitlistEntry.objects.filter(pk=self.urgent.pk).update(offer_expires_at=timezone.now())
+        self.assertEqual(expire_offers(), 1)
+        self.assertEqual(self.status(self.urgent), 'expired')
+        self.assertEqual(self.status(self.routine), 'offered')
+        hold = self.store.blocking(self.doctor.pk, self.day, time(9, 0), time(9, 30), self.patient.pk)
+        self.assertEqual(hold.patient_id, self.routine.patient_id)
+
+    def test_withdrawn_offer_goes_to_the_next_entry(self):
+        offered = offer_cancelled_slot(self.appointment)
+        withdraw(offered)
+        self.assertEqual(self.status(self.urgent), 'withdrawn')
+        self.assertEqual(self.status(self.routine), 'offered')
+
+    def test_patient_holding_another_slot_keeps_waiting(self):
+        self.store.place(self.urgent.patient_id, self.doctor.pk, self.day, time(11, 0), time(11, 30), 60)
+        offered = offer_cancelled_slot(self.appointment)
+        self.assertEqual(offered.pk, self.routine.pk)
+        self.assertEqual(self.status(self.urgent), 'waiting')
+        self.assertIsNotNone(self.store.blocking(
+            self.doctor.pk, self.day, time(11, 0), time(11, 30), self.routine.patient_id
+        ))
 
-# Create your tests here.
+    def test_taken_slot_is_not_offered(self):
+        self.book(time(9, 0), time(9, 30), status='confirmed')
+        self.assertIsNone(offer_cancelled_slot(self.appointment))
+        self.assertEqual(WaitlistEntry.objects.filter(status='waiting').count(), 2)
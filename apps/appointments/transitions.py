@@ -0,0 +1,91 @@
+"""
+Bulk appointment status changes.
+
+A doctor confirms, completes or cancels many appointments at once.  The
+affected doctor-days are locked, their appointments are read in one query,
+and the change is applied with a single ``UPDATE ... WHERE status IN (...)``
+restricted to the appointments allowed to move.  Cancelling gives the
+appointments' places back to their days' booking counters.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.utils import timezone
+
+from .availability import DayAvailability
+from .booking import doctor_days_lock, lock_doctor_days, release_places
+from .models import Appointment
+
+UPDATED = 'updated'
+NOT_FOUND = 'not_found'
+INVALID_TRANSITION = 'invalid_transition'
+CONFLICT = 'conflict'
+
+
+def transition_appointments(doctor, target, ids=None, date=None):
+    """
+    Move the doctor's appointments to ``target`` status.
+
+    Appointments are selected by ``ids``, by ``date`` or by both.  Returns
+    ``(results, changed)``: ``results`` maps every selected id to
+    ``(outcome, previous_status)`` and ``changed`` lists the updated
+    appointments with their new status.  Confirming is refused for
+    appointments that would overlap another confirmed one.
+    """
+    allowed = Appointment.TRANSITIONS[target]
+    selected = Appointment.objects.filter(doctor=doctor)
+    if ids is not None:
+        selected = selected.filter(pk__in=ids)
+    if date is not None:
+        selected = selected.filter(date=date)
+
+    keys = sorted(set(selected.values_list('doctor_id', 'date')))
+    results = {pk: (NOT_FOUND, None) for pk in ids or ()}
+    if not keys:
+        return results, []
+
+    with doctor_days_lock(keys), transaction.atomic():
+        lock_doctor_days(keys)
+
+        rows = list(Appointment.objects.filter(
+            doctor=doctor, date__in={day for _, day in keys}
+        ).order_by('date', 'start_time').values_list('id', 'date', 'start_time', 'end_time', 'status'))
+        # Without ids the selection is every appointment of the (single) locked day.
+        wanted = set(ids) if ids is not None else {row[0] for row in rows}
+
+        days = {}
+        if target == 'confirmed':
+            for pk, day, start, end, status in rows:
+                if status == 'confirmed':
+                    days.setdefault(day, DayAvailability()).add(start, end, pk)
+
+        accepted = []
+        released = Counter()
+        for pk, day, start, end, status in rows:
+            if pk not in wanted:
+                continue
+            if status not in allowed:
+                if ids is not None:
+                    results[pk] = (INVALID_TRANSITION, status)
+                continue
+            if target == 'confirmed':
+                day_slots = days.setdefault(day, DayAvailability())
+                if day_slots.overlaps(start, end):
+                    results[pk] = (CONFLICT, status)
+                    continue
+                day_slots.add(start, end, pk)
+            results[pk] = (UPDATED, status)
+            if target == 'cancelled' and status in Appointment.BOOKED_STATUSES:
+                released[day] += 1
+            accepted.append(Appointment(
+                id=pk, doctor_id=doctor.pk, date=day, start_time=start, end_time=end, status=target
+            ))
+
+        if accepted:
+            Appointment.objects.filter(
+                pk__in=[appointment.pk for appointment in accepted], status__in=allowed
+            ).update(status=target, updated_at=timezone.now())
+        for day, count in released.items():
+            release_places(doctor.pk, day, count)
+
+    return results, accepted
@@ -0,0 +1,124 @@
+"""
+Unified doctor unavailability.
+
+A doctor is unavailable on a date if any of these says so:
+
+* an ``appointments.Leave`` row (keyed on the doctor's User),
+* an ``doctors.DoctorLeave`` row (keyed on the Doctor profile),
+* an inactive ``doctors.WeeklySchedule`` row for that date,
+* a day-off ``doctors.ScheduleException`` for that date.
+
+For the next ``DOCTOR_UNAVAILABILITY_HORIZON_DAYS`` days these sources are
+merged into one integer bitset per doctor (bit ``i`` = today + ``i`` days), so
+"is the doctor available on D" is a bit test and "next available day" is a
+scan for the lowest clear bit.  Bitsets are built on first use and patched a
+single day at a time by model signals (see ``signals.py``).
+"""
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from time import monotonic
+
+from django.conf import settings
+from django.utils import timezone
+
+from apps.doctors.models import DoctorLeave, ScheduleException, WeeklySchedule
+from .models import Leave
+
+
+def unavailable_days(doctor_ids, date_from, date_to):
+    """Read the unavailable dates of several doctors from all sources."""
+    days = defaultdict(set)
+    for doctor_id, day in Leave.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(date_from, date_to)
+    ).values_list('doctor_id', 'date'):
+        days[doctor_id].add(day)
+    for doctor_id, day in DoctorLeave.objects.filter(
+        doctor_id__in=doctor_ids, leave_date__range=(date_from, date_to)
+    ).values_list('doctor_id', 'leave_date'):
+        days[doctor_id].add(day)
+    for doctor_id, day in WeeklySchedule.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(date_from, date_to), is_active=False
+    ).values_list('doctor_id', 'date'):
+        days[doctor_id].add(day)
+    for doctor_id, day in ScheduleException.objects.filter(
+        doctor_id__in=doctor_ids, date__range=(date_from, date_to), is_active=False
+    ).values_list('doctor_id', 'date'):
+        days[doctor_id].add(day)
+    return days
+
+
+class UnavailabilityCalendar:
+    """Per-doctor unavailability bitsets over a rolling horizon starting today."""
+
+    def __init__(self, horizon=None, ttl=None):
+        self.horizon = horizon or getattr(settings, 'DOCTOR_UNAVAILABILITY_HORIZON_DAYS', 365)
+        self.ttl = ttl or getattr(settings, 'DOCTOR_UNAVAILABILITY_TTL', 300)
+        self._lock = threading.Lock()
+        self._bits = {}       # doctor_id -> (bitset, loaded_at)
+        self._base = None
+
+    def _offset(self, day):
+        today = timezone.localdate()
+        if today != self._base:
+            # The horizon moved; bit positions are relative to the old day.
+            self._bits.clear()
+            self._base = today
+        offset = (day - self._base).days
+        return offset if 0 <= offset < self.horizon else None
+
+    def _bitset(self, doctor_id):
+        cached = self._bits.get(doctor_id)
+        if cached is not None and monotonic() - cached[1] < self.ttl:
+            return cached[0]
+        bits = 0
+        for day in unavailable_days([doctor_id], self._base, self._base + timedelta(days=self.horizon - 1))[doctor_id]:
+            bits |= 1 << (day - self._base).days
+        self._bits[doctor_id] = (bits, monotonic())
+        return bits
+
+    def is_unavailable(self, doctor_id, day):
+        with self._lock:
+            offset = self._offset(day)
+            if offset is not None:
+                return bool(self._bitset(doctor_id) >> offset & 1)
+        # Outside the horizon: ask the database directly.
+        return bool(unavailable_days([doctor_id], day, day))
+
+    def next_available(self, doctor_id, day):
+        """First date on or after ``day`` within the horizon the doctor is available, or None."""
+        with self._lock:
+            offset = self._offset(max(day, timezone.localdate()))
+            if offset is None:
+                return None
+            free = ~self._bitset(doctor_id) & ((1 << self.horizon) - 1)
+            free >>= offset
+            if not free:
+                return None
+            return self._base + timedelta(days=offset + (free & -free).bit_length() - 1)
+
+    def refresh(self, doctor_id, day):
+        """Recompute one day of one doctor after a source row changed."""
+        with self._lock:
+            offset = self._offset(day)
+            cached = self._bits.get(doctor_id)
+            if offset is None or cached is None:
+                return
+        unavailable = bool(unavailable_days([doctor_id], day, day))
+        with self._lock:
+            cached = self._bits.get(doctor_id)
+            if cached is None or self._base + timedelta(days=offset) != day:
+                return
+            bits, loaded_at = cached
+            bits = bits | (1 << offset) if unavailable else bits & ~(1 << offset)
+            self._bits[doctor_id] = (bits, loaded_at)
+
+    def invalidate(self, doctor_id=None):
+        with self._lock:
+            if doctor_id is None:
+                self._bits.clear()
+            else:
+                self._bits.pop(doctor_id, None)
+
+
+unavailability = UnavailabilityCalendar()
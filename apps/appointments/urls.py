@@ -1,10 +1,28 @@
 from django.urls import path
-from .views import AppointmentCreateView, AppointmentUpdateView, LeaveCreateView
+from .views import AppointmentCreateView, AppointmentUpdateView, LeaveCreateView, FreeSlotSearchView, AppointmentBulkCreateView, DoctorAppointmentListView, PatientAppointmentListView, SlotHoldView, SlotHoldReleaseView, AppointmentBulkStatusView, CalendarFeedView, CalendarFeedLinkView, WaitlistView, WaitlistWithdrawView, DoctorAvailabilityView, AppointmentFeedbackView, DoctorFeedbackView
 
 urlpatterns = [
     # Appointment URLs
     path('appointments/', AppointmentCreateView.as_view(), name='create_appointment'),  # Book an appointment
     path('appointments/<uuid:pk>/', AppointmentUpdateView.as_view(), name='update_appointment'),  # Update appointment status
+    path('appointments/bulk/', AppointmentBulkCreateView.as_view(), name='bulk_create_appointments'),  # Book a series of appointments
+    path('appointments/status/', AppointmentBulkStatusView.as_view(), name='bulk_update_appointment_status'),  # Confirm/complete/cancel in bulk
+    path('appointments/doctor/', DoctorAppointmentListView.as_view(), name='doctor_appointments'),  # Doctor's appointments
+    path('appointments/patient/', PatientAppointmentListView.as_view(), name='patient_appointments'),  # Patient's appointments
+    path('appointments/holds/', SlotHoldView.as_view(), name='hold_slot'),  # Hold a slot during checkout
+    path('appointments/holds/<uuid:hold_id>/', SlotHoldReleaseView.as_view(), name='release_slot_hold'),  # Release a held slot
+    path('appointments/calendar/', CalendarFeedLinkView.as_view(), name='calendar_feed_link'),  # Signed feed URL
+    path('appointments/calendar.ics', CalendarFeedView.as_view(), name='calendar_feed'),  # iCalendar feed
+    path('appointments/availability/<uuid:doctor_id>/', DoctorAvailabilityView.as_view(), name='doctor_availability'),  # Available on a date / next available date
+    path('appointments/slots/', FreeSlotSearchView.as_view(), name='search_free_slots'),  # Find free slots across doctors
+    path('appointments/<uuid:pk>/feedback/', AppointmentFeedbackView.as_view(), name='appointment_feedback'),  # Rate a completed appointment
+
+    # Feedback URLs
+    path('feedback/doctor/<uuid:doctor_id>/', DoctorFeedbackView.as_view(), name='doctor_feedback'),  # A doctor's feedback and rating
+
+    # Waitlist URLs
+    path('waitlist/', WaitlistView.as_view(), name='waitlist'),  # Join or view the waitlist
+    path('waitlist/<uuid:pk>/', WaitlistWithdrawView.as_view(), name='withdraw_waitlist'),  # Leave the waitlist
 
     # Leave URLs
     path('leaves/', LeaveCreateView.as_view(), name='create_leave'),  # Schedule a leave
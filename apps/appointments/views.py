@@ -1,10 +1,31 @@
 from rest_framework import status, permissions, generics
 from rest_framework.response import Response
-from .models import Appointment, Leave
-from .serializers import AppointmentSerializer, LeaveSerializer
+from .models import Appointment, Feedback, Leave, WaitlistEntry
+from .serializers import AppointmentSerializer, LeaveSerializer, SlotSearchSerializer, AppointmentBulkSerializer, AppointmentBulkItemSerializer, AppointmentListQuerySerializer, SlotHoldSerializer, AppointmentTransitionSerializer, CalendarFeedQuerySerializer, WaitlistEntrySerializer, DoctorAvailabilityQuerySerializer, FeedbackSerializer
+from .waitlist import expire_offers, offer_booked, offer_cancelled_slot, waitlist_queues, withdraw
+from .ical import feed_version, iter_feed
+from .authentication import CalendarFeedKeyAuthentication, calendar_feed_key, calendar_feed_key_expiry
+from .renderers import ICalendarRenderer
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, quote_etag
+from rest_framework.settings import api_settings
+from .transitions import transition_appointments
+from .holds import get_hold_store, HELD_MESSAGE
+from .pagination import AppointmentKeysetPagination
+from .booking import book_appointments, doctor_day_lock
+from .slots import search_free_slots
+from .availability import availability_index
+from .unavailability import unavailability
+from .feedback import submit_feedback
+from apps.doctors.models import Doctor
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.generics import CreateAPIView
 from rest_framework.exceptions import PermissionDenied
+from rest_framework.views import APIView
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from datetime import datetime, timezone
 
 class AppointmentCreateView(CreateAPIView):
     queryset = Appointment.objects.all()
@@ -15,7 +36,65 @@ class AppointmentCreateView(CreateAPIView):
         # Ensure only patients can create appointments
         if self.request.user.role != "patient":
             raise PermissionDenied("You are not authorized to book an appointment.")
-        serializer.save()
+
+        # Slots other patients are holding are refused by book_appointment, under the day lock
+        appointment = serializer.save()
+        availability_index.sync(appointment)
+        get_hold_store().consume(self.request.user.pk, appointment.doctor_id, appointment.date, appointment.start_time, appointment.end_time)
+        offer_booked(appointment)
+
+class AppointmentBulkCreateView(APIView):
+    """
+    Books a series of appointments for the logged-in patient in one transaction.
+    Each entry is reported as created, invalid or conflict; one failure does not
+    prevent the others from being booked.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != "patient":
+            raise PermissionDenied("You are not authorized to book an appointment.")
+
+        serializer = AppointmentBulkSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        entries = []
+        for item in serializer.validated_data['appointments']:
+            item_serializer = AppointmentBulkItemSerializer(data=item)
+            valid = item_serializer.is_valid()
+            entries.append((valid, item_serializer.validated_data if valid else item_serializer.errors))
+
+        doctor_ids = {entry['doctor'] for valid, entry in entries if valid}
+        doctors = get_user_model().objects.filter(pk__in=doctor_ids, role='doctor').in_bulk()
+
+        holds = get_hold_store()
+        results = [None] * len(entries)
+        bookable = []
+        for index, (valid, entry) in enumerate(entries):
+            if not valid:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': entry}
+            elif entry['doctor'] not in doctors:
+                results[index] = {'index': index, 'status': 'invalid', 'errors': {'doctor': ["Doctor not found."]}}
+            else:
+                bookable.append((index, dict(entry, doctor=doctors[entry['doctor']])))
+
+        booked = book_appointments(request.user, [item for _, item in bookable])
+        for (index, _), (appointment, error) in zip(bookable, booked):
+            if appointment is None:
+                results[index] = {'index': index, 'status': 'conflict', 'errors': [error]}
+            else:
+                availability_index.sync(appointment)
+                holds.consume(request.user.pk, appointment.doctor_id, appointment.date, appointment.start_time, appointment.end_time)
+                offer_booked(appointment)
+                results[index] = {'index': index, 'status': 'created', 'appointment': AppointmentSerializer(appointment).data}
+
+        created = sum(result['status'] == 'created' for result in results)
+        return Response({
+            'created': created,
+            'failed': len(results) - created,
+            'results': results,
+        }, status=status.HTTP_201_CREATED if created == len(results) else status.HTTP_207_MULTI_STATUS)
 
 class AppointmentUpdateView(generics.UpdateAPIView):
     """
@@ -30,6 +109,171 @@ class AppointmentUpdateView(generics.UpdateAPIView):
             raise permissions.PermissionDenied("Only doctors can update appointments.")
         return Appointment.objects.filter(doctor=user)
 
+    def perform_update(self, serializer):
+        appointment = serializer.save()
+        availability_index.sync(appointment)
+
+class AppointmentBulkStatusView(APIView):
+    """
+    Lets doctors confirm, complete or cancel many appointments at once, e.g.
+    "confirm all pending appointments on a date" or "cancel these ids".
+    Allowed changes: pending -> confirmed -> completed, and any -> cancelled.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != 'doctor':
+            raise PermissionDenied("Only doctors can update appointments.")
+
+        serializer = AppointmentTransitionSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        results, changed = transition_appointments(
+            request.user, data['status'], ids=data.get('ids'), date=data.get('date')
+        )
+        for appointment in changed:
+            availability_index.sync(appointment)
+            if appointment.status == 'cancelled':
+                offer_cancelled_slot(appointment)
+
+        return Response({
+            'status': data['status'],
+            'updated': len(changed),
+            'results': [
+                {'id': pk, 'result': outcome, 'previous_status': previous}
+                for pk, (outcome, previous) in results.items()
+            ],
+        }, status=status.HTTP_200_OK)
+
+class AppointmentListView(generics.ListAPIView):
+    """
+    Base for the appointment lists; filters by ?date_from, ?date_to and ?status
+    and pages with a keyset cursor on (date, start_time, id).
+    """
+    serializer_class = AppointmentSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    pagination_class = AppointmentKeysetPagination
+    role = None
+    owner_field = None
+
+    def get_queryset(self):
+        user = self.request.user
+        if user.role != self.role:
+            raise PermissionDenied(f"Only {self.role}s can view this list.")
+
+        query = AppointmentListQuerySerializer(data=self.request.query_params)
+        query.is_valid(raise_exception=True)
+        filters = query.validated_data
+
+        queryset = Appointment.objects.filter(**{self.owner_field: user})
+        if 'date_from' in filters:
+            queryset = queryset.filter(date__gte=filters['date_from'])
+        if 'date_to' in filters:
+            queryset = queryset.filter(date__lte=filters['date_to'])
+        if filters.get('status'):
+            queryset = queryset.filter(status__in=filters['status'])
+        return queryset
+
+class DoctorAppointmentListView(AppointmentListView):
+    """
+    Lists the logged-in doctor's appointments.
+    """
+    role = 'doctor'
+    owner_field = 'doctor'
+
+class PatientAppointmentListView(AppointmentListView):
+    """
+    Lists the logged-in patient's appointments.
+    """
+    role = 'patient'
+    owner_field = 'patient'
+
+class CalendarFeedView(APIView):
+    """
+    Streams the logged-in doctor's or patient's appointments (and a doctor's
+    leaves) as an iCalendar feed. Polling clients that send the last ETag
+    in If-None-Match get a 304 without the feed being rebuilt.
+    """
+    authentication_classes = [CalendarFeedKeyAuthentication] + api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    renderer_classes = [ICalendarRenderer] + api_settings.DEFAULT_RENDERER_CLASSES
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        role = request.user.role
+        if role not in ('doctor', 'patient'):
+            raise PermissionDenied("Only doctors and patients have a calendar feed.")
+
+        query = CalendarFeedQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        date_from, date_to = query.validated_data['date_from'], query.validated_data['date_to']
+
+        etag = quote_etag(feed_version(request.user, role, date_from, date_to))
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = StreamingHttpResponse(
+            iter_feed(request.user, role, date_from, date_to),
+            content_type='text/calendar; charset=utf-8',
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        response['Content-Disposition'] = 'inline; filename="appointments.ics"'
+        return response
+
+class CalendarFeedLinkView(APIView):
+    """
+    Returns the logged-in user's calendar feed URL, signed so that calendar
+    apps can subscribe to it without sending a token. The URL expires, and
+    stops working when the user changes their password.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        url = f"{reverse('calendar_feed')}?key={calendar_feed_key(request.user)}"
+        return Response({
+            'feed_url': request.build_absolute_uri(url),
+            'expires_at': calendar_feed_key_expiry(),
+        }, status=status.HTTP_200_OK)
+
+class WaitlistView(generics.ListCreateAPIView):
+    """
+    Lets patients join a doctor's waitlist for a window of dates and see their
+    entries. Cancelled slots in the window are offered (and held) automatically.
+    """
+    serializer_class = WaitlistEntrySerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        if self.request.user.role != 'patient':
+            raise PermissionDenied("Only patients can use the waitlist.")
+        return WaitlistEntry.objects.filter(patient=self.request.user).order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        # Show lapsed offers as expired even between runs of expire_waitlist_offers
+        expire_offers(patient=request.user)
+        return super().list(request, *args, **kwargs)
+
+    def perform_create(self, serializer):
+        if self.request.user.role != 'patient':
+            raise PermissionDenied("Only patients can use the waitlist.")
+        entry = serializer.save(patient=self.request.user)
+        waitlist_queues.add(entry)
+
+class WaitlistWithdrawView(generics.DestroyAPIView):
+    """
+    Withdraws one of the logged-in patient's waitlist entries.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return WaitlistEntry.objects.filter(patient=self.request.user)
+
+    def perform_destroy(self, instance):
+        withdraw(instance)
+
 class LeaveCreateView(generics.CreateAPIView):
     """
     Allows doctors to schedule leaves.
@@ -42,3 +286,147 @@ class LeaveCreateView(generics.CreateAPIView):
         if user.role != 'doctor':
             raise permissions.PermissionDenied("Only doctors can schedule leaves.")
         serializer.save(doctor=user)
+
+
+class SlotHoldView(APIView):
+    """
+    Holds a slot for the logged-in patient for a limited time while they
+    complete the booking. A patient holds at most one slot; a new hold
+    replaces the previous one.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role != "patient":
+            raise PermissionDenied("You are not authorized to book an appointment.")
+
+        serializer = SlotHoldSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        # Under the day lock, so a booking running meanwhile sees the hold or finishes first
+        with doctor_day_lock(data['doctor'].pk, data['date']):
+            hold = get_hold_store().place(
+                request.user.pk, data['doctor'].pk, data['date'], data['start_time'], data['end_time'], data['ttl']
+            )
+        if hold is None:
+            return Response({"error": HELD_MESSAGE}, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'id': hold.id,
+            'doctor': data['doctor'].pk,
+            'date': data['date'],
+            'start_time': data['start_time'],
+            'end_time': data['end_time'],
+            'expires_at': datetime.fromtimestamp(hold.expires_at, tz=timezone.utc),
+        }, status=status.HTTP_201_CREATED)
+
+class SlotHoldReleaseView(APIView):
+    """
+    Releases a hold placed by the logged-in patient.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def delete(self, request, hold_id, *args, **kwargs):
+        if not get_hold_store().release(str(hold_id), request.user.pk):
+            return Response({"error": "Hold not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class DoctorAvailabilityView(APIView):
+    """
+    Tells whether a doctor is available on a date (no leave, no inactive
+    schedule) and the first available date from then on.
+    """
+
+    def get(self, request, doctor_id, *args, **kwargs):
+        if not get_user_model().objects.filter(pk=doctor_id, role='doctor').exists():
+            return Response({"error": "Doctor not found."}, status=status.HTTP_404_NOT_FOUND)
+        serializer = DoctorAvailabilityQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        day = serializer.validated_data['date']
+        next_available = unavailability.next_available(doctor_id, day)
+        return Response({
+            'doctor': doctor_id,
+            'date': day,
+            'available': not unavailability.is_unavailable(doctor_id, day),
+            'next_available': next_available,
+        }, status=status.HTTP_200_OK)
+
+
+class AppointmentFeedbackView(APIView):
+    """
+    Lets a patient rate one of their completed appointments, once.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, pk, *args, **kwargs):
+        if request.user.role != 'patient':
+            raise PermissionDenied("Only patients can leave feedback.")
+        appointment = Appointment.objects.filter(pk=pk, patient=request.user).first()
+        if appointment is None:
+            return Response({"error": "Appointment not found."}, status=status.HTTP_404_NOT_FOUND)
+        if appointment.status != 'completed':
+            return Response({"error": "Only completed appointments can be rated."}, status=status.HTTP_400_BAD_REQUEST)
+        if Feedback.objects.filter(appointment=appointment).exists():
+            return Response({"error": "This appointment has already been rated."}, status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = FeedbackSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            feedback = submit_feedback(appointment, **serializer.validated_data)
+        except IntegrityError:  # Rated concurrently
+            return Response({"error": "This appointment has already been rated."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(FeedbackSerializer(feedback).data, status=status.HTTP_201_CREATED)
+
+
+class DoctorFeedbackView(generics.ListAPIView):
+    """
+    A doctor's feedback, newest first, with their rating aggregates.
+    """
+    serializer_class = FeedbackSerializer
+
+    def get_queryset(self):
+        return Feedback.objects.filter(doctor_id=self.kwargs['doctor_id']).select_related('patient').order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        doctor = Doctor.objects.filter(pk=self.kwargs['doctor_id']).first()
+        if doctor is None:
+            return Response({"error": "Doctor not found."}, status=status.HTTP_404_NOT_FOUND)
+        response = super().list(request, *args, **kwargs)
+        response.data['rating'] = {
+            'count': doctor.rating_count,
+            'average': round(doctor.rating_sum / doctor.rating_count, 2) if doctor.rating_count else None,
+            'bayesian': round(doctor.rating, 2),
+            'histogram': doctor.rating_histogram,
+        }
+        return response
+
+
+class FreeSlotSearchView(APIView):
+    """
+    Lists doctors with free slots of the requested length in a date range.
+    Results are paginated by doctor; pass `next` back as `cursor` for the next page.
+    """
+
+    def get(self, request, *args, **kwargs):
+        serializer = SlotSearchSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        results, next_cursor = search_free_slots(
+            params['date_from'],
+            params['date_to'],
+            params['duration'],
+            specialization=params.get('specialization'),
+            cursor=params.get('cursor'),
+            page_size=params['page_size'],
+            step=params.get('step'),
+        )
+        return Response({
+            'next': str(next_cursor) if next_cursor else None,
+            'results': results,
+        }, status=status.HTTP_200_OK)
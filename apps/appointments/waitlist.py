@@ -0,0 +1,204 @@
+"""
+Waitlist priority queues.
+
+Each doctor has one min-heap per date; an entry waiting for a window of
+dates is pushed onto the heap of every date in the window, ordered by
+urgency (highest first) and then by registration time.  Offering a freed
+slot pops the heap of that slot's date, so finding the next patient costs
+O(log n) instead of a scan of the waitlist table.  Entries that were offered
+or withdrawn through another date's heap are skipped lazily when popped.
+
+Queues are built from the database the first time a doctor is needed and
+rebuilt after ``WAITLIST_QUEUE_TTL`` seconds; offers are claimed with a
+conditional UPDATE so concurrent processes never offer one entry twice.
+
+An offer ends one of three ways: the patient books the slot (``offer_booked``
+marks the entry ``booked``), withdraws the entry, or lets the offer lapse
+(``expire_offers``, run by ``manage.py expire_waitlist_offers``, marks it
+``expired``).  A withdrawn or lapsed offer's slot goes to the next entry.
+"""
+import heapq
+import threading
+from datetime import timedelta
+from time import monotonic
+
+from django.conf import settings
+from django.utils import timezone
+
+from .booking import doctor_day_lock, slot_taken
+from .holds import get_hold_store
+from .models import WaitlistEntry
+
+
+class DoctorWaitlist:
+    """Waiting entries of one doctor, as per-date heaps."""
+
+    __slots__ = ('days', 'waiting', 'loaded_at')
+
+    def __init__(self):
+        self.days = {}         # date -> heap of (-urgency, created_at, entry_id)
+        self.waiting = set()   # entry ids still waiting
+        self.loaded_at = monotonic()
+
+    def push(self, entry_id, date_from, date_to, urgency, created_at):
+        key = (-urgency, created_at, entry_id)
+        self.waiting.add(entry_id)
+        day = date_from
+        while day <= date_to:
+            heapq.heappush(self.days.setdefault(day, []), key)
+            day += timedelta(days=1)
+
+    def discard(self, entry_id):
+        self.waiting.discard(entry_id)
+
+    def pop(self, day):
+        """Remove and return the next waiting entry id for a date, or None."""
+        heap = self.days.get(day)
+        while heap:
+            entry_id = heapq.heappop(heap)[2]
+            if entry_id in self.waiting:
+                self.waiting.discard(entry_id)
+                return entry_id
+        return None
+
+    def drop_before(self, day):
+        for past in [past for past in self.days if past < day]:
+            del self.days[past]
+
+
+class WaitlistQueues:
+    """Lazily loaded ``DoctorWaitlist`` per doctor."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or getattr(settings, 'WAITLIST_QUEUE_TTL', 300)
+        self._lock = threading.Lock()
+        self._doctors = {}
+
+    def _load(self, doctor_id):
+        queue = DoctorWaitlist()
+        today = timezone.localdate()
+        for pk, date_from, date_to, urgency, created_at in WaitlistEntry.objects.filter(
+            doctor_id=doctor_id, status='waiting', date_to__gte=today
+        ).values_list('id', 'date_from', 'date_to', 'urgency', 'created_at').iterator():
+            queue.push(pk, max(date_from, today), date_to, urgency, created_at)
+        return queue
+
+    def _queue(self, doctor_id):
+        queue = self._doctors.get(doctor_id)
+        if queue is None or monotonic() - queue.loaded_at >= self.ttl:
+            queue = self._doctors[doctor_id] = self._load(doctor_id)
+        return queue
+
+    def add(self, entry):
+        with self._lock:
+            queue = self._doctors.get(entry.doctor_id)
+            if queue is not None:
+                queue.push(entry.pk, entry.date_from, entry.date_to, entry.urgency, entry.created_at)
+
+    def discard(self, entry):
+        with self._lock:
+            queue = self._doctors.get(entry.doctor_id)
+            if queue is not None:
+                queue.discard(entry.pk)
+
+    def next_for(self, doctor_id, day):
+        with self._lock:
+            queue = self._queue(doctor_id)
+            queue.drop_before(timezone.localdate())
+            return queue.pop(day)
+
+
+waitlist_queues = WaitlistQueues()
+
+
+def offer_slot(doctor_id, date, start_time, end_time):
+    """
+    Offer a free slot to the next eligible waitlist entry and hold the slot
+    for that patient. Returns the offered entry or None.
+    """
+    if date < timezone.localdate():
+        return None
+    ttl = getattr(settings, 'WAITLIST_OFFER_TTL', 900)
+    holds = get_hold_store()
+    skipped = []
+
+    # Under the day lock, so no booking or hold of the slot slips in meanwhile.
+    with doctor_day_lock(doctor_id, date):
+        if slot_taken(doctor_id, date, start_time, end_time) or holds.blocking(
+            doctor_id, date, start_time, end_time, None
+        ):
+            return None
+        try:
+            while True:
+                entry_id = waitlist_queues.next_for(doctor_id, date)
+                if entry_id is None:
+                    return None
+                claimed = WaitlistEntry.objects.filter(pk=entry_id, status='waiting').update(
+                    status='offered',
+                    offered_date=date,
+                    offered_start_time=start_time,
+                    offered_end_time=end_time,
+                    offer_expires_at=timezone.now() + timedelta(seconds=ttl),
+                )
+                if not claimed:
+                    continue  # Offered or withdrawn elsewhere since the queue was loaded
+                entry = WaitlistEntry.objects.get(pk=entry_id)
+                # Never replace a hold the patient is checking out with.
+                if holds.place(entry.patient_id, doctor_id, date, start_time, end_time, ttl, replace=False):
+                    return entry
+                # The patient is holding another slot; keep them waiting and try the next entry.
+                WaitlistEntry.objects.filter(pk=entry_id).update(
+                    status='waiting', offered_date=None, offered_start_time=None,
+                    offered_end_time=None, offer_expires_at=None,
+                )
+                entry.status = 'waiting'
+                skipped.append(entry)
+        finally:
+            for entry in skipped:
+                waitlist_queues.add(entry)
+
+
+def offer_cancelled_slot(appointment):
+    """Offer a cancelled appointment's slot; see ``offer_slot``."""
+    return offer_slot(appointment.doctor_id, appointment.date, appointment.start_time, appointment.end_time)
+
+
+def _pass_on(entry):
+    """Release the slot an entry was offered and offer it to the next one."""
+    get_hold_store().consume(
+        entry.patient_id, entry.doctor_id, entry.offered_date, entry.offered_start_time, entry.offered_end_time,
+    )
+    return offer_slot(entry.doctor_id, entry.offered_date, entry.offered_start_time, entry.offered_end_time)
+
+
+def expire_offers(**filters):
+    """Mark lapsed offers ``expired`` and pass their slots on; returns how many expired."""
+    expired = 0
+    lapsed = WaitlistEntry.objects.filter(status='offered', offer_expires_at__lte=timezone.now(), **filters)
+    for entry in lapsed.order_by('offer_expires_at'):
+        if WaitlistEntry.objects.filter(pk=entry.pk, status='offered').update(status='expired'):
+            expired += 1
+            _pass_on(entry)
+    return expired
+
+
+def withdraw(entry):
+    """Take an entry off the waitlist; a slot it was offered goes to the next entry."""
+    offered = WaitlistEntry.objects.filter(pk=entry.pk, status='offered').update(status='withdrawn')
+    if not offered:
+        WaitlistEntry.objects.filter(pk=entry.pk, status='waiting').update(status='withdrawn')
+    waitlist_queues.discard(entry)
+    if offered:
+        _pass_on(entry)
+
+
+def offer_booked(appointment):
+    """Mark the patient's offer of a slot they have just booked as ``booked``."""
+    return WaitlistEntry.objects.filter(
+        patient_id=appointment.patient_id,
+        doctor_id=appointment.doctor_id,
+        status='offered',
+        offered_date=appointment.date,
+        offered_start_time__lt=appointment.end_time,
+        offered_end_time__gt=appointment.start_time,
+    ).update(status='booked')
@@ -1,5 +1,18 @@
-from django.contrib import admin
-from .models import Doctor, Specialization, WeeklySchedule, DoctorLeave
+import io
+
+from django import forms
+from django.contrib import admin, messages
+from django.shortcuts import redirect
+from django.template.response import TemplateResponse
+from django.urls import path
+from .models import Doctor, Specialization, WeeklySchedule, DoctorLeave, ScheduleTemplate, ScheduleException
+from .importer import FORMATS, import_doctors, read_rows
+
+
+class DoctorImportForm(forms.Form):
+    file = forms.FileField(help_text="CSV with a header row, or JSON Lines; one doctor per row.")
+    format = forms.ChoiceField(choices=[(format, format.upper()) for format in FORMATS])
+
 
 # Doctor Admin Configuration
 class DoctorAdmin(admin.ModelAdmin):
@@ -33,6 +46,34 @@ class DoctorAdmin(admin.ModelAdmin):
         queryset.update(is_active=False)
     deactivate_doctors.short_description = "Deactivate selected doctors"
 
+    # Bulk import from an uploaded file, linked from the change list
+    change_list_template = 'admin/doctors/doctor/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='doctors_doctor_import'),
+        ] + super().get_urls()
+
+    def import_view(self, request):
+        if not self.has_add_permission(request):
+            return redirect('admin:doctors_doctor_changelist')
+        form = DoctorImportForm(request.POST or None, request.FILES or None)
+        if request.method == 'POST' and form.is_valid():
+            stream = io.TextIOWrapper(form.cleaned_data['file'].file, encoding='utf-8-sig', newline='')
+            result = import_doctors(read_rows(stream, form.cleaned_data['format']))
+            messages.success(request, f"{result.created} of {result.rows} doctors imported in {result.seconds:.1f}s.")
+            for line, errors in result.errors[:20]:
+                messages.warning(request, f"Line {line}: {'; '.join(errors)}")
+            if len(result.errors) > 20:
+                messages.warning(request, f"... and {len(result.errors) - 20} more rows skipped.")
+            return redirect('admin:doctors_doctor_changelist')
+        return TemplateResponse(request, 'admin/doctors/doctor/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'form': form,
+            'title': "Import doctors",
+        })
+
 
 # Specialization Admin Configuration
 class SpecializationAdmin(admin.ModelAdmin):
@@ -72,3 +113,16 @@ class DoctorLeaveAdmin(admin.ModelAdmin):
     search_fields = ['doctor__user__full_name', 'reason']
     list_filter = ['leave_date']
     ordering = ('doctor', 'leave_date')
+
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'weekdays', 'start_time', 'end_time', 'valid_from', 'valid_until')
+    search_fields = ['doctor__user__full_name']
+    ordering = ('doctor', 'valid_from')
+
+@admin.register(ScheduleException)
+class ScheduleExceptionAdmin(admin.ModelAdmin):
+    list_display = ('doctor', 'date', 'is_active', 'start_time', 'end_time', 'reason')
+    search_fields = ['doctor__user__full_name', 'reason']
+    list_filter = ['is_active', 'date']
+    ordering = ('doctor', 'date')
@@ -0,0 +1,134 @@
+"""
+Doctor directory cache.
+
+The public doctor list and detail endpoints serve pre-serialized doctor
+documents from the Django cache (``DOCTOR_DIRECTORY_CACHE``).  A full
+directory read is two cache lookups when everything is cached; missing
+documents are built together from ``values_list`` rows (see
+``representations.py``) in a few queries per chunk of doctors.
+
+Documents are dropped by model signals (see ``signals.py``) when anything they
+contain changes, and expire after ``DOCTOR_DIRECTORY_TTL`` seconds to pick up
+writes that bypass signals, such as ``QuerySet.update()``.  Detail documents
+embed schedules expanded from templates for a window starting today, so their
+keys include the date.
+
+The change counters behind the directory endpoints' ETags (see
+``core.conditional``) are bumped together with the invalidations.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import Doctor
+from .representations import doctor_details, doctor_summaries
+
+KEY_PREFIX = 'doctor-directory'
+SUMMARY = 'summary'
+DETAIL = 'detail'
+
+# Same output as DoctorSerializer and DoctorSerializerAll
+BUILDERS = {
+    SUMMARY: doctor_summaries,
+    DETAIL: doctor_details,
+}
+# Orders the id list can be read in; ``rating`` is served by doctor_rating_idx
+ORDERINGS = {
+    'default': ('pk',),
+    'rating': ('-rating', '-rating_count', 'pk'),
+}
+
+# Version keys for conditional GETs: one per doctor, one for the whole listing
+LISTING_VERSION = 'doctors'
+SPECIALIZATIONS_VERSION = 'specializations'
+
+
+def doctor_version(doctor_id):
+    return f'doctor:{doctor_id}'
+
+
+
+class DoctorDirectory:
+    """Cached doctor documents with per-process hit/miss counters."""
+
+    def __init__(self, cache_alias=None, ttl=None):
+        self.cache_alias = cache_alias or getattr(settings, 'DOCTOR_DIRECTORY_CACHE', 'default')
+        self.ttl = ttl or getattr(settings, 'DOCTOR_DIRECTORY_TTL', 3600)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def _key(self, kind, doctor_id):
+        if kind == DETAIL:
+            return f'{KEY_PREFIX}:{kind}:{timezone.localdate()}:{doctor_id}'
+        return f'{KEY_PREFIX}:{kind}:{doctor_id}'
+
+    def _count(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def ids(self, ordering='default'):
+        """Ids of all doctors, in one of the ``ORDERINGS``."""
+        key = f'{KEY_PREFIX}:ids:{ordering}'
+        ids = self.cache.get(key)
+        if ids is None:
+            self._count(0, 1)
+            ids = [str(pk) for pk in Doctor.objects.order_by(*ORDERINGS[ordering]).values_list('pk', flat=True)]
+            self.cache.set(key, ids, self.ttl)
+        else:
+            self._count(1, 0)
+        return ids
+
+    def documents(self, kind, doctor_ids):
+        """Documents of the given doctors, in the same order; unknown ids are skipped."""
+        doctor_ids = [str(doctor_id) for doctor_id in doctor_ids]
+        keys = {doctor_id: self._key(kind, doctor_id) for doctor_id in doctor_ids}
+        cached = self.cache.get_many(list(keys.values()))
+        missing = [doctor_id for doctor_id in doctor_ids if keys[doctor_id] not in cached]
+        self._count(len(doctor_ids) - len(missing), len(missing))
+
+        built = self._build(kind, missing) if missing else {}
+        if built:
+            self.cache.set_many({keys[doctor_id]: document for doctor_id, document in built.items()}, self.ttl)
+
+        documents = []
+        for doctor_id in doctor_ids:
+            document = cached.get(keys[doctor_id], built.get(doctor_id))
+            if document is not None:
+                documents.append(document)
+        return documents
+
+    def document(self, kind, doctor_id):
+        documents = self.documents(kind, [doctor_id])
+        return documents[0] if documents else None
+
+    def _build(self, kind, doctor_ids):
+        return BUILDERS[kind](doctor_ids)
+
+    def invalidate(self, doctor_ids=(), listing=False):
+        """Drop the documents of some doctors and, with ``listing``, the id lists."""
+        keys = [self._key(kind, doctor_id) for doctor_id in doctor_ids for kind in BUILDERS]
+        if listing:
+            keys.extend(f'{KEY_PREFIX}:ids:{ordering}' for ordering in ORDERINGS)
+        if keys:
+            self.cache.delete_many(keys)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': round(hits / total, 4) if total else None,
+        }
+
+
+doctor_directory = DoctorDirectory()
@@ -0,0 +1,181 @@
+"""
+Faceted doctor filtering.
+
+Every doctor gets a slot number, and every facet value keeps the set of
+doctors having it as an integer bitset (bit ``slot`` set).  A filter is the
+intersection, across facets, of the union of the selected values within each
+facet, so it costs a handful of big-integer ANDs and ORs.  Facet counts are
+popcounts of each value's bitset intersected with the selections of the
+*other* facets, so picking one fee band still shows how many doctors every
+other fee band would give.
+
+The index is built from one query on first use, patched from model signals
+(see ``signals.py``) and rebuilt every ``DOCTOR_FACETS_TTL`` seconds to pick up
+writes that bypass signals or come from other processes.
+"""
+import re
+import threading
+from decimal import Decimal
+from time import monotonic
+
+from django.conf import settings
+
+from .models import Doctor, Specialization
+
+# (label, lower bound inclusive, upper bound exclusive or None)
+FEE_BANDS = [
+    ('0-500', 0, 500),
+    ('500-1000', 500, 1000),
+    ('1000-2000', 1000, 2000),
+    ('2000+', 2000, None),
+]
+EXPERIENCE_BANDS = [
+    ('0-5', 0, 5),
+    ('5-10', 5, 10),
+    ('10-20', 10, 20),
+    ('20+', 20, None),
+]
+FACETS = ('specialization', 'fee', 'experience', 'is_active')
+
+SET_BIT = re.compile('1')
+
+
+def band(bands, value):
+    for label, low, high in bands:
+        if value >= low and (high is None or value < high):
+            return label
+    return None
+
+
+def facet_values(specialization_id, consultation_fee, years_of_experience, is_active):
+    """The value of every facet for one doctor; out-of-band numbers are left out."""
+    values = {
+        'specialization': str(specialization_id),
+        'fee': band(FEE_BANDS, Decimal(consultation_fee)),
+        'experience': band(EXPERIENCE_BANDS, int(years_of_experience)),
+        'is_active': 'true' if is_active else 'false',
+    }
+    return {facet: value for facet, value in values.items() if value is not None}
+
+
+def bit_positions(bits):
+    """Positions of the set bits, lowest first."""
+    return [match.start() for match in SET_BIT.finditer(bin(bits)[:1:-1])]
+
+
+class FacetIndex:
+    """Per-facet posting bitsets over doctor slots."""
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or getattr(settings, 'DOCTOR_FACETS_TTL', 300)
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._postings = {}   # facet -> {value: bitset}
+        self._slots = {}      # doctor_id -> slot
+        self._doctors = []    # slot -> doctor_id (None once deleted)
+        self._values = {}     # doctor_id -> facet values it is posted under
+        self._alive = 0       # Bitset of occupied slots
+        self._labels = {}     # specialization_id -> name
+
+    def _ensure_loaded(self):
+        if self._loaded_at is not None and monotonic() - self._loaded_at < self.ttl:
+            return
+        self._postings = {facet: {} for facet in FACETS}
+        self._slots, self._doctors, self._values, self._alive = {}, [], {}, 0
+        self._labels = {str(pk): name for pk, name in Specialization.objects.values_list('pk', 'name')}
+        for doctor_id, *fields in Doctor.objects.order_by('pk').values_list(
+            'pk', 'specialization_id', 'consultation_fee', 'years_of_experience', 'is_active'
+        ).iterator(chunk_size=5000):
+            self._put(str(doctor_id), facet_values(*fields))
+        self._loaded_at = monotonic()
+
+    def _put(self, doctor_id, values):
+        slot = self._slots.get(doctor_id)
+        if slot is None:
+            slot = self._slots[doctor_id] = len(self._doctors)
+            self._doctors.append(doctor_id)
+            self._alive |= 1 << slot
+        bit = 1 << slot
+        for facet, value in self._values.get(doctor_id, {}).items():
+            self._postings[facet][value] &= ~bit
+        for facet, value in values.items():
+            postings = self._postings[facet]
+            postings[value] = postings.get(value, 0) | bit
+        self._values[doctor_id] = values
+
+    def update(self, doctor):
+        """Re-post a saved doctor under its current facet values."""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            self._put(str(doctor.pk), facet_values(
+                doctor.specialization_id, doctor.consultation_fee, doctor.years_of_experience, doctor.is_active
+            ))
+
+    def remove(self, doctor_id):
+        doctor_id = str(doctor_id)
+        with self._lock:
+            slot = self._slots.pop(doctor_id, None)
+            if slot is None:
+                return
+            bit = 1 << slot
+            for facet, value in self._values.pop(doctor_id).items():
+                self._postings[facet][value] &= ~bit
+            self._alive &= ~bit
+            self._doctors[slot] = None
+
+    def invalidate(self):
+        """Rebuild on next use, e.g. after writes that bypass signals."""
+        with self._lock:
+            self._loaded_at = None
+
+    def rename(self, specialization_id, name):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._labels[str(specialization_id)] = name
+
+    def _selection(self, facet, values):
+        postings = self._postings[facet]
+        selected = 0
+        for value in values:
+            selected |= postings.get(value, 0)
+        return selected
+
+    def _label(self, facet, value):
+        if facet == 'specialization':
+            return self._labels.get(value, value)
+        return value
+
+    def query(self, filters, offset=0, limit=50):
+        """
+        Apply ``filters`` (facet -> list of accepted values) and return
+        ``(total, doctor_ids of the page, counts)`` where ``counts`` lists
+        ``{'value', 'label', 'count'}`` per facet.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            selections = {
+                facet: self._selection(facet, values) for facet, values in filters.items() if values
+            }
+            counts = {}
+            for facet in FACETS:
+                others = self._alive
+                for other, selected in selections.items():
+                    if other != facet:
+                        others &= selected
+                counts[facet] = sorted(
+                    (
+                        {'value': value, 'label': self._label(facet, value), 'count': (bits & others).bit_count()}
+                        for value, bits in self._postings[facet].items() if bits
+                    ),
+                    key=lambda item: (-item['count'], item['label']),
+                )
+            matched = self._alive
+            for selected in selections.values():
+                matched &= selected
+            positions = bit_positions(matched)
+            page = [self._doctors[slot] for slot in positions[offset:offset + limit]]
+        return len(positions), page, counts
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,203 @@
+"""
+Streaming bulk import of doctors.
+
+Rows (from CSV or JSON Lines, see ``read_rows``) are read and written in
+chunks of ``DOCTOR_IMPORT_CHUNK_SIZE``, so memory stays flat whatever the
+input size.  Per chunk:
+
+* every row is validated with ``DoctorImportRowSerializer``, and emails and
+  license numbers are checked against the database in one query each and
+  against earlier rows of the input;
+* passwords are hashed in a process pool (``DOCTOR_IMPORT_HASH_WORKERS``,
+  see ``passwords.py``), since each hash is deliberately slow;
+* specializations are resolved through a name -> id map loaded once, and
+  unknown names are created in bulk;
+* users, doctors and schedule templates are written with ``bulk_create`` in
+  one transaction.  Should the chunk still fail (e.g. a user registered the
+  same email meanwhile) its rows are retried one by one, so only the
+  offending rows are reported.
+
+Invalid rows are reported with their line number and never stop the import.
+``bulk_create`` sends no model signals, so ``doctors_imported`` is sent per
+chunk for the directory, search and facet indexes to catch up.
+"""
+import csv
+import json
+import os
+import time
+from collections import namedtuple
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from django.dispatch import Signal
+
+from .models import Doctor, ScheduleTemplate, Specialization
+from .passwords import password_hasher
+from .serializers import DoctorImportRowSerializer
+
+User = get_user_model()
+
+FORMATS = ('csv', 'jsonl')
+
+# Sent after each chunk with the ids of the doctors and specializations it created.
+doctors_imported = Signal()
+
+
+class ImportResult(namedtuple('ImportResult', 'rows created errors seconds')):
+    """``errors`` lists ``(line, messages)`` for every row that was skipped."""
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def read_rows(stream, format):
+    """Yield ``(line, row)`` from a text stream; rows that cannot be parsed come as ``(line, None)``."""
+    if format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == 'jsonl':
+        for line, text in enumerate(stream, 1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unknown import format {format!r}; expected one of {', '.join(FORMATS)}.")
+
+
+def import_doctors(rows, chunk_size=None, workers=None):
+    """Import ``(line, row)`` pairs as returned by ``read_rows``; returns an ``ImportResult``."""
+    chunk_size = chunk_size or getattr(settings, 'DOCTOR_IMPORT_CHUNK_SIZE', 1000)
+    workers = workers if workers is not None else getattr(settings, 'DOCTOR_IMPORT_HASH_WORKERS', os.cpu_count() or 1)
+
+    importer = _Importer()
+    began = time.perf_counter()
+    rows = iter(rows)
+    with password_hasher(workers) as hash_passwords:
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            importer.import_chunk(chunk, hash_passwords)
+    return ImportResult(importer.rows, importer.created, sorted(importer.errors), time.perf_counter() - began)
+
+
+class _Importer:
+    def __init__(self):
+        self.specializations = dict(Specialization.objects.values_list('name', 'pk'))
+        self.emails = set()
+        self.licenses = set()
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+
+    def import_chunk(self, chunk, hash_passwords):
+        self.rows += len(chunk)
+        valid = self.validate(chunk)
+        if not valid:
+            return
+        hashed = iter(hash_passwords([data['password'] for _, data in valid if data.get('password')]))
+        for _, data in valid:
+            data['password'] = next(hashed) if data.get('password') else make_password(None)
+        new_specializations = self.resolve_specializations(valid)
+
+        try:
+            with transaction.atomic():
+                doctor_ids = self.insert(valid)
+        except IntegrityError:
+            doctor_ids = []
+            for line, data in valid:
+                try:
+                    with transaction.atomic():
+                        doctor_ids += self.insert([(line, data)])
+                except IntegrityError as error:
+                    self.errors.append((line, [str(error)]))
+        self.created += len(doctor_ids)
+        doctors_imported.send(sender=Doctor, doctor_ids=doctor_ids, specialization_ids=new_specializations)
+
+    def validate(self, chunk):
+        valid = []
+        for line, row in chunk:
+            if row is None:
+                self.errors.append((line, ["Row could not be parsed."]))
+                continue
+            # Empty CSV cells mean "not given", so defaults apply.
+            serializer = DoctorImportRowSerializer(data={key: value for key, value in row.items() if value not in ('', None)})
+            if not serializer.is_valid():
+                self.errors.append((line, [
+                    f"{field}: {message}" for field, messages in serializer.errors.items() for message in messages
+                ]))
+                continue
+            data = dict(serializer.validated_data)
+            data['email'] = User.objects.normalize_email(data['email'])
+            valid.append((line, data))
+
+        taken_emails = set(User.objects.filter(email__in=[data['email'] for _, data in valid]).values_list('email', flat=True))
+        taken_licenses = set(Doctor.objects.filter(
+            license_number__in=[data['license_number'] for _, data in valid]
+        ).values_list('license_number', flat=True))
+        unique = []
+        for line, data in valid:
+            messages = []
+            if data['email'] in taken_emails or data['email'] in self.emails:
+                messages.append("email: A user with this email already exists.")
+            if data['license_number'] in taken_licenses or data['license_number'] in self.licenses:
+                messages.append("license_number: A doctor with this license number already exists.")
+            if messages:
+                self.errors.append((line, messages))
+                continue
+            self.emails.add(data['email'])
+            self.licenses.add(data['license_number'])
+            unique.append((line, data))
+        return unique
+
+    def resolve_specializations(self, valid):
+        """Create the specializations the map does not know yet; returns their ids."""
+        missing = {}
+        for _, data in valid:
+            if data['specialization'] not in self.specializations:
+                missing.setdefault(data['specialization'], data['specialization_description'])
+        if not missing:
+            return []
+        created = Specialization.objects.bulk_create([
+            Specialization(name=name, description=description) for name, description in missing.items()
+        ])
+        self.specializations.update({specialization.name: specialization.pk for specialization in created})
+        return [specialization.pk for specialization in created]
+
+    def insert(self, valid):
+        users, doctors, templates = [], [], []
+        for _, data in valid:
+            user = User(
+                email=data['email'], full_name=data['full_name'], number=data.get('number') or None,
+                role='doctor', password=data['password'],
+            )
+            users.append(user)
+            doctors.append(Doctor(
+                user=user,
+                specialization_id=self.specializations[data['specialization']],
+                degree=data['degree'],
+                license_number=data['license_number'],
+                years_of_experience=data['years_of_experience'],
+                consultation_fee=data['consultation_fee'],
+                profile_description=data['profile_description'],
+                max_patients_per_day=data['max_patients_per_day'],
+                is_active=data['is_active'],
+            ))
+            if data.get('schedule_weekdays'):
+                templates.append(ScheduleTemplate(
+                    doctor=doctors[-1], weekdays=data['schedule_weekdays'],
+                    start_time=data['schedule_start'], end_time=data['schedule_end'],
+                ))
+        User.objects.bulk_create(users)
+        Doctor.objects.bulk_create(doctors)
+        ScheduleTemplate.objects.bulk_create(templates)
+        return [doctor.pk for doctor in doctors]
@@ -0,0 +1,100 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.doctors.models import Doctor, Specialization
+from apps.doctors.search import FTS5Backend, InvertedIndexBackend, tokenize
+
+User = get_user_model()
+
+BENCH_DOMAIN = '@bench-search.local'
+
+FIRST_NAMES = ['Anita', 'Rahul', 'Priya', 'Vikram', 'Meera', 'Arjun', 'Kavya', 'Rohan', 'Sneha', 'Aditya',
+               'Ishaan', 'Nisha', 'Karan', 'Pooja', 'Sanjay', 'Divya', 'Amit', 'Lakshmi', 'Farhan', 'Zoya']
+LAST_NAMES = ['Sharma', 'Verma', 'Iyer', 'Reddy', 'Nair', 'Gupta', 'Khan', 'Das', 'Menon', 'Joshi',
+              'Kapoor', 'Singh', 'Rao', 'Bose', 'Pillai', 'Chopra', 'Mehta', 'Banerjee', 'Kulkarni', 'Patel']
+SPECIALIZATIONS = {
+    'Cardiology': 'Heart and blood vessel disorders',
+    'Dermatology': 'Skin, hair and nail conditions',
+    'Neurology': 'Brain, spinal cord and nerve disorders',
+    'Orthopedics': 'Bones, joints and muscles',
+    'Pediatrics': 'Medical care of infants and children',
+    'Psychiatry': 'Mental health and behavioural disorders',
+    'Oncology': 'Diagnosis and treatment of cancer',
+    'Endocrinology': 'Hormones, diabetes and thyroid',
+}
+PROFILE_WORDS = ('experienced consultant specialist surgery diabetes thyroid asthma allergy migraine arthritis '
+                 'hypertension pregnancy fertility vaccination sports injury sleep anxiety depression eczema acne '
+                 'stroke epilepsy fracture spine knee shoulder cancer chemotherapy screening').split()
+
+
+class Command(BaseCommand):
+    help = (
+        "Time doctor searches on a synthetic directory with both the FTS5 and the in-memory "
+        "backend. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.run(rng, options)
+            transaction.set_rollback(True)
+
+    def run(self, rng, options):
+        password = make_password(None)
+        specializations = [
+            Specialization.objects.create(name=f'{name} (bench)', description=description)
+            for name, description in SPECIALIZATIONS.items()
+        ]
+        users = User.objects.bulk_create([
+            User(email=f'doctor{i}{BENCH_DOMAIN}', role='doctor', password=password,
+                 full_name=f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}')
+            for i in range(options['doctors'])
+        ], batch_size=2000)
+        Doctor.objects.bulk_create([
+            Doctor(user=user, specialization=rng.choice(specializations), license_number=f'SEARCH-{i}',
+                   years_of_experience=rng.randrange(40), consultation_fee=rng.randrange(200, 3000),
+                   profile_description=' '.join(rng.sample(PROFILE_WORDS, 8)))
+            for i, user in enumerate(users)
+        ], batch_size=2000)
+
+        vocabulary = FIRST_NAMES + LAST_NAMES + list(SPECIALIZATIONS) + PROFILE_WORDS
+        queries = []
+        for _ in range(options['queries']):
+            words = rng.sample(vocabulary, rng.choice((1, 2, 2, 3)))
+            # Half of the queries type an unfinished last word.
+            if rng.random() < 0.5:
+                words[-1] = words[-1][:max(3, len(words[-1]) // 2)]
+            queries.append(words)
+
+        backends = [InvertedIndexBackend()]
+        if FTS5Backend.available():
+            backends.insert(0, FTS5Backend())
+        for backend in backends:
+            began = time.perf_counter()
+            backend.rebuild()
+            built = time.perf_counter() - began
+            timings = []
+            matches = 0
+            for words in queries:
+                terms = tokenize(' '.join(words))
+                began = time.perf_counter()
+                total, page = backend.search(terms, 0, 20)
+                timings.append(time.perf_counter() - began)
+                matches += total
+            timings.sort()
+            self.stdout.write(
+                f"{backend.name:6} {options['doctors']} doctors: index built in {built:.1f}s; "
+                f"{len(queries)} queries, median {timings[len(timings) // 2] * 1000:.1f} ms, "
+                f"p95 {timings[int(len(timings) * 0.95)] * 1000:.1f} ms, "
+                f"{matches / len(queries):.0f} matches/query"
+            )
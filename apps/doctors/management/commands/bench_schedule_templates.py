@@ -0,0 +1,121 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connection, transaction
+
+from apps.doctors.models import Doctor, ScheduleTemplate, Specialization, WeeklySchedule
+from apps.doctors.scheduling import DEFAULT_HOURS, generate_schedules, iter_working_hours
+
+User = get_user_model()
+
+BENCH_DOMAIN = '@bench-schedules.local'
+
+
+def table_bytes(table):
+    """On-disk size of a table and its indexes, where the database can tell."""
+    queries = {
+        'sqlite': ("SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                   "(SELECT name FROM sqlite_master WHERE tbl_name = %s AND type = 'index')", [table, table]),
+        'postgresql': ("SELECT pg_total_relation_size(%s)", [table]),
+    }
+    if connection.vendor not in queries:
+        return None
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(*queries[connection.vendor])
+            return cursor.fetchone()[0] or 0
+    except DatabaseError:
+        return None
+
+
+def megabytes(size):
+    return 'n/a' if size is None else f"{size / 1e6:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-date WeeklySchedule rows with recurring ScheduleTemplate rows on a "
+        "synthetic set of doctors: rows and bytes stored, and time to read schedule windows. "
+        "Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=5000)
+        parser.add_argument('--days', type=int, default=365, help='Days of schedule per doctor.')
+        parser.add_argument('--window', type=int, default=7, help='Days read per lookup.')
+        parser.add_argument('--lookups', type=int, default=500, help='Doctor windows to read.')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.run(rng, options)
+            transaction.set_rollback(True)
+
+    def run(self, rng, options):
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(email=f'doctor{i}{BENCH_DOMAIN}', role='doctor', password=password)
+            for i in range(options['doctors'])
+        ])
+        specialization = Specialization.objects.create(name='Benchmark', description='Synthetic doctors')
+        Doctor.objects.bulk_create([
+            Doctor(user=user, specialization=specialization, license_number=f'BENCH-{i}',
+                   years_of_experience=1, consultation_fee=0)
+            for i, user in enumerate(users)
+        ], batch_size=1000)
+        doctor_ids = [user.pk for user in users]
+
+        start = date.today()
+        end = start + timedelta(days=options['days'] - 1)
+        windows = []
+        for _ in range(options['lookups']):
+            day = start + timedelta(days=rng.randrange(options['days'] - options['window'] + 1))
+            windows.append((rng.choice(doctor_ids), day, day + timedelta(days=options['window'] - 1)))
+
+        # Per-date rows
+        bytes_before = table_bytes(WeeklySchedule._meta.db_table)
+        result = generate_schedules(doctor_ids, start, end)
+        row_bytes = table_bytes(WeeklySchedule._meta.db_table)
+        row_bytes = None if row_bytes is None or bytes_before is None else row_bytes - bytes_before
+        began = time.perf_counter()
+        from_rows = [
+            list(WeeklySchedule.objects.filter(
+                doctor_id=doctor_id, date__range=(date_from, date_to), is_active=True
+            ).order_by('date').values_list('doctor_id', 'date', 'start_time', 'end_time'))
+            for doctor_id, date_from, date_to in windows
+        ]
+        rows_time = time.perf_counter() - began
+        WeeklySchedule.objects.filter(doctor_id__in=doctor_ids).delete()
+
+        # One template per doctor
+        bytes_before = table_bytes(ScheduleTemplate._meta.db_table)
+        weekdays = sum(1 << weekday for weekday in DEFAULT_HOURS)
+        start_time, end_time = DEFAULT_HOURS[0]
+        ScheduleTemplate.objects.bulk_create([
+            ScheduleTemplate(doctor_id=doctor_id, weekdays=weekdays, start_time=start_time,
+                             end_time=end_time, valid_from=start, valid_until=end)
+            for doctor_id in doctor_ids
+        ], batch_size=1000)
+        template_bytes = table_bytes(ScheduleTemplate._meta.db_table)
+        template_bytes = None if template_bytes is None or bytes_before is None else template_bytes - bytes_before
+        began = time.perf_counter()
+        from_templates = [
+            list(iter_working_hours([doctor_id], date_from, date_to))
+            for doctor_id, date_from, date_to in windows
+        ]
+        templates_time = time.perf_counter() - began
+
+        lookups = len(windows)
+        self.stdout.write(
+            f"{options['doctors']} doctors x {options['days']} days, {lookups} lookups of {options['window']} days\n"
+            f"per-date rows: {result.rows} rows, {megabytes(row_bytes)}, written in {result.seconds:.1f}s; "
+            f"{rows_time / lookups * 1000:.2f} ms/lookup (1 query)\n"
+            f"templates:     {len(doctor_ids)} rows, {megabytes(template_bytes)}; "
+            f"{templates_time / lookups * 1000:.2f} ms/lookup (3 queries)\n"
+            f"same working hours: {from_rows == from_templates}"
+        )
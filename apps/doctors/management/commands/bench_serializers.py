@@ -0,0 +1,109 @@
+import random
+import time
+from datetime import date, time as clock, timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from apps.doctors.models import Doctor, DoctorLeave, ScheduleTemplate, Specialization, WeeklySchedule
+from apps.doctors.representations import CHUNK_SIZE, doctor_details, doctor_summaries, specializations
+from apps.doctors.serializers import DoctorSerializer, DoctorSerializerAll, SpecializationSerializer
+
+User = get_user_model()
+
+BENCH_DOMAIN = '@bench-serializers.local'
+
+
+def serializer_documents(serializer, doctor_ids, prefetch=()):
+    """The reference path: model instances through a DRF serializer, in the same chunks."""
+    documents = {}
+    for i in range(0, len(doctor_ids), CHUNK_SIZE):
+        doctors = Doctor.objects.filter(pk__in=doctor_ids[i:i + CHUNK_SIZE]).select_related('user', 'specialization')
+        if prefetch:
+            doctors = doctors.prefetch_related(*prefetch)
+        documents.update({str(doctor.pk): dict(serializer(doctor).data) for doctor in doctors})
+    return documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the DRF serializers against the values_list fast path on synthetic data and check "
+        "that both render the same JSON. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with transaction.atomic():
+            self.run(rng, sorted(options['sizes']))
+            transaction.set_rollback(True)
+
+    def run(self, rng, sizes):
+        count = sizes[-1]
+        self.stdout.write(f"Creating {count} doctors and specializations...")
+        specs = Specialization.objects.bulk_create([
+            Specialization(name=f'Bench specialization {i}', description=f'Description {i}') for i in range(count)
+        ], batch_size=2000)
+        password = make_password(None)
+        users = User.objects.bulk_create([
+            User(email=f'doctor{i}{BENCH_DOMAIN}', role='doctor', password=password, full_name=f'Doctor {i}')
+            for i in range(count)
+        ], batch_size=2000)
+        doctors = Doctor.objects.bulk_create([
+            Doctor(user=user, specialization=specs[rng.randrange(50)], license_number=f'SERIALIZE-{i}',
+                   years_of_experience=rng.randrange(40), consultation_fee=rng.randrange(20000, 300000) / 100)
+            for i, user in enumerate(users)
+        ], batch_size=2000)
+        # Every 5th doctor has a leave, every 10th a week of stored rows and a template.
+        today = date.today()
+        DoctorLeave.objects.bulk_create([
+            DoctorLeave(doctor=doctor, leave_date=date(1990, 1, 1) + timedelta(days=i), reason='Bench')
+            for i, doctor in enumerate(doctors[::5])
+        ], batch_size=2000)
+        WeeklySchedule.objects.bulk_create([
+            WeeklySchedule(doctor=doctor, date=today + timedelta(days=day), day_of_week=(today + timedelta(days=day)).weekday(),
+                           start_time=clock(9), end_time=clock(17))
+            for doctor in doctors[::10] for day in range(7)
+        ], batch_size=2000)
+        ScheduleTemplate.objects.bulk_create([
+            ScheduleTemplate(doctor=doctor, valid_from=today) for doctor in doctors[::10]
+        ], batch_size=2000)
+
+        doctor_ids = [str(doctor.pk) for doctor in doctors]
+        bench_specs = Specialization.objects.filter(name__startswith='Bench specialization ').order_by('pk')
+        renderer = JSONRenderer()
+        for size in sizes:
+            ids = doctor_ids[:size]
+            cases = [
+                ('specializations',
+                 lambda: SpecializationSerializer(bench_specs[:size], many=True).data,
+                 lambda: specializations(bench_specs[:size])),
+                ('doctor summary',
+                 lambda: serializer_documents(DoctorSerializer, ids),
+                 lambda: doctor_summaries(ids)),
+                ('doctor detail',
+                 lambda: serializer_documents(DoctorSerializerAll, ids, (
+                     'weekly_schedules', 'leaves', 'schedule_templates', 'schedule_exceptions')),
+                 lambda: doctor_details(ids)),
+            ]
+            for name, slow, fast in cases:
+                began = time.perf_counter()
+                expected = slow()
+                slow_seconds = time.perf_counter() - began
+                began = time.perf_counter()
+                actual = fast()
+                fast_seconds = time.perf_counter() - began
+                if isinstance(expected, dict):
+                    expected, actual = [expected[i] for i in ids], [actual[i] for i in ids]
+                same = renderer.render(expected) == renderer.render(actual)
+                self.stdout.write(
+                    f"{name:16} {size:>7} rows: serializer {slow_seconds * 1000:9.1f} ms, "
+                    f"fast path {fast_seconds * 1000:9.1f} ms ({slow_seconds / fast_seconds:4.1f}x), "
+                    f"identical: {same}"
+                )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from apps.doctors.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = "Rebuild the doctor search index from scratch, e.g. after bulk imports that bypass signals."
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(f"Rebuilt the {backend.name} doctor search index.")
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.5 on 2026-10-18 13:10
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0003_alter_weeklyschedule_unique_together_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleException',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('is_active', models.BooleanField(default=False)),
+                ('start_time', models.TimeField(blank=True, null=True)),
+                ('end_time', models.TimeField(blank=True, null=True)),
+                ('reason', models.TextField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_exceptions', to='doctors.doctor')),
+            ],
+            options={
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('weekdays', models.PositiveSmallIntegerField(default=63)),
+                ('start_time', models.TimeField(default='10:00:00')),
+                ('end_time', models.TimeField(default='18:00:00')),
+                ('valid_from', models.DateField(default=django.utils.timezone.localdate)),
+                ('valid_until', models.DateField(blank=True, null=True)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='schedule_templates', to='doctors.doctor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['doctor', 'valid_from'], name='schedule_template_doctor_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations
+from django.db.utils import OperationalError
+
+CREATE = [
+    "CREATE VIRTUAL TABLE doctor_search USING fts5("
+    "full_name, specialization, specialization_description, profile_description, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+    "CREATE TABLE doctor_search_ids (rowid INTEGER PRIMARY KEY, doctor_id TEXT NOT NULL UNIQUE)",
+]
+DROP = [
+    "DROP TABLE IF EXISTS doctor_search",
+    "DROP TABLE IF EXISTS doctor_search_ids",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """Create and fill the FTS5 doctor search table; skipped where FTS5 is unavailable."""
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(CREATE[0])
+        except OperationalError:
+            return  # SQLite built without FTS5; apps.doctors.search falls back to memory
+        cursor.execute(CREATE[1])
+
+        Doctor = apps.get_model('doctors', 'Doctor')
+        rows = list(Doctor.objects.values_list(
+            'pk', 'user__full_name', 'specialization__name', 'specialization__description', 'profile_description'
+        ))
+        cursor.executemany(
+            "INSERT INTO doctor_search_ids (rowid, doctor_id) VALUES (%s, %s)",
+            [(rowid, str(row[0])) for rowid, row in enumerate(rows, 1)],
+        )
+        cursor.executemany(
+            "INSERT INTO doctor_search (rowid, full_name, specialization, specialization_description, "
+            "profile_description) VALUES (%s, %s, %s, %s, %s)",
+            [(rowid, *(field or '' for field in row[1:])) for rowid, row in enumerate(rows, 1)],
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for statement in DROP:
+            cursor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('doctors', '0004_scheduletemplate_scheduleexception'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -16,6 +16,11 @@ class Specialization(models.Model):
 
 
 class Doctor(models.Model):
+    # Bayesian smoothing of ratings: the mean starts at the prior and moves
+    # towards the doctor's own average as ratings come in.
+    RATING_PRIOR_MEAN = 3.0
+    RATING_PRIOR_WEIGHT = 5
+
     user = models.OneToOneField(
         User,
         on_delete=models.CASCADE,
@@ -31,9 +36,30 @@ class Doctor(models.Model):
     max_patients_per_day = models.IntegerField(default=10)
     is_active = models.BooleanField(default=True)
 
+    # Running rating aggregates, changed by apps.doctors.ratings in the same
+    # transaction as every feedback write instead of recomputed with AVG().
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating = models.FloatField(default=RATING_PRIOR_MEAN)  # Bayesian mean, used for sorting
+    rating_1 = models.PositiveIntegerField(default=0)
+    rating_2 = models.PositiveIntegerField(default=0)
+    rating_3 = models.PositiveIntegerField(default=0)
+    rating_4 = models.PositiveIntegerField(default=0)
+    rating_5 = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Doctor listings sorted by rating (see DoctorDirectory.ids)
+            models.Index(fields=['-rating', '-rating_count', 'user'], name='doctor_rating_idx'),
+        ]
+
     def __str__(self):
         return f"Dr. {self.user.full_name} ({self.specialization.name})"
 
+    @property
+    def rating_histogram(self):
+        return {star: getattr(self, f'rating_{star}') for star in range(1, 6)}
+
 class WeeklySchedule(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="weekly_schedules")
@@ -54,34 +80,69 @@ class WeeklySchedule(models.Model):
         """
         Generate a weekly schedule for the given doctor from the given start_date to end_date.
         """
+        from .scheduling import DEFAULT_HOURS, generate_schedules
+
         if not start_date:
             start_date = datetime.now().date()  # Default to today
         if not end_date:
             end_date = start_date + timedelta(days=(6 - start_date.weekday()))  # End of the week
 
-        schedules = []
-        for single_date in (start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)):
-            day_of_week = single_date.weekday()  # Get the day of the week (0: Monday, 6: Sunday)
-
-            # Skip Sundays (or any other inactive days if needed)
-            if day_of_week == 6:
-                continue
-
-            # Use update_or_create to handle existing schedules
-            schedule, created = cls.objects.update_or_create(
-                doctor=doctor,
-                date=single_date,
-                defaults={
-                    "day_of_week": day_of_week,
-                    "start_time": "10:00:00",  # Default start time
-                    "end_time": "18:00:00",    # Default end time
-                    "is_active": True,
-                },
-            )
-            schedules.append(schedule)
-
-        return schedules
+        # Mon-Sat 10:00-18:00, written in one bulk upsert instead of a query per day
+        generate_schedules([doctor.pk], start_date, end_date, hours=DEFAULT_HOURS)
+        return list(cls.objects.filter(
+            doctor=doctor, date__range=(start_date, end_date), day_of_week__in=list(DEFAULT_HOURS)
+        ).order_by('date'))
+
+
+
+class ScheduleTemplate(models.Model):
+    """
+    Recurring working hours, e.g. "Mon-Sat 10:00-18:00 from March on", stored
+    as one row instead of one WeeklySchedule row per date.  Expanded on demand
+    by ``apps.doctors.scheduling``.
+    """
+    MONDAY_TO_SATURDAY = 0b0111111
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="schedule_templates")
+    weekdays = models.PositiveSmallIntegerField(default=MONDAY_TO_SATURDAY)  # Bit 0: Monday ... bit 6: Sunday
+    start_time = models.TimeField(default="10:00:00")
+    end_time = models.TimeField(default="18:00:00")
+    valid_from = models.DateField(default=timezone.localdate)
+    valid_until = models.DateField(blank=True, null=True)  # Open-ended when empty
 
+    class Meta:
+        indexes = [models.Index(fields=['doctor', 'valid_from'], name='schedule_template_doctor_idx')]
+
+    def __str__(self):
+        days = ''.join(name if self.weekdays >> i & 1 else '-' for i, name in enumerate('MTWTFSS'))
+        return f"{self.doctor_id} {days} {self.start_time}-{self.end_time} from {self.valid_from}"
+
+    def runs_on(self, day):
+        return bool(self.weekdays >> day.weekday() & 1) and self.valid_from <= day and (
+            self.valid_until is None or day <= self.valid_until
+        )
+
+
+class ScheduleException(models.Model):
+    """
+    One date that differs from the doctor's templates: a day off, or other
+    hours when ``start_time``/``end_time`` are given.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="schedule_exceptions")
+    date = models.DateField()
+    is_active = models.BooleanField(default=False)  # False: day off
+    start_time = models.TimeField(blank=True, null=True)
+    end_time = models.TimeField(blank=True, null=True)
+    reason = models.TextField(blank=True, null=True)
+
+    class Meta:
+        unique_together = ('doctor', 'date')
+
+    def __str__(self):
+        hours = f"{self.start_time}-{self.end_time}" if self.is_active else "off"
+        return f"{self.doctor_id} - {self.date} ({hours})"
 
 
 class DoctorLeave(models.Model):
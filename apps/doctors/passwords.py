@@ -0,0 +1,29 @@
+"""
+Password hashing in a process pool, for bulk account creation.
+
+Kept free of model imports: spawned workers import this module before
+Django is set up.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import django
+from django.contrib.auth.hashers import make_password
+
+
+def _setup_worker():
+    # Spawned workers start without Django; settings come from the inherited environment.
+    django.setup()
+
+
+@contextmanager
+def password_hasher(workers):
+    """Yield a function hashing a list of passwords, in ``workers`` processes when more than one."""
+    if workers <= 1:
+        yield lambda passwords: [make_password(password) for password in passwords]
+        return
+    # Spawned rather than forked workers: forking a threaded web server is unsafe.
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_setup_worker) as executor:
+        yield lambda passwords: list(executor.map(make_password, passwords, chunksize=max(1, len(passwords) // (workers * 4))))
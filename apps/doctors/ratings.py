@@ -0,0 +1,66 @@
+"""
+Running rating aggregates on ``Doctor``.
+
+Each feedback write changes the doctor's count, sum, histogram bucket and
+Bayesian mean with one ``UPDATE`` of the doctor row, in the caller's
+transaction, so listings read a stored, indexed ``rating`` instead of running
+``AVG()`` over the feedback table.  The ``SET`` expressions all see the row's
+values from before the update (as in SQLite and PostgreSQL), so the mean is
+computed from the new count and sum in the same statement.
+
+``ratings_changed`` is sent after every change; the doctors signals use it
+to refresh the directory, as ``QuerySet.update()`` sends no model signals.
+"""
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Cast
+from django.dispatch import Signal
+
+from .models import Doctor
+
+# Sent with ``doctor_ids`` after their aggregates changed.
+ratings_changed = Signal()
+
+RATINGS = range(1, 6)
+
+
+def bayesian_rating(count, total):
+    prior_weight, prior_mean = Doctor.RATING_PRIOR_WEIGHT, Doctor.RATING_PRIOR_MEAN
+    return (prior_weight * prior_mean + total) / (prior_weight + count)
+
+
+def record_rating(doctor_id, rating, sign=1):
+    """Add (``sign=1``) or take back (``sign=-1``) one rating of a doctor."""
+    if rating not in RATINGS:
+        raise ValueError(f"Ratings go from 1 to 5, not {rating!r}.")
+    count = F('rating_count') + sign
+    total = F('rating_sum') + sign * rating
+    Doctor.objects.filter(pk=doctor_id).update(
+        rating_count=count,
+        rating_sum=total,
+        rating=(
+            (Value(Doctor.RATING_PRIOR_WEIGHT * Doctor.RATING_PRIOR_MEAN) + Cast(total, FloatField()))
+            / (Value(float(Doctor.RATING_PRIOR_WEIGHT)) + Cast(count, FloatField()))
+        ),
+        **{f'rating_{rating}': F(f'rating_{rating}') + sign},
+    )
+    ratings_changed.send(sender=Doctor, doctor_ids=[doctor_id])
+
+
+def set_ratings(histograms):
+    """
+    Overwrite the aggregates of doctors from ``{doctor_id: {rating: count}}``,
+    e.g. counted from the feedback table; doctors left out are not touched.
+    """
+    doctors = []
+    for doctor_id, histogram in histograms.items():
+        doctor = Doctor(pk=doctor_id)
+        for rating in RATINGS:
+            setattr(doctor, f'rating_{rating}', histogram.get(rating, 0))
+        doctor.rating_count = sum(histogram.get(rating, 0) for rating in RATINGS)
+        doctor.rating_sum = sum(rating * histogram.get(rating, 0) for rating in RATINGS)
+        doctor.rating = bayesian_rating(doctor.rating_count, doctor.rating_sum)
+        doctors.append(doctor)
+    fields = ['rating_count', 'rating_sum', 'rating', *(f'rating_{rating}' for rating in RATINGS)]
+    Doctor.objects.bulk_update(doctors, fields, batch_size=500)
+    if doctors:
+        ratings_changed.send(sender=Doctor, doctor_ids=list(histograms))
@@ -0,0 +1,169 @@
+"""
+Read-only fast path for the doctor serializers.
+
+Serializing model instances through DRF costs a model instance, an
+attribute lookup per field and a ``to_representation`` call per value, per
+row.  For the hot read endpoints this module builds the same dicts from
+``values_list`` tuples instead: each serializer's fields are compiled once
+into a row mapper that zips the tuple with the field names and converts only
+the values whose representation differs from the database value (UUIDs,
+decimals, dates and times, using the DRF field itself so formats follow the
+REST framework settings).
+
+The output is identical to ``SpecializationSerializer``, ``DoctorSerializer``
+and ``DoctorSerializerAll``; ``bench_serializers`` checks that while timing
+both paths.  Writes and validation still go through the serializers.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from rest_framework import serializers
+
+from .models import Doctor, DoctorLeave, ScheduleException, ScheduleTemplate, Specialization, WeeklySchedule
+from .scheduling import expand_window, schedule_window
+from .serializers import (
+    DoctorLeaveSerializer, DoctorSerializer, DoctorSerializerAll, SpecializationSerializer, WeeklyScheduleSerializer,
+)
+
+User = get_user_model()
+
+CHUNK_SIZE = 2000  # Doctors per query, well below SQLite's bound-parameter limit
+
+
+def compile_field(field):
+    """A function turning a database value into ``field``'s representation, or None when they are equal."""
+    if isinstance(field, (serializers.CharField, serializers.IntegerField, serializers.BooleanField)):
+        return None
+    if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+        return None  # The related pk, as stored
+    if isinstance(field, serializers.UUIDField) and field.uuid_format == 'hex_verbose':
+        return str
+    return field.to_representation
+
+
+def compile_serializer(serializer_class, lookups=None, prefix=''):
+    """
+    ``(lookups, to_dict)`` for a serializer of plain fields: ``to_dict`` turns
+    ``values_list(*lookups)`` rows into that serializer's representation.
+    ``lookups`` overrides the column of fields whose source is not one, and
+    ``prefix`` reads the fields through a relation.
+    """
+    lookups = lookups or {}
+    columns = []
+    for name, field in serializer_class().fields.items():
+        if not field.write_only:
+            columns.append((name, prefix + lookups.get(name, field.source.replace('.', '__')), compile_field(field)))
+    return [lookup for _, lookup, _ in columns], row_mapper([(name, convert) for name, _, convert in columns])
+
+
+def row_mapper(columns):
+    """A function mapping a row to a dict, for ``columns`` of ``(name, convert or None)`` in row order."""
+    names = [name for name, _ in columns]
+    converted = [(i, name, convert) for i, (name, convert) in enumerate(columns) if convert is not None]
+
+    def to_dict(row):
+        data = dict(zip(names, row))
+        for i, name, convert in converted:
+            value = row[i]
+            if value is not None:  # Serializers leave None as it is
+                data[name] = convert(value)
+        return data
+    return to_dict
+
+
+SPECIALIZATION_LOOKUPS, specialization_dict = compile_serializer(SpecializationSerializer)
+# ``specialization`` is a CharField over the foreign key, i.e. the specialization's __str__.
+SUMMARY_LOOKUPS, summary_dict = compile_serializer(DoctorSerializer, lookups={'specialization': 'specialization__name'})
+LEAVE_LOOKUPS, leave_dict = compile_serializer(DoctorLeaveSerializer)
+SCHEDULE_LOOKUPS, schedule_dict = compile_serializer(WeeklyScheduleSerializer)
+
+_detail_fields = DoctorSerializerAll().fields
+NESTED_DETAIL_FIELDS = ('user', 'specialization', 'weekly_schedule', 'leaves')
+DETAIL_LOOKUPS = [field.source for name, field in _detail_fields.items() if name not in NESTED_DETAIL_FIELDS]
+detail_scalars = row_mapper([
+    (name, compile_field(field)) for name, field in _detail_fields.items() if name not in NESTED_DETAIL_FIELDS
+])
+DETAIL_ORDER = list(_detail_fields)
+USER_LOOKUPS = ['user__id', 'user__full_name', 'user__email', 'user__profile_photo']
+photo_storage = User._meta.get_field('profile_photo').storage
+nested_specialization = compile_serializer(SpecializationSerializer, prefix='specialization__')
+
+
+def specializations(queryset=None):
+    queryset = Specialization.objects.all() if queryset is None else queryset
+    return [specialization_dict(row) for row in queryset.values_list(*SPECIALIZATION_LOOKUPS)]
+
+
+def _chunks(doctor_ids):
+    doctor_ids = list(doctor_ids)
+    for i in range(0, len(doctor_ids), CHUNK_SIZE):
+        yield doctor_ids[i:i + CHUNK_SIZE]
+
+
+def doctor_summaries(doctor_ids):
+    """``DoctorSerializer`` documents by doctor id (as a string)."""
+    documents = {}
+    for chunk in _chunks(doctor_ids):
+        for row in Doctor.objects.filter(pk__in=chunk).values_list('pk', *SUMMARY_LOOKUPS):
+            documents[str(row[0])] = summary_dict(row[1:])
+    return documents
+
+
+def doctor_details(doctor_ids, date_from=None):
+    """``DoctorSerializerAll`` documents by doctor id (as a string), in six queries per chunk of doctors."""
+    documents = {}
+    for chunk in _chunks(doctor_ids):
+        documents.update(_doctor_details(chunk, date_from))
+    return documents
+
+
+def _doctor_details(doctor_ids, date_from):
+    date_from, date_to = schedule_window(date_from)
+    specialization_lookups, to_specialization = nested_specialization
+
+    schedules = defaultdict(list)
+    for row in WeeklySchedule.objects.filter(doctor_id__in=doctor_ids).values_list(*SCHEDULE_LOOKUPS):
+        schedules[row[0]].append(row)
+    leaves = defaultdict(list)
+    for row in DoctorLeave.objects.filter(doctor_id__in=doctor_ids).values_list('doctor_id', *LEAVE_LOOKUPS):
+        leaves[row[0]].append(leave_dict(row[1:]))
+    # Templates and exceptions are few; expanding them reuses the model-based helpers.
+    templates = defaultdict(list)
+    for template in ScheduleTemplate.objects.filter(doctor_id__in=doctor_ids):
+        templates[template.doctor_id].append(template)
+    exceptions = defaultdict(dict)
+    for exception in ScheduleException.objects.filter(doctor_id__in=doctor_ids):
+        exceptions[exception.doctor_id][exception.date] = exception
+
+    documents = {}
+    n_user, n_specialization = len(USER_LOOKUPS), len(specialization_lookups)
+    for row in Doctor.objects.filter(pk__in=doctor_ids).values_list(
+        'pk', *USER_LOOKUPS, *specialization_lookups, *DETAIL_LOOKUPS
+    ):
+        doctor_id = row[0]
+        user_id, full_name, email, photo = row[1:1 + n_user]
+        stored = schedules.get(doctor_id, [])
+        doctor_schedule = [schedule_dict(schedule) for schedule in stored]
+        doctor_templates = sorted(templates.get(doctor_id, []), key=lambda template: template.valid_from)
+        doctor_exceptions = exceptions.get(doctor_id, {})
+        if doctor_templates or doctor_exceptions:
+            taken = {schedule[1] for schedule in stored}
+            doctor_schedule += [
+                schedule_dict((doctor_id, day, day.weekday(), start_time, end_time, is_active))
+                for day, start_time, end_time, is_active in expand_window(
+                    taken, doctor_templates, doctor_exceptions, date_from, date_to
+                )
+            ]
+
+        parts = detail_scalars(row[1 + n_user + n_specialization:])
+        parts['user'] = {
+            'id': str(user_id),
+            'full_name': full_name,
+            'email': email,
+            'profile_photo': photo_storage.url(photo) if photo else None,
+        }
+        parts['specialization'] = to_specialization(row[1 + n_user:1 + n_user + n_specialization])
+        parts['weekly_schedule'] = doctor_schedule
+        parts['leaves'] = leaves.get(doctor_id, [])
+        documents[str(doctor_id)] = {name: parts[name] for name in DETAIL_ORDER}
+    return documents
@@ -0,0 +1,212 @@
+"""
+Doctor working hours.
+
+Bulk generation: all target ``WeeklySchedule`` rows for a set of doctors and
+a date range are computed in memory and written with
+``bulk_create(update_conflicts=True)``, one chunk per transaction.  Existing
+rows for the same (doctor, date) are overwritten, so running the generator
+twice yields the same schedule.
+
+Templates: a ``ScheduleTemplate`` row stands for every date it recurs on and
+is expanded lazily, only for the window a caller asks about.  Per-date
+``WeeklySchedule`` rows and ``ScheduleException`` rows refine it; a day off
+in either always wins.
+"""
+import time
+from collections import defaultdict, namedtuple
+from datetime import time as clock, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .models import ScheduleException, ScheduleTemplate, WeeklySchedule
+
+# Monday to Saturday 10:00-18:00, Sunday off
+DEFAULT_HOURS = {weekday: (clock(10), clock(18)) for weekday in range(6)}
+
+
+class GenerationResult(namedtuple('GenerationResult', ['doctors', 'rows', 'seconds'])):
+    __slots__ = ()
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else float(self.rows)
+
+
+# Sent after a generation run; bulk writes bypass the model save signals.
+schedules_generated = Signal()  # kwargs: doctor_ids, start_date, end_date
+
+
+def iter_schedules(doctor_ids, start_date, end_date, hours):
+    """Yield unsaved ``WeeklySchedule`` rows, doctor by doctor and date by date."""
+    days = [
+        day for day in (start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1))
+        if day.weekday() in hours
+    ]
+    for doctor_id in doctor_ids:
+        for day in days:
+            start_time, end_time = hours[day.weekday()]
+            yield WeeklySchedule(
+                doctor_id=doctor_id,
+                date=day,
+                day_of_week=day.weekday(),
+                start_time=start_time,
+                end_time=end_time,
+                is_active=True,
+            )
+
+
+def generate_schedules(doctor_ids, start_date, end_date, hours=None, chunk_size=None):
+    """
+    Create or overwrite the schedules of ``doctor_ids`` between ``start_date``
+    and ``end_date``. ``hours`` maps weekday (0 = Monday) to a
+    ``(start_time, end_time)`` pair; weekdays missing from it are left alone.
+    """
+    hours = DEFAULT_HOURS if hours is None else hours
+    chunk_size = chunk_size or getattr(settings, 'SCHEDULE_GENERATION_CHUNK_SIZE', 5000)
+    doctor_ids = list(doctor_ids)
+
+    rows = 0
+    began = time.perf_counter()
+    schedules = iter_schedules(doctor_ids, start_date, end_date, hours)
+    while True:
+        chunk = list(islice(schedules, chunk_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            WeeklySchedule.objects.bulk_create(
+                chunk,
+                update_conflicts=True,
+                unique_fields=['doctor', 'date'],
+                update_fields=['day_of_week', 'start_time', 'end_time', 'is_active'],
+            )
+        rows += len(chunk)
+    seconds = time.perf_counter() - began
+
+    schedules_generated.send(
+        sender=WeeklySchedule, doctor_ids=doctor_ids, start_date=start_date, end_date=end_date
+    )
+    return GenerationResult(len(doctor_ids), rows, seconds)
+
+
+def expand_template(template, date_from, date_to):
+    """Yield the dates between ``date_from`` and ``date_to`` a template recurs on."""
+    day = max(date_from, template.valid_from)
+    last = date_to if template.valid_until is None else min(date_to, template.valid_until)
+    while day <= last:
+        if template.weekdays >> day.weekday() & 1:
+            yield day
+        day += timedelta(days=1)
+
+
+def _template_hours(templates, day):
+    # Templates are ordered by valid_from; the most recent one covering the day wins.
+    for template in reversed(templates):
+        if template.runs_on(day):
+            return template.start_time, template.end_time
+    return None
+
+
+def iter_working_hours(doctor_ids, date_from, date_to):
+    """
+    Yield ``(doctor_id, date, start_time, end_time)`` for every working day of
+    the doctors between two dates, doctor by doctor and date by date.
+
+    Reads the window's stored rows, exceptions and templates in three queries;
+    hours come from an exception, else a stored row, else a template.
+    """
+    doctor_ids = list(doctor_ids)
+    rows = {
+        (doctor_id, day): (start, end, active)
+        for doctor_id, day, start, end, active in WeeklySchedule.objects.filter(
+            doctor_id__in=doctor_ids, date__range=(date_from, date_to)
+        ).values_list('doctor_id', 'date', 'start_time', 'end_time', 'is_active')
+    }
+    exceptions = {
+        (doctor_id, day): (start, end, active)
+        for doctor_id, day, start, end, active in ScheduleException.objects.filter(
+            doctor_id__in=doctor_ids, date__range=(date_from, date_to)
+        ).values_list('doctor_id', 'date', 'start_time', 'end_time', 'is_active')
+    }
+    templates = defaultdict(list)
+    for template in ScheduleTemplate.objects.filter(
+        Q(valid_until__isnull=True) | Q(valid_until__gte=date_from),
+        doctor_id__in=doctor_ids, valid_from__lte=date_to,
+    ).order_by('valid_from'):
+        templates[template.doctor_id].append(template)
+
+    n_days = (date_to - date_from).days + 1
+    for doctor_id in doctor_ids:
+        for offset in range(n_days):
+            day = date_from + timedelta(days=offset)
+            row = rows.get((doctor_id, day))
+            exception = exceptions.get((doctor_id, day))
+            if (row and not row[2]) or (exception and not exception[2]):
+                continue
+            if exception and exception[0] and exception[1]:
+                hours = exception[:2]
+            elif row:
+                hours = row[:2]
+            else:
+                hours = _template_hours(templates[doctor_id], day)
+            if hours:
+                yield doctor_id, day, hours[0], hours[1]
+
+
+def schedule_window(date_from=None):
+    """Today (or ``date_from``) and the next ``SCHEDULE_TEMPLATE_HORIZON_DAYS`` days."""
+    date_from = date_from or timezone.localdate()
+    return date_from, date_from + timedelta(days=getattr(settings, 'SCHEDULE_TEMPLATE_HORIZON_DAYS', 28) - 1)
+
+
+def expand_window(taken, templates, exceptions, date_from, date_to):
+    """
+    Yield ``(date, start_time, end_time, is_active)`` for the window dates not
+    in ``taken`` that templates or exceptions give hours to.  ``templates``
+    are ordered by ``valid_from``; ``exceptions`` maps dates to exceptions.
+    """
+    for offset in range((date_to - date_from).days + 1):
+        day = date_from + timedelta(days=offset)
+        if day in taken:
+            continue
+        hours = _template_hours(templates, day)
+        exception = exceptions.get(day)
+        if exception is not None:
+            if exception.is_active and exception.start_time and exception.end_time:
+                hours = exception.start_time, exception.end_time
+        if hours:
+            # A day off is shown like an inactive stored row with the usual hours.
+            yield day, hours[0], hours[1], exception is None or exception.is_active
+
+
+def materialize_schedule(doctor, date_from=None, date_to=None):
+    """
+    The doctor's schedule as a list of ``WeeklySchedule`` rows: the stored
+    rows, followed by unsaved rows expanded from templates and exceptions for
+    the dates of the window (``schedule_window()`` by default) that have no
+    stored row.
+
+    Uses the doctor's related managers, so prefetching ``weekly_schedules``,
+    ``schedule_templates`` and ``schedule_exceptions`` makes it query-free.
+    """
+    window_from, window_to = schedule_window(date_from)
+    date_from, date_to = date_from or window_from, date_to or window_to
+
+    stored = list(doctor.weekly_schedules.all())
+    templates = sorted(doctor.schedule_templates.all(), key=lambda template: template.valid_from)
+    exceptions = {exception.date: exception for exception in doctor.schedule_exceptions.all()}
+    if not templates and not exceptions:
+        return stored
+
+    taken = {schedule.date for schedule in stored}
+    return stored + [
+        WeeklySchedule(
+            doctor=doctor, date=day, day_of_week=day.weekday(),
+            start_time=start_time, end_time=end_time, is_active=is_active,
+        )
+        for day, start_time, end_time, is_active in expand_window(taken, templates, exceptions, date_from, date_to)
+    ]
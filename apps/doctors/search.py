@@ -0,0 +1,250 @@
+"""
+Full-text doctor search.
+
+Doctors are indexed on their name, their specialization's name and
+description, and their profile description, and ranked with BM25 (name
+matches weigh most).  Every query word must match, as a prefix, in at least
+one of those fields.
+
+Two backends, chosen by ``DOCTOR_SEARCH_BACKEND``:
+
+* ``fts5``   - a SQLite FTS5 virtual table (``doctor_search``) created by the
+  doctors migrations; writes happen in the same transaction as the change.
+* ``memory`` - an in-process inverted index built on first use, patched after
+  commit and rebuilt every ``DOCTOR_SEARCH_TTL`` seconds to pick up writes
+  made by other processes.
+
+``auto`` (the default) uses FTS5 when the table exists and falls back to the
+in-process index otherwise.  Both are kept current by ``signals.py``; bulk
+writes that bypass signals should call ``get_search_backend().rebuild()``.
+"""
+import heapq
+import math
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+from time import monotonic
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Doctor
+
+TOKEN = re.compile(r'\w+')
+
+FIELDS = ('full_name', 'specialization', 'specialization_description', 'profile_description')
+WEIGHTS = (10.0, 5.0, 1.0, 2.0)  # Same order as FIELDS
+
+FTS_TABLE = 'doctor_search'
+FTS_IDS_TABLE = 'doctor_search_ids'  # Maps FTS rowids to doctor UUIDs
+
+
+def tokenize(text):
+    # Lower-case and strip diacritics, like FTS5's unicode61 tokenizer.
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return TOKEN.findall(''.join(char for char in text if not unicodedata.combining(char)))
+
+
+def doctor_rows(doctors=None):
+    """Yield ``(doctor_id, full_name, specialization, specialization_description, profile_description)``."""
+    doctors = Doctor.objects.all() if doctors is None else doctors
+    yield from doctors.values_list(
+        'pk', 'user__full_name', 'specialization__name', 'specialization__description', 'profile_description'
+    ).iterator(chunk_size=2000)
+
+
+class FTS5Backend:
+    """Search through the ``doctor_search`` FTS5 table."""
+
+    name = 'fts5'
+
+    @staticmethod
+    def available():
+        return connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names()
+
+    def _write(self, cursor, rows):
+        for doctor_id, *fields in rows:
+            cursor.execute(f'INSERT INTO {FTS_IDS_TABLE} (doctor_id) VALUES (%s) ON CONFLICT (doctor_id) DO NOTHING', [str(doctor_id)])
+            cursor.execute(f'SELECT rowid FROM {FTS_IDS_TABLE} WHERE doctor_id = %s', [str(doctor_id)])
+            rowid = cursor.fetchone()[0]
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [rowid])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FIELDS)}) VALUES (%s, %s, %s, %s, %s)',
+                [rowid, *(field or '' for field in fields)],
+            )
+
+    def refresh(self, doctor_ids):
+        """Re-index some doctors; those that no longer exist are removed."""
+        doctor_ids = [str(doctor_id) for doctor_id in doctor_ids]
+        with transaction.atomic(), connection.cursor() as cursor:
+            rows = list(doctor_rows(Doctor.objects.filter(pk__in=doctor_ids)))
+            self._write(cursor, rows)
+            gone = set(doctor_ids) - {str(row[0]) for row in rows}
+            for doctor_id in gone:
+                cursor.execute(f'SELECT rowid FROM {FTS_IDS_TABLE} WHERE doctor_id = %s', [doctor_id])
+                found = cursor.fetchone()
+                if found:
+                    cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [found[0]])
+                    cursor.execute(f'DELETE FROM {FTS_IDS_TABLE} WHERE rowid = %s', [found[0]])
+
+    def rebuild(self):
+        rows = list(doctor_rows())
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'DELETE FROM {FTS_IDS_TABLE}')
+            cursor.executemany(
+                f'INSERT INTO {FTS_IDS_TABLE} (rowid, doctor_id) VALUES (%s, %s)',
+                [(rowid, str(row[0])) for rowid, row in enumerate(rows, 1)],
+            )
+            cursor.executemany(
+                f'INSERT INTO {FTS_TABLE} (rowid, {", ".join(FIELDS)}) VALUES (%s, %s, %s, %s, %s)',
+                [(rowid, *(field or '' for field in row[1:])) for rowid, row in enumerate(rows, 1)],
+            )
+
+    def search(self, terms, offset, limit):
+        """Return ``(total, [(doctor_id, score), ...])`` for one page of matches."""
+        match = ' '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match])
+            total = cursor.fetchone()[0]
+            cursor.execute(
+                f'SELECT ids.doctor_id, -bm25({FTS_TABLE}, {weights}) AS score '
+                f'FROM {FTS_TABLE} JOIN {FTS_IDS_TABLE} ids ON ids.rowid = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s ORDER BY score DESC, ids.doctor_id LIMIT %s OFFSET %s',
+                [match, limit, offset],
+            )
+            return total, [(doctor_id, score) for doctor_id, score in cursor.fetchall()]
+
+
+class InvertedIndexBackend:
+    """In-process inverted index with BM25 over field-weighted term frequencies."""
+
+    name = 'memory'
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self, ttl=None):
+        self.ttl = ttl or getattr(settings, 'DOCTOR_SEARCH_TTL', 300)
+        self._lock = threading.Lock()
+        self._postings = None  # term -> {doctor_id: weighted term frequency}
+        self._lengths = {}     # doctor_id -> weighted document length
+        self._terms = {}       # doctor_id -> terms it is posted under
+        self._vocabulary = []  # Sorted terms for prefix lookups; may keep terms no longer posted
+        self._loaded_at = 0.0
+
+    def _add(self, doctor_id, fields):
+        frequencies = defaultdict(float)
+        for weight, text in zip(WEIGHTS, fields):
+            for term in tokenize(text):
+                frequencies[term] += weight
+        for term, frequency in frequencies.items():
+            if term not in self._postings:
+                self._postings[term] = {}
+                if self._loaded_at:  # Full loads sort the vocabulary once at the end
+                    i = bisect_left(self._vocabulary, term)
+                    if i == len(self._vocabulary) or self._vocabulary[i] != term:
+                        self._vocabulary.insert(i, term)
+            self._postings[term][doctor_id] = frequency
+        self._lengths[doctor_id] = sum(frequencies.values())
+        self._terms[doctor_id] = list(frequencies)
+
+    def _remove(self, doctor_id):
+        for term in self._terms.pop(doctor_id, ()):
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(doctor_id, None)
+                if not posting:
+                    del self._postings[term]
+        self._lengths.pop(doctor_id, None)
+
+    def _ensure_loaded(self):
+        if self._postings is not None and monotonic() - self._loaded_at < self.ttl:
+            return
+        self._postings, self._lengths, self._terms = {}, {}, {}
+        self._loaded_at = 0.0
+        for doctor_id, *fields in doctor_rows():
+            self._add(str(doctor_id), fields)
+        self._vocabulary = sorted(self._postings)
+        self._loaded_at = monotonic()
+
+    def _apply(self, doctor_ids):
+        rows = {str(row[0]): row[1:] for row in doctor_rows(Doctor.objects.filter(pk__in=doctor_ids))}
+        with self._lock:
+            if self._postings is None:
+                return
+            for doctor_id in map(str, doctor_ids):
+                self._remove(doctor_id)
+                if doctor_id in rows:
+                    self._add(doctor_id, rows[doctor_id])
+
+    def refresh(self, doctor_ids):
+        doctor_ids = list(doctor_ids)
+        transaction.on_commit(lambda: self._apply(doctor_ids))
+
+    def rebuild(self):
+        with self._lock:
+            self._postings = None
+            self._ensure_loaded()
+
+    def _expand(self, prefix):
+        i = bisect_left(self._vocabulary, prefix)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(prefix):
+            if self._vocabulary[i] in self._postings:
+                yield self._vocabulary[i]
+            i += 1
+
+    def search(self, terms, offset, limit):
+        with self._lock:
+            self._ensure_loaded()
+            total_docs = len(self._lengths)
+            if not total_docs:
+                return 0, []
+            average = sum(self._lengths.values()) / total_docs
+            scores = None
+            for term in terms:
+                # Every document matching the prefix, with its best-scoring expansion.
+                matched = {}
+                for word in self._expand(term):
+                    posting = self._postings[word]
+                    idf = math.log(1 + (total_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+                    for doctor_id, frequency in posting.items():
+                        norm = frequency + self.k1 * (1 - self.b + self.b * self._lengths[doctor_id] / average)
+                        score = idf * frequency * (self.k1 + 1) / norm
+                        if score > matched.get(doctor_id, 0.0):
+                            matched[doctor_id] = score
+                if scores is None:
+                    scores = matched
+                else:
+                    scores = {doctor_id: score + matched[doctor_id] for doctor_id, score in scores.items() if doctor_id in matched}
+                if not scores:
+                    return 0, []
+        ranked = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return len(scores), ranked[offset:]
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                choice = getattr(settings, 'DOCTOR_SEARCH_BACKEND', 'auto')
+                if choice == 'fts5' or (choice == 'auto' and FTS5Backend.available()):
+                    _backend = FTS5Backend()
+                else:
+                    _backend = InvertedIndexBackend()
+    return _backend
+
+
+def search_doctors(query, offset=0, limit=20):
+    """Return ``(total, [(doctor_id, score), ...])`` for a free-text query."""
+    terms = tokenize(query)
+    if not terms:
+        return 0, []
+    return get_search_backend().search(terms, offset, limit)
@@ -1,7 +1,11 @@
 from rest_framework import serializers
 from .models import Doctor, Specialization  , WeeklySchedule, DoctorLeave
-from datetime import datetime, timedelta, date
+from .scheduling import materialize_schedule
+from .facets import FEE_BANDS, EXPERIENCE_BANDS
+from datetime import datetime, timedelta, date, time
+from decimal import Decimal
 from django.contrib.auth import get_user_model
+from apps.users.photos import photo_url
 User = get_user_model()
 
 class SpecializationSerializer(serializers.ModelSerializer):
@@ -20,8 +24,9 @@ class DoctorSerializer(serializers.ModelSerializer):
         fields = [
             'user_id', 'specialization', 'degree', 'license_number',
             'years_of_experience', 'consultation_fee', 'profile_description',
-            'max_patients_per_day', 'is_active'
+            'max_patients_per_day', 'is_active', 'rating', 'rating_count'
         ]
+        read_only_fields = ['rating', 'rating_count']
 
     def create(self, validated_data):
         # Extract and handle specialization
@@ -53,7 +58,7 @@ class DoctorSerializerGet(serializers.ModelSerializer):
         return {
             'full_name': user.full_name,
             'email': user.email,
-            'profile_photo': user.profile_photo.url if user.profile_photo else None
+            'profile_photo': photo_url(user.profile_photo, self.context.get('request'))
         }
 
     def get_specialization(self, obj):
@@ -119,6 +124,109 @@ class WeeklyScheduleSerializer(serializers.ModelSerializer):
         return schedules
 
     
+class ScheduleHoursSerializer(serializers.Serializer):
+    weekday = serializers.IntegerField(min_value=0, max_value=6)  # 0: Monday, 6: Sunday
+    start_time = serializers.TimeField()
+    end_time = serializers.TimeField()
+
+    def validate(self, data):
+        if data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError("Start time must be before end time.")
+        return data
+
+
+class ScheduleGenerationSerializer(serializers.Serializer):
+    """
+    Bulk schedule generation. `doctors` defaults to all active doctors and
+    `hours` to Monday-Saturday 10:00-18:00; weekdays without hours are skipped.
+    """
+    doctors = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    hours = ScheduleHoursSerializer(many=True, required=False, allow_empty=False)
+
+    def validate(self, data):
+        if data['end_date'] < data['start_date']:
+            raise serializers.ValidationError("end_date must not be before start_date.")
+        if (data['end_date'] - data['start_date']).days >= 366:
+            raise serializers.ValidationError("Schedules can be generated for at most 366 days at once.")
+        if 'hours' in data:
+            weekdays = [entry['weekday'] for entry in data['hours']]
+            if len(set(weekdays)) != len(weekdays):
+                raise serializers.ValidationError("Each weekday can be given only once.")
+            data['hours'] = {entry['weekday']: (entry['start_time'], entry['end_time']) for entry in data['hours']}
+        return data
+
+
+class DoctorSearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=200)
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+
+class DoctorFacetQuerySerializer(serializers.Serializer):
+    # Repeat a parameter to accept several values of one facet, e.g. ?fee=0-500&fee=500-1000
+    specialization = serializers.ListField(child=serializers.UUIDField(), required=False, default=list)
+    fee = serializers.MultipleChoiceField(choices=[label for label, *_ in FEE_BANDS], required=False, default=set)
+    experience = serializers.MultipleChoiceField(choices=[label for label, *_ in EXPERIENCE_BANDS], required=False, default=set)
+    is_active = serializers.BooleanField(required=False, allow_null=True, default=None)
+    page = serializers.IntegerField(min_value=1, default=1)
+    page_size = serializers.IntegerField(min_value=1, max_value=100, default=20)
+
+    def to_filters(self):
+        """Facet -> accepted values, in the form ``FacetIndex.query`` takes."""
+        data = self.validated_data
+        is_active = data['is_active']
+        return {
+            'specialization': [str(pk) for pk in data['specialization']],
+            'fee': sorted(data['fee']),
+            'experience': sorted(data['experience']),
+            'is_active': [] if is_active is None else ['true' if is_active else 'false'],
+        }
+
+
+class DoctorImportRowSerializer(serializers.Serializer):
+    """
+    One row of a bulk doctor import (see ``importer.py``). A blank password
+    leaves the account without a usable one; ``schedule_weekdays`` (e.g.
+    ``0-5`` or ``0,2,4``, 0 = Monday) adds a schedule template.
+    """
+    email = serializers.EmailField()
+    full_name = serializers.CharField(max_length=255)
+    password = serializers.CharField(min_length=8, required=False, allow_blank=True)
+    number = serializers.CharField(max_length=15, required=False, allow_blank=True)
+    specialization = serializers.CharField(max_length=100)
+    specialization_description = serializers.CharField(required=False, default='')
+    degree = serializers.CharField(max_length=50, required=False, default="Not Specified")
+    license_number = serializers.CharField(max_length=100)
+    years_of_experience = serializers.IntegerField(min_value=0)
+    consultation_fee = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=Decimal(0))
+    profile_description = serializers.CharField(required=False, default="Not Specified")
+    max_patients_per_day = serializers.IntegerField(min_value=0, required=False, default=10)
+    is_active = serializers.BooleanField(required=False, default=True)
+    schedule_weekdays = serializers.CharField(required=False)
+    schedule_start = serializers.TimeField(required=False, default=time(10))
+    schedule_end = serializers.TimeField(required=False, default=time(18))
+
+    def validate_schedule_weekdays(self, value):
+        weekdays = 0
+        try:
+            for part in value.split(','):
+                first, _, last = part.strip().partition('-')
+                for weekday in range(int(first), int(last or first) + 1):
+                    if not 0 <= weekday <= 6:
+                        raise ValueError
+                    weekdays |= 1 << weekday
+        except ValueError:
+            raise serializers.ValidationError("Expected weekdays like 0-5 or 0,2,4 (0 = Monday).")
+        return weekdays
+
+    def validate(self, data):
+        if data.get('schedule_weekdays') and data['schedule_start'] >= data['schedule_end']:
+            raise serializers.ValidationError("Schedule start time must be before end time.")
+        return data
+
+
 class DoctorLeaveSerializer(serializers.ModelSerializer):
     class Meta:
         model = DoctorLeave
@@ -129,7 +237,7 @@ class DoctorLeaveSerializer(serializers.ModelSerializer):
 class DoctorSerializerAll(serializers.ModelSerializer):
     user = serializers.SerializerMethodField()  # To include detailed user information
     specialization = SpecializationSerializer()  # Nested specialization data
-    weekly_schedule = WeeklyScheduleSerializer(many=True, source='weekly_schedules')  # Nested weekly schedule data
+    weekly_schedule = serializers.SerializerMethodField()  # Stored schedule rows plus rows expanded from templates
     leaves = DoctorLeaveSerializer(many=True)  # Nested doctor leave data
 
     class Meta:
@@ -137,7 +245,7 @@ class DoctorSerializerAll(serializers.ModelSerializer):
         fields = [
             'user', 'specialization', 'degree', 'license_number',
             'years_of_experience', 'consultation_fee', 'profile_description',
-            'max_patients_per_day', 'is_active', 'weekly_schedule', 'leaves'
+            'max_patients_per_day', 'is_active', 'rating', 'rating_count', 'weekly_schedule', 'leaves'
         ]
 
     def get_user(self, obj):
@@ -146,9 +254,12 @@ class DoctorSerializerAll(serializers.ModelSerializer):
             'id': str(user.id),
             'full_name': user.full_name,
             'email': user.email,
-            'profile_photo': user.profile_photo.url if user.profile_photo else None
+            'profile_photo': photo_url(user.profile_photo, self.context.get('request'))
         }
 
+    def get_weekly_schedule(self, obj):
+        return WeeklyScheduleSerializer(materialize_schedule(obj), many=True).data
+
     def to_representation(self, instance):
         """
         Add custom logic here if you need to transform or format the data further.
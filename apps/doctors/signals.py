@@ -0,0 +1,107 @@
+"""
+Keep the doctor directory cache and the search index in step with the data.
+
+Directory invalidation runs after commit so readers never re-cache a document
+built from rows that are about to be rolled back or are not yet visible.
+Search index updates are left to the backend (see ``search.py``); facet
+bitsets are patched after commit from the saved instance itself.  The
+change counters behind conditional GETs are bumped after commit as well.
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.conditional import versions
+
+from .directory import LISTING_VERSION, SPECIALIZATIONS_VERSION, doctor_directory, doctor_version
+from .facets import facet_index
+from .importer import doctors_imported
+from .models import Doctor, DoctorLeave, ScheduleException, ScheduleTemplate, Specialization, WeeklySchedule
+from .scheduling import schedules_generated
+from .ratings import ratings_changed
+from .search import get_search_backend
+
+User = get_user_model()
+
+
+def _invalidate(doctor_ids, listing=False):
+    doctor_ids = list(doctor_ids)
+    transaction.on_commit(partial(doctor_directory.invalidate, doctor_ids, listing))
+    if doctor_ids or listing:
+        transaction.on_commit(partial(versions.bump, LISTING_VERSION, *map(doctor_version, doctor_ids)))
+
+
+@receiver(post_save, sender=Doctor)
+def doctor_saved(sender, instance, created=False, **kwargs):
+    # A new doctor also changes the directory's id list.
+    _invalidate([instance.pk], listing=created)
+    get_search_backend().refresh([instance.pk])
+    transaction.on_commit(partial(facet_index.update, instance))
+
+
+@receiver(post_delete, sender=Doctor)
+def doctor_deleted(sender, instance, **kwargs):
+    _invalidate([instance.pk], listing=True)
+    get_search_backend().refresh([instance.pk])
+    transaction.on_commit(partial(facet_index.remove, instance.pk))
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # Logins touch nothing the directory shows
+    if instance.role == 'doctor':
+        _invalidate([instance.pk])
+        if update_fields is None or 'full_name' in update_fields:
+            get_search_backend().refresh([instance.pk])
+
+
+@receiver(post_save, sender=Specialization)
+@receiver(post_delete, sender=Specialization)
+def specialization_list_changed(sender, instance, **kwargs):
+    transaction.on_commit(partial(versions.bump, SPECIALIZATIONS_VERSION))
+
+
+@receiver(post_save, sender=Specialization)
+def specialization_changed(sender, instance, created=False, **kwargs):
+    if not created:
+        doctor_ids = list(Doctor.objects.filter(specialization=instance).values_list('pk', flat=True))
+        _invalidate(doctor_ids)
+        get_search_backend().refresh(doctor_ids)
+        transaction.on_commit(partial(facet_index.rename, instance.pk, instance.name))
+
+
+@receiver(post_save, sender=WeeklySchedule)
+@receiver(post_delete, sender=WeeklySchedule)
+@receiver(post_save, sender=DoctorLeave)
+@receiver(post_delete, sender=DoctorLeave)
+@receiver(post_save, sender=ScheduleTemplate)
+@receiver(post_delete, sender=ScheduleTemplate)
+@receiver(post_save, sender=ScheduleException)
+@receiver(post_delete, sender=ScheduleException)
+def schedule_changed(sender, instance, **kwargs):
+    _invalidate([instance.doctor_id])
+
+
+@receiver(schedules_generated)
+def schedules_regenerated(sender, doctor_ids, **kwargs):
+    _invalidate(doctor_ids)
+
+
+@receiver(ratings_changed)
+def ratings_updated(sender, doctor_ids, **kwargs):
+    # A new rating can move the doctors in the rating-ordered list.
+    _invalidate(doctor_ids, listing=True)
+
+
+@receiver(doctors_imported)
+def doctors_added(sender, doctor_ids, specialization_ids=(), **kwargs):
+    # Bulk imports send no model signals; catch up on what they created.
+    _invalidate(doctor_ids, listing=True)
+    get_search_backend().refresh(doctor_ids)
+    transaction.on_commit(facet_index.invalidate)
+    if specialization_ids:
+        transaction.on_commit(partial(versions.bump, SPECIALIZATIONS_VERSION))
@@ -1,7 +1,7 @@
 # urls.py (in doctors app)
 
 from django.urls import path
-from .views import DoctorProfileCreateView, DoctorDetailView, DoctorUpdateView, SpecializationView , WeeklyScheduleView, DoctorLeaveView, DoctorListView, DoctorDetailViewall
+from .views import DoctorProfileCreateView, DoctorDetailView, DoctorUpdateView, SpecializationView , WeeklyScheduleView, DoctorLeaveView, DoctorListView, DoctorDetailViewall, ScheduleGenerationView, DoctorDirectoryStatsView, DoctorSearchView, DoctorFacetView
 
 urlpatterns = [
     path('specializations/', SpecializationView.as_view(), name='specializations-list'),
@@ -9,8 +9,12 @@ urlpatterns = [
     path('profile/', DoctorProfileCreateView.as_view(), name='create-doctor-profile'),
     path('update/', DoctorUpdateView.as_view(), name='doctor-update'),
     path('weekly_schedule/create/', WeeklyScheduleView.as_view(), name='create_weekly_schedule'),
+    path('weekly_schedule/generate/', ScheduleGenerationView.as_view(), name='generate_schedules'),
     path('doctor_leaves/apply/', DoctorLeaveView.as_view(), name='apply_doctor_leave'),
     path('all_doctors/', DoctorListView.as_view(), name='get_all_doctors'),
     path('doctors/', DoctorDetailViewall.as_view(), name='doctor-list'),
     path('doctors/<uuid:doctor_id>/', DoctorDetailViewall.as_view(), name='doctor-detail'),
+    path('search/', DoctorSearchView.as_view(), name='doctor-search'),
+    path('facets/', DoctorFacetView.as_view(), name='doctor-facets'),
+    path('directory/stats/', DoctorDirectoryStatsView.as_view(), name='doctor-directory-stats'),
 ]
\ No newline at end of file
@@ -3,12 +3,24 @@
 from rest_framework import status, permissions, viewsets,generics
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .serializers import DoctorSerializer,DoctorSerializerGet, DoctorUpdateSerializer, SpecializationSerializer , WeeklyScheduleSerializer, DoctorLeaveSerializer, DoctorSerializerAll
+from .serializers import DoctorSerializer,DoctorSerializerGet, DoctorUpdateSerializer, SpecializationSerializer , WeeklyScheduleSerializer, DoctorLeaveSerializer, DoctorSerializerAll, ScheduleGenerationSerializer, DoctorSearchQuerySerializer, DoctorFacetQuerySerializer
 from .models import Doctor ,Specialization ,WeeklySchedule, DoctorLeave
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import NotFound
+from .scheduling import generate_schedules
+from .directory import doctor_directory, SUMMARY, DETAIL, ORDERINGS, LISTING_VERSION, SPECIALIZATIONS_VERSION, doctor_version
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
+from .search import search_doctors
+from .facets import facet_index
+from .representations import specializations
+from django.conf import settings
+from django.utils import timezone
+from core.conditional import conditional, versions
+from apps.users.cache import doctor_id_for
+from apps.users.photos import sized_url
 
 class DoctorProfileCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
@@ -33,11 +45,14 @@ class DoctorProfileCreateView(APIView):
 class DoctorDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional('doctor-profile', lambda request, *args, **kwargs: versions.token(doctor_version(request.user.id)), private=True)
     def get(self, request, *args, **kwargs):
         try:
-            # Get doctor object based on user_id
+            # The cached profile id answers users without a profile without a query.
+            if doctor_id_for(request.user) is None:
+                raise Doctor.DoesNotExist
             doctor = Doctor.objects.get(user_id=request.user.id)
-            serializer = DoctorSerializerGet(doctor)
+            serializer = DoctorSerializerGet(doctor, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Doctor.DoesNotExist:
             return Response({"error": "Doctor not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -74,10 +89,10 @@ class DoctorUpdateView(APIView):
         
 
 class SpecializationView(APIView):
+    @conditional('specializations', lambda request, *args, **kwargs: versions.token(SPECIALIZATIONS_VERSION))
     def get(self, request):
-        specializations = Specialization.objects.all()
-        serializer = SpecializationSerializer(specializations, many=True)
-        return Response(serializer.data, status=200)
+        # Same output as SpecializationSerializer(many=True), without instantiating models
+        return Response(specializations(), status=200)
         
 class WeeklyScheduleView(APIView):
     def post(self, request, *args, **kwargs):
@@ -89,6 +104,57 @@ class WeeklyScheduleView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ScheduleGenerationView(APIView):
+    """
+    Creates or overwrites schedules in bulk. Admins may generate them for any
+    doctors (all active doctors by default); doctors only for themselves.
+    One request writes at most SCHEDULE_GENERATION_MAX_DOCTOR_DAYS rows;
+    larger runs go through the generate_schedules command.
+    Reports how many rows were written and how fast.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        if request.user.role not in ('admin', 'doctor'):
+            return Response({"error": "You do not have permission to generate schedules."}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ScheduleGenerationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        if request.user.role == 'doctor':
+            if data.get('doctors', [request.user.pk]) != [request.user.pk]:
+                return Response({"error": "Doctors can only generate their own schedule."}, status=status.HTTP_403_FORBIDDEN)
+            doctor_ids = list(Doctor.objects.filter(pk=request.user.pk).values_list('pk', flat=True))
+            if not doctor_ids:
+                return Response({"error": "Doctor not found."}, status=status.HTTP_404_NOT_FOUND)
+        elif 'doctors' in data:
+            doctor_ids = list(Doctor.objects.filter(pk__in=data['doctors']).values_list('pk', flat=True))
+            unknown = set(data['doctors']) - set(doctor_ids)
+            if unknown:
+                return Response({"doctors": [f"Doctor {pk} not found." for pk in sorted(map(str, unknown))]}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            doctor_ids = list(Doctor.objects.filter(is_active=True).values_list('pk', flat=True))
+
+        # Bound the rows one request writes; larger runs belong to `manage.py generate_schedules`.
+        doctor_days = len(doctor_ids) * ((data['end_date'] - data['start_date']).days + 1)
+        limit = getattr(settings, 'SCHEDULE_GENERATION_MAX_DOCTOR_DAYS', 10000)
+        if doctor_days > limit:
+            return Response({
+                "error": f"This would generate {doctor_days} doctor-days, more than the {limit} allowed per request. "
+                         "Narrow the dates or doctors, or run the generate_schedules management command."
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        result = generate_schedules(doctor_ids, data['start_date'], data['end_date'], hours=data.get('hours'))
+        return Response({
+            'doctors': result.doctors,
+            'rows': result.rows,
+            'seconds': round(result.seconds, 3),
+            'rows_per_second': round(result.rows_per_second),
+        }, status=status.HTTP_200_OK)
+
+
 class DoctorLeaveView(generics.ListCreateAPIView):
     """
     Handles Doctor Leaves
@@ -98,40 +164,145 @@ class DoctorLeaveView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = DoctorLeaveSerializer
 
+    def get_doctor_id(self):
+        doctor_id = doctor_id_for(self.request.user)
+        if doctor_id is None:
+            raise NotFound("Doctor profile not found.")
+        return doctor_id
+
     def get_queryset(self):
-        doctor = Doctor.objects.get(user=self.request.user)
-        return DoctorLeave.objects.filter(doctor=doctor)
+        return DoctorLeave.objects.filter(doctor_id=self.get_doctor_id())
 
     def perform_create(self, serializer):
-        doctor = Doctor.objects.get(user=self.request.user)
-        serializer.save(doctor=doctor)  
+        serializer.save(doctor_id=self.get_doctor_id())
         
 
+class DirectoryPagination(PageNumberPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
 class DoctorListView(APIView):
     """
     Retrieve a list of all doctors with full details.
+    Served from the doctor directory cache; pass `page` to paginate and
+    `ordering=rating` for the best rated doctors first.
     """
     def get(self, request, *args, **kwargs):
-        doctors = Doctor.objects.all()
-        serializer = DoctorSerializer(doctors, many=True)
-        return Response(serializer.data, status=status.HTTP_200_OK)   
-        
-        
+        return directory_response(request, self, SUMMARY)
+
+
+def directory_token(request, doctor_id=None):
+    # Detail documents embed schedules from today on, so the date is part of the version.
+    parts, last_modified = versions.token(doctor_version(doctor_id) if doctor_id else LISTING_VERSION)
+    return (parts, str(timezone.localdate())), last_modified
+
+
 class DoctorDetailViewall(APIView):
+    @conditional('doctor-directory', directory_token)
     def get(self, request, doctor_id=None):
         """
         Fetch detailed doctor information.
         If `doctor_id` is provided, fetch specific doctor details;
-        otherwise, fetch details of all doctors.
+        otherwise, fetch details of all doctors (paginated when `page` is given).
         """
         if doctor_id:
-            try:
-                doctor = Doctor.objects.get(user_id=doctor_id)
-                serializer = DoctorSerializerAll(doctor)
-                return Response(serializer.data, status=status.HTTP_200_OK)
-            except Doctor.DoesNotExist:
+            document = doctor_directory.document(DETAIL, doctor_id)
+            if document is None:
                 return Response({"error": "Doctor not found"}, status=status.HTTP_404_NOT_FOUND)
-        else:
-            doctors = Doctor.objects.all()
-            serializer = DoctorSerializerAll(doctors, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+            return Response(sized_photos([document], request)[0], status=status.HTTP_200_OK)
+        return directory_response(request, self, DETAIL)
+
+
+def sized_photos(documents, request):
+    """Detail documents with the photo rendition the request asks for; the cached ones keep the stored URL."""
+    sized = []
+    for document in documents:
+        user = document['user']
+        url = sized_url(user['profile_photo'], request)
+        sized.append(document if url == user['profile_photo'] else dict(document, user=dict(user, profile_photo=url)))
+    return sized
+
+
+def directory_response(request, view, kind):
+    ordering = request.query_params.get('ordering', 'default')
+    if ordering not in ORDERINGS:
+        return Response({"error": f"ordering must be one of: {', '.join(ORDERINGS)}."}, status=status.HTTP_400_BAD_REQUEST)
+    ids = doctor_directory.ids(ordering)
+    if 'page' in request.query_params:
+        paginator = DirectoryPagination()
+        ids = paginator.paginate_queryset(ids, request, view=view)
+    documents = doctor_directory.documents(kind, ids)
+    if kind == DETAIL:
+        documents = sized_photos(documents, request)
+    if 'page' not in request.query_params:
+        return Response(documents, status=status.HTTP_200_OK)
+    return paginator.get_paginated_response(documents)
+
+
+class DoctorSearchView(APIView):
+    """
+    Full-text search over doctor names, specializations and profile
+    descriptions, best matches first. Every word must match (as a prefix).
+    """
+    def get(self, request, *args, **kwargs):
+        serializer = DoctorSearchQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        offset = (params['page'] - 1) * params['page_size']
+        total, matches = search_doctors(params['q'], offset=offset, limit=params['page_size'])
+        scores = {str(doctor_id): score for doctor_id, score in matches}
+        results = [
+            dict(document, score=round(scores[document['user_id']], 4))
+            for document in doctor_directory.documents(SUMMARY, scores)
+        ]
+
+        url = request.build_absolute_uri()
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, 'page', params['page'] + 1) if offset + len(matches) < total else None,
+            'previous': replace_query_param(url, 'page', params['page'] - 1) if params['page'] > 1 else None,
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
+
+class DoctorFacetView(APIView):
+    """
+    Filter doctors by specialization, fee band, experience band and active
+    flag, with the number of doctors behind every facet value. A facet's
+    counts ignore its own selection, so they show what picking another
+    value would return.
+    """
+    def get(self, request, *args, **kwargs):
+        serializer = DoctorFacetQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = serializer.validated_data
+
+        offset = (params['page'] - 1) * params['page_size']
+        total, page, counts = facet_index.query(serializer.to_filters(), offset=offset, limit=params['page_size'])
+
+        url = request.build_absolute_uri()
+        return Response({
+            'count': total,
+            'next': replace_query_param(url, 'page', params['page'] + 1) if offset + len(page) < total else None,
+            'previous': replace_query_param(url, 'page', params['page'] - 1) if params['page'] > 1 else None,
+            'facets': counts,
+            'results': doctor_directory.documents(SUMMARY, page),
+        }, status=status.HTTP_200_OK)
+
+
+class DoctorDirectoryStatsView(APIView):
+    """
+    Hit/miss counters of the doctor directory cache in this process.
+    Admins only.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view cache statistics."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(doctor_directory.stats(), status=status.HTTP_200_OK)
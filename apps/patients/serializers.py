@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Patient
 from django.contrib.auth import get_user_model
+from apps.users.serializers import ProfilePhotoField
 
 User = get_user_model()
 
@@ -18,6 +19,8 @@ class PatientSerializer(serializers.ModelSerializer):
 
 # Serializer for User Details (Nested within PatientFullDetailsSerializer)
 class UserSerializer(serializers.ModelSerializer):
+    profile_photo = ProfilePhotoField(required=False, allow_null=True)
+
     class Meta:
         model = User
         fields = ['id', 'email', 'full_name', 'role', 'number', 'profile_photo']
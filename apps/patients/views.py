@@ -4,6 +4,7 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 from .models import Patient
+from apps.users.cache import patient_id_for
 from .serializers import PatientSerializer, PatientFullDetailsSerializer, PatientUpdateSerializer
 
 class PatientProfileView(APIView):
@@ -23,6 +24,8 @@ class PatientProfileView(APIView):
     def get(self, request):
         # Retrieve the patient's profile
         try:
+            if patient_id_for(request.user) is None:
+                raise Patient.DoesNotExist
             patient = Patient.objects.get(user=request.user)
             serializer = PatientSerializer(patient)
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -41,7 +44,7 @@ class PatientFullDetailsView(APIView):
         try:
             # Get the patient details
             patient = Patient.objects.get(user=request.user)
-            serializer = PatientFullDetailsSerializer(patient)
+            serializer = PatientFullDetailsSerializer(patient, context={'request': request})
             return Response(serializer.data, status=status.HTTP_200_OK)
         except Patient.DoesNotExist:
             return Response({"error": "Patient profile not found."}, status=status.HTTP_404_NOT_FOUND)
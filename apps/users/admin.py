@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User
+from .models import OutboxEmail, User
 
 class CustomUserAdmin(UserAdmin):
     model = User
@@ -27,3 +27,14 @@ class CustomUserAdmin(UserAdmin):
 
 # Register your custom User model with the admin site
 admin.site.register(User, CustomUserAdmin)
+
+
+class OutboxEmailAdmin(admin.ModelAdmin):
+    list_display = ('id', 'subject', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('subject',)
+    readonly_fields = ('claim', 'last_error', 'created_at', 'sent_at')
+    exclude = ('body',)  # May hold one-time passwords
+
+
+admin.site.register(OutboxEmail, OutboxEmailAdmin)
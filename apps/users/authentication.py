@@ -0,0 +1,44 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import user_cache
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` resolving the token's user through ``user_cache``."""
+
+    def get_user(self, validated_token):
+        # Revocation compares the password hash, which the cache does not hold.
+        if api_settings.CHECK_REVOKE_TOKEN or api_settings.USER_ID_FIELD not in ('id', 'pk'):
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get_user(user_id)
+        if user is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return user
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` caching which user a key belongs to, and the user itself."""
+
+    def authenticate_credentials(self, key):
+        user_id = user_cache.token_user_id(
+            key, lambda: Token.objects.filter(key=key).values_list('user_id', flat=True).first()
+        )
+        user = user_cache.get_user(user_id) if user_id is not None else None
+        if user is None:
+            raise AuthenticationFailed(_('Invalid token.'))
+        if not user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        return (user, Token(key=key, user=user))
@@ -0,0 +1,133 @@
+"""
+Bloom-filter fast path for refresh-token blacklist checks.
+
+``token_blacklist`` checks every refresh token it verifies with a join of
+``BlacklistedToken`` and ``OutstandingToken`` on the token's ``jti``, and the
+answer is nearly always "not blacklisted".  ``TokenBlacklist`` keeps a Bloom
+filter of every blacklisted ``jti``: a token the filter has never seen is
+certainly not blacklisted and skips the query; only the rare "maybe" (a
+blacklisted token, or a false positive at ``TOKEN_BLACKLIST_BLOOM_ERROR_RATE``)
+asks the database.
+
+The filter is built from one query on first use and updated when this
+process blacklists a token (see ``signals.py``).  Tokens blacklisted by other
+processes are picked up by reading the rows past the highest id seen, at most
+every ``TOKEN_BLACKLIST_SYNC_INTERVAL`` seconds.  Bloom filters cannot forget,
+so the filter is rebuilt every ``TOKEN_BLACKLIST_BLOOM_TTL`` seconds, or once
+it holds more than its capacity, to shed tokens ``prune_tokens`` deleted.
+"""
+import hashlib
+import math
+import threading
+from time import monotonic
+
+from django.conf import settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+
+class BloomFilter:
+    """A Bloom filter of strings sized for ``capacity`` items at ``error_rate`` false positives."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        # Double hashing: two 64-bit halves of one digest give every position.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class TokenBlacklist:
+    def __init__(self, capacity=None, error_rate=None, sync_interval=None, ttl=None):
+        self.capacity = capacity or getattr(settings, 'TOKEN_BLACKLIST_BLOOM_CAPACITY', 100000)
+        self.error_rate = error_rate or getattr(settings, 'TOKEN_BLACKLIST_BLOOM_ERROR_RATE', 0.001)
+        self.sync_interval = sync_interval if sync_interval is not None else getattr(
+            settings, 'TOKEN_BLACKLIST_SYNC_INTERVAL', 1
+        )
+        self.ttl = ttl or getattr(settings, 'TOKEN_BLACKLIST_BLOOM_TTL', 3600)
+        self._lock = threading.Lock()
+        self._filter = None
+        self._loaded_at = None
+        self._synced_at = None
+        self._last_id = 0
+        self.skipped = self.checked = self.false_positives = 0
+
+    def _ensure_loaded(self):
+        now = monotonic()
+        if (
+            self._filter is not None
+            and now - self._loaded_at < self.ttl
+            and self._filter.count <= self._filter.capacity
+        ):
+            if now - self._synced_at >= self.sync_interval:
+                self._add_rows(BlacklistedToken.objects.filter(pk__gt=self._last_id))
+                self._synced_at = now
+            return
+        count = BlacklistedToken.objects.count()
+        # Leave room to grow, so inserts do not force a rebuild right away.
+        self._filter = BloomFilter(max(self.capacity, 2 * count), self.error_rate)
+        self._last_id = 0
+        self._add_rows(BlacklistedToken.objects.all())
+        self._loaded_at = self._synced_at = now
+
+    def _add_rows(self, queryset):
+        for pk, jti in queryset.order_by('pk').values_list('pk', 'token__jti').iterator(chunk_size=5000):
+            self._filter.add(jti)
+            self._last_id = max(self._last_id, pk)
+
+    def add(self, jti):
+        """Record a token this process just blacklisted."""
+        with self._lock:
+            if self._filter is not None:
+                self._filter.add(jti)
+
+    def invalidate(self):
+        """Rebuild on next use, e.g. after pruning."""
+        with self._lock:
+            self._filter = None
+
+    def is_blacklisted(self, jti):
+        with self._lock:
+            self._ensure_loaded()
+            maybe = jti in self._filter
+            if not maybe:
+                self.skipped += 1
+                return False
+            self.checked += 1
+        blacklisted = BlacklistedToken.objects.filter(token__jti=jti).exists()
+        if not blacklisted:
+            with self._lock:
+                self.false_positives += 1
+        return blacklisted
+
+    def stats(self):
+        with self._lock:
+            lookups = self.skipped + self.checked
+            return {
+                'loaded': self._filter is not None,
+                'insertions': self._filter.count if self._filter is not None else None,
+                'capacity': self._filter.capacity if self._filter is not None else self.capacity,
+                'bits': self._filter.size if self._filter is not None else None,
+                'hashes': self._filter.hashes if self._filter is not None else None,
+                'lookups': lookups,
+                'skipped': self.skipped,
+                'checked': self.checked,
+                'false_positives': self.false_positives,
+                'skip_rate': round(self.skipped / lookups, 4) if lookups else None,
+            }
+
+
+token_blacklist = TokenBlacklist()
@@ -0,0 +1,171 @@
+"""
+In-process cache of authenticated users.
+
+Every authenticated request used to load its user by primary key (JWT) or
+token key (``TokenAuthentication``) before the view ran, and views for
+doctors and patients then looked up the profile on top.  ``UserCache`` keeps
+a bounded LRU of user snapshots keyed by user id: the user's columns except
+the password hash, plus the ids of the linked doctor and patient profiles,
+all read in one query.  Requests build their ``request.user`` from the
+snapshot (the password is deferred and loaded only if something reads it)
+and views ask ``doctor_id_for``/``patient_id_for`` instead of querying.
+
+Every snapshot records the user's change counter (``user_version``) in the
+version counters shared by all processes (``core.conditional.versions``),
+and is reloaded once the counter moved.  ``post_save``/``post_delete`` of
+``User``, ``Doctor`` and ``Patient`` (see ``signals.py``) drop the local entry
+and bump the counter after commit, so a change made in one process is seen
+by the next request of every other.  ``QuerySet.update`` sends no signals;
+entries also expire after ``USER_CACHE_TTL`` seconds, which bounds how long
+such writes go unseen.  ``USER_CACHE_SIZE`` bounds the entries.
+
+Snapshots are for reading: views that change a user load the row first, so
+a stale snapshot never writes its columns back.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from time import monotonic
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+
+User = get_user_model()
+
+# Every concrete column but the password hash, which stays out of memory.
+USER_FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname != 'password']
+
+UserSnapshot = namedtuple('UserSnapshot', 'values doctor_id patient_id')
+
+
+def user_version(user_id):
+    return f'user:{user_id}'
+
+
+def _versions():
+    # Imported late: core.conditional imports DRF, whose settings import the authentication using this module.
+    from core.conditional import versions
+    return versions
+
+
+class LRUCache:
+    """A bounded, thread-safe LRU mapping whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, size, ttl):
+        self.size = size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> (stored at, version, value), least recently used first
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key, load, version=None):
+        """
+        The cached value of ``key`` if it was stored with ``version``, or
+        ``load()``'s result, which is cached unless None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and monotonic() - entry[0] < self.ttl and entry[1] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2]
+            self.misses += 1
+        value = load()
+        if value is not None:
+            with self._lock:
+                self._entries[key] = (monotonic(), version, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'size': self.size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / requests, 4) if requests else None,
+            }
+
+
+def load_snapshot(user_id):
+    row = User.objects.filter(pk=user_id).values_list(
+        *USER_FIELDS, 'doctor_profile__pk', 'patients_profile__pk'
+    ).first()
+    if row is None:
+        return None
+    return UserSnapshot(row[:len(USER_FIELDS)], row[-2], row[-1])
+
+
+def snapshot_user(snapshot):
+    """A ``User`` built from a snapshot, as if loaded with ``defer('password')``."""
+    return User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, snapshot.values)
+
+
+class UserCache:
+    def __init__(self, size=None, ttl=None):
+        self.users = LRUCache(
+            size or getattr(settings, 'USER_CACHE_SIZE', 10000), ttl or getattr(settings, 'USER_CACHE_TTL', 60)
+        )
+        # Token keys resolved by TokenAuthentication -> user id.
+        self.tokens = LRUCache(self.users.size, self.users.ttl)
+
+    def snapshot(self, user_id):
+        # Read before loading: a change committed meanwhile moves the counter again.
+        version, = _versions().get(user_version(user_id))
+        return self.users.get(str(user_id), lambda: load_snapshot(user_id), version)
+
+    def get_user(self, user_id):
+        """A fresh ``User`` instance for ``user_id``, or None if there is no such user."""
+        snapshot = self.snapshot(user_id)
+        return snapshot_user(snapshot) if snapshot is not None else None
+
+    def token_user_id(self, key, load):
+        return self.tokens.get(key, load)
+
+    def invalidate(self, user_id):
+        self.users.invalidate(str(user_id))
+
+    def changed(self, user_id):
+        """Invalidate the user's snapshots in every process; call after the change committed."""
+        self.invalidate(user_id)
+        _versions().bump(user_version(user_id))
+
+    def invalidate_token(self, key):
+        self.tokens.invalidate(key)
+
+    def clear(self):
+        self.users.clear()
+        self.tokens.clear()
+
+    def stats(self):
+        return {'users': self.users.stats(), 'tokens': self.tokens.stats()}
+
+
+user_cache = UserCache()
+
+
+def doctor_id_for(user):
+    """The id of ``user``'s doctor profile, or None."""
+    snapshot = user_cache.snapshot(user.pk)
+    return snapshot.doctor_id if snapshot is not None else None
+
+
+def patient_id_for(user):
+    """The id of ``user``'s patient profile, or None."""
+    snapshot = user_cache.snapshot(user.pk)
+    return snapshot.patient_id if snapshot is not None else None
@@ -0,0 +1,87 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, identify_hasher, make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+BENCH_EMAIL = 'login@bench-login.local'
+PASSWORD = 'correct horse battery staple'
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure logins per second on one core: password checks per hasher, full logins through "
+        "the login endpoint, logins rejected by the throttles, and the rehash of an old hash on "
+        "login. Runs inside a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checks', type=int, default=5, help='Password checks per hasher.')
+        parser.add_argument('--logins', type=int, default=5, help='Logins through the endpoint.')
+        parser.add_argument('--rejections', type=int, default=1000, help='Throttled login attempts.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Preferred hasher: {get_hasher().algorithm}")
+        self.bench_hashers(options['checks'])
+        with transaction.atomic():
+            self.bench_endpoint(options['logins'], options['rejections'])
+            transaction.set_rollback(True)
+
+    def bench_hashers(self, checks):
+        for algorithm in settings.PASSWORD_HASHER_CLASSES:
+            try:
+                encoded = make_password(PASSWORD, hasher=algorithm)
+            except ValueError as error:  # The hasher's library is not installed
+                self.stdout.write(f"{algorithm:14} unavailable: {error}")
+                continue
+            hasher = get_hasher(algorithm)
+            began = time.perf_counter()
+            for _ in range(checks):
+                hasher.verify(PASSWORD, encoded)
+            seconds = (time.perf_counter() - began) / checks
+            self.stdout.write(f"{algorithm:14} {seconds * 1000:8.1f} ms per check, {1 / seconds:7.1f} checks/s")
+
+    def bench_endpoint(self, logins, rejections):
+        client = APIClient()
+        user = User.objects.create_user(BENCH_EMAIL, PASSWORD, role='patient')
+        credentials = {'email': BENCH_EMAIL, 'password': PASSWORD}
+
+        with override_settings(LOGIN_THROTTLE_IP_RATE=None, LOGIN_THROTTLE_EMAIL_RATE=None):
+            began = time.perf_counter()
+            for _ in range(logins):
+                response = client.post('/users/login/', credentials, format='json')
+                assert response.status_code == 200, response.content
+            seconds = (time.perf_counter() - began) / logins
+        self.stdout.write(f"login endpoint  {seconds * 1000:8.1f} ms per login, {1 / seconds:7.1f} logins/s")
+
+        with override_settings(LOGIN_THROTTLE_IP_RATE='1/day', LOGIN_THROTTLE_EMAIL_RATE=None):
+            address = f'198.51.100.{int(time.time()) % 250 + 1}'
+            client.post('/users/login/', credentials, format='json', REMOTE_ADDR=address)
+            began = time.perf_counter()
+            for _ in range(rejections):
+                response = client.post('/users/login/', credentials, format='json', REMOTE_ADDR=address)
+                assert response.status_code == 429, response.content
+            seconds = (time.perf_counter() - began) / rejections
+        self.stdout.write(f"throttled login {seconds * 1000:8.3f} ms per rejection, {1 / seconds:7.0f} rejections/s")
+
+        # The upgrade path: a password stored with another hasher is rehashed on login.
+        preferred = get_hasher().algorithm
+        for algorithm in settings.PASSWORD_HASHER_CLASSES:
+            if algorithm == preferred:
+                continue
+            try:
+                user.password = make_password(PASSWORD, hasher=algorithm)
+            except ValueError:
+                continue
+            user.save(update_fields=['password'])
+            with override_settings(LOGIN_THROTTLE_IP_RATE=None, LOGIN_THROTTLE_EMAIL_RATE=None):
+                client.post('/users/login/', credentials, format='json')
+            user.refresh_from_db(fields=['password'])
+            self.stdout.write(f"rehash on login {algorithm} -> {identify_hasher(user.password).algorithm}")
+            break
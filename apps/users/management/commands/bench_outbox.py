@@ -0,0 +1,118 @@
+import socketserver
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIClient
+
+from apps.users.models import OutboxEmail, PasswordReset
+from apps.users.outbox import OutboxWorker
+
+User = get_user_model()
+
+BENCH_EMAIL = 'reset@bench-outbox.local'
+SMTP_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib, answering every command after ``server.delay`` seconds."""
+
+    def reply(self, line):
+        time.sleep(self.server.delay)
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 bench ESMTP')
+        while line := self.rfile.readline():
+            command = line.decode(errors='replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.reply('250 bench')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.messages += 1
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, delay):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.delay = delay
+        self.connections = self.messages = 0
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare password-reset request latency with a synchronous send_mail against the outbox, "
+        "using a local SMTP server that answers each command after --smtp-delay milliseconds, "
+        "and time the worker draining the queued emails over one connection. Runs inside a "
+        "transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50)
+        parser.add_argument('--smtp-delay', type=float, default=20, help='Milliseconds per SMTP reply.')
+
+    def handle(self, *args, **options):
+        server = SMTPServer(options['smtp_delay'] / 1000)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        smtp = {
+            'EMAIL_BACKEND': SMTP_BACKEND, 'EMAIL_HOST': '127.0.0.1', 'EMAIL_PORT': server.server_address[1],
+            'EMAIL_USE_TLS': False, 'EMAIL_HOST_USER': '', 'EMAIL_HOST_PASSWORD': '', 'OUTBOX_EMAIL_BACKEND': None,
+        }
+        try:
+            with override_settings(**smtp), transaction.atomic():
+                self.run(server, options['requests'])
+                transaction.set_rollback(True)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def run(self, server, requests):
+        user = User.objects.create_user(BENCH_EMAIL, None, role='patient')
+
+        # Before: what the view did, generating the OTP and sending it inline.
+        began = time.perf_counter()
+        for _ in range(requests):
+            password_reset = PasswordReset(user=user)
+            password_reset.generate_otp()
+            send_mail('Password Reset OTP', f'Your OTP is {password_reset.otp}.', 'from@example.com', [user.email],
+                      fail_silently=False)
+        inline = (time.perf_counter() - began) / requests
+        inline_connections = server.connections
+        self.stdout.write(
+            f"inline send_mail: {inline * 1000:8.2f} ms per request, {inline_connections} SMTP connections"
+        )
+
+        # After: the view only queues the email.
+        client = APIClient()
+        began = time.perf_counter()
+        for _ in range(requests):
+            response = client.post('/users/password-reset/', {'email': BENCH_EMAIL}, format='json')
+            assert response.status_code == 200, response.content
+        queued = (time.perf_counter() - began) / requests
+        self.stdout.write(f"outbox request:   {queued * 1000:8.2f} ms per request ({inline / queued:.1f}x faster)")
+
+        began = time.perf_counter()
+        sent, retried, failed = OutboxWorker().drain()
+        drained = time.perf_counter() - began
+        pending = OutboxEmail.objects.filter(status='pending').count()
+        self.stdout.write(
+            f"worker drain:     {sent} sent ({retried} to retry, {failed} failed, {pending} pending) in "
+            f"{drained * 1000:.1f} ms, {drained / max(sent, 1) * 1000:.2f} ms per email over "
+            f"{server.connections - inline_connections} SMTP connection(s)"
+        )
@@ -0,0 +1,29 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from apps.users.photos import is_processed, process_profile_photo
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the renditions of profile photos uploaded before the photo pipeline, or whose "
+        "processing failed, and point the users at them. Runs in this process, one photo at a time."
+    )
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+        for user_id, name in User.objects.exclude(profile_photo='').exclude(profile_photo=None).values_list(
+            'pk', 'profile_photo'
+        ).iterator():
+            if is_processed(name):
+                continue
+            try:
+                process_profile_photo(user_id)
+            except Exception as error:
+                self.stderr.write(f"User {user_id} ({name}): {error}")
+                failed += 1
+            else:
+                processed += 1
+        self.stdout.write(f"Processed {processed} profile photos, {failed} failed.")
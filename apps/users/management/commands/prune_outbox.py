@@ -0,0 +1,37 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from apps.users.models import OutboxEmail
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sent and failed outbox messages older than --days in chunks, one transaction "
+        "each, so the outbox only holds recent history. Pending messages are never deleted."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=getattr(settings, 'OUTBOX_RETENTION_DAYS', 7))
+        parser.add_argument('--chunk-size', type=int, default=getattr(settings, 'OUTBOX_PRUNE_CHUNK_SIZE', 2000))
+        parser.add_argument('--dry-run', action='store_true', help='Count old messages without deleting them.')
+
+    def handle(self, *args, **options):
+        finished = OutboxEmail.objects.filter(
+            status__in=('sent', 'failed'), created_at__lt=timezone.now() - timedelta(days=options['days']),
+        )
+        if options['dry_run']:
+            self.stdout.write(f"Would delete {finished.count()} outbox messages.")
+            return
+
+        deleted = 0
+        while True:
+            ids = list(finished.order_by('pk').values_list('pk', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                deleted += OutboxEmail.objects.filter(pk__in=ids).delete()[0]
+        self.stdout.write(f"Deleted {deleted} outbox messages.")
@@ -0,0 +1,30 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.users.outbox import OutboxWorker
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued emails from the outbox in batches over one mail connection, retrying "
+        "failures with backoff. Polls for new messages until stopped, or drains once with --once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Send what is due and exit.')
+        parser.add_argument('--interval', type=float, default=getattr(settings, 'OUTBOX_POLL_INTERVAL', 5),
+                            help='Seconds between polls when the outbox is empty.')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--backend', default=None, help='Email backend to send with (dotted path).')
+
+    def handle(self, *args, **options):
+        worker = OutboxWorker(backend=options['backend'], batch_size=options['batch_size'])
+        while True:
+            sent, retried, failed = worker.drain()
+            if sent or retried or failed or options['once']:
+                self.stdout.write(f"Sent {sent} emails, {retried} to retry, {failed} failed for good.")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
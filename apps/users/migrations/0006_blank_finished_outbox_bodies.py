@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def blank_finished_bodies(apps, schema_editor):
+    # Bodies may hold one-time passwords; the worker now blanks them once a message is finished.
+    OutboxEmail = apps.get_model('users', 'OutboxEmail')
+    OutboxEmail.objects.filter(status__in=('sent', 'failed')).exclude(body='').update(body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0005_outboxemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(blank_finished_bodies, migrations.RunPython.noop),
+    ]
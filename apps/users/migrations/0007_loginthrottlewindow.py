@@ -0,0 +1,27 @@
+# Generated by Django 5.1.5 on 2026-10-18 14:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0006_blank_finished_outbox_bodies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoginThrottleWindow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=300)),
+                ('window', models.BigIntegerField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('expires_at', models.DateTimeField()),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='login_window_expiry_idx')],
+                'unique_together': {('key', 'window')},
+            },
+        ),
+    ]
@@ -90,4 +90,58 @@ class PasswordReset(models.Model):
 
     def is_expired(self):
         """Check if the OTP has expired."""
-        return timezone.now() > self.expires_at
\ No newline at end of file
+        return timezone.now() > self.expires_at
+
+class OutboxEmail(models.Model):
+    """
+    An email waiting to be sent by the outbox worker (see ``outbox.py``).
+    Written in the transaction of the request that produced it, so it is sent
+    only if that request's changes were committed.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # When the worker may (re)try; pushed forward while a worker holds the message
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claim = models.UUIDField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_status_due_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.status})"
+
+
+class LoginThrottleWindow(models.Model):
+    """
+    Login attempts of one throttle key in one fixed window, for the
+    ``database`` login throttle store (see ``throttling.py``).  Counted with a
+    conditional UPDATE, so concurrent attempts from any process never pass
+    the limit together.
+    """
+    key = models.CharField(max_length=300)
+    window = models.BigIntegerField()  # Start of the window // its length
+    count = models.PositiveIntegerField(default=0)
+    expires_at = models.DateTimeField()  # Once it no longer counts as the previous window either
+
+    class Meta:
+        unique_together = ('key', 'window')
+        indexes = [
+            models.Index(fields=['expires_at'], name='login_window_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.key} @ {self.window}: {self.count}"
@@ -0,0 +1,146 @@
+"""
+Transactional email outbox.
+
+Views do not talk to the mail server: ``enqueue`` writes an ``OutboxEmail``
+row in the request's transaction, so the request costs one INSERT however
+slow SMTP is, and a message is only ever sent for changes that committed.
+
+``OutboxWorker`` (run by ``manage.py send_outbox``) drains due messages in
+batches of ``OUTBOX_BATCH_SIZE`` over one connection from ``get_connection()``,
+kept open across batches while there is work, instead of one SMTP handshake
+per message.  A batch is claimed with a conditional UPDATE that also pushes
+``next_attempt_at`` ``OUTBOX_LEASE`` seconds ahead, so several workers never
+send the same message, and one that dies mid-batch only delays its messages.
+The lease is renewed once half of it has passed, and messages another
+worker has claimed since are skipped; ``EMAIL_TIMEOUT`` keeps one send well
+inside the lease.  A failed send closes the connection (the next message
+reconnects) and is retried after an exponential backoff from
+``OUTBOX_RETRY_BASE`` up to ``OUTBOX_RETRY_MAX`` seconds, with jitter, until
+``OUTBOX_MAX_ATTEMPTS``.
+
+Bodies can hold secrets such as one-time passwords, so a message's body is
+blanked once it is sent or has failed for good, and ``manage.py
+prune_outbox`` deletes finished messages after ``OUTBOX_RETENTION_DAYS``.
+
+``OUTBOX_EMAIL_BACKEND`` sets the backend the worker sends with, e.g. the
+locmem or file backend in development; ``EMAIL_BACKEND`` when unset.
+"""
+import random
+import uuid
+from datetime import timedelta
+from time import monotonic
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEmail
+
+
+def enqueue(subject, body, recipients, from_email=None):
+    """Queue an email; call inside the transaction whose changes it reports."""
+    return OutboxEmail.objects.create(
+        subject=subject, body=body, recipients=list(recipients), from_email=from_email or '',
+    )
+
+
+def backoff(attempts):
+    """Seconds before retrying a message that failed ``attempts`` times."""
+    base = getattr(settings, 'OUTBOX_RETRY_BASE', 30)
+    delay = min(base * 2 ** (attempts - 1), getattr(settings, 'OUTBOX_RETRY_MAX', 3600))
+    return delay * random.uniform(0.5, 1)  # Jitter, so failures do not retry in lockstep
+
+
+class OutboxWorker:
+    def __init__(self, backend=None, batch_size=None, lease=None, max_attempts=None):
+        self.connection = get_connection(backend or getattr(settings, 'OUTBOX_EMAIL_BACKEND', None))
+        self.batch_size = batch_size or getattr(settings, 'OUTBOX_BATCH_SIZE', 100)
+        self.lease = lease or getattr(settings, 'OUTBOX_LEASE', 300)
+        self.max_attempts = max_attempts or getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+        self._open = False
+
+    def claim(self):
+        now = timezone.now()
+        due = OutboxEmail.objects.filter(status='pending', next_attempt_at__lte=now)
+        ids = list(due.order_by('next_attempt_at').values_list('pk', flat=True)[:self.batch_size])
+        if not ids:
+            return []
+        claim = uuid.uuid4()
+        due.filter(pk__in=ids).update(claim=claim, next_attempt_at=now + timedelta(seconds=self.lease))
+        return list(OutboxEmail.objects.filter(pk__in=ids, claim=claim).order_by('next_attempt_at'))
+
+    def renew(self, messages):
+        """Extend the lease of claimed messages; returns the ids this worker still holds."""
+        ids = [message.pk for message in messages]
+        held = OutboxEmail.objects.filter(pk__in=ids, claim=messages[0].claim, status='pending')
+        held.update(next_attempt_at=timezone.now() + timedelta(seconds=self.lease))
+        return set(held.values_list('pk', flat=True))
+
+    def send(self, message):
+        """Send one message; returns the exception on failure."""
+        try:
+            if not self._open:
+                # Opened explicitly, the backend keeps the connection between send_messages calls.
+                self.connection.open()
+                self._open = True
+            EmailMessage(
+                message.subject, message.body, message.from_email or None, message.recipients,
+                connection=self.connection,
+            ).send()
+        except Exception as error:
+            self.close()
+            return error
+        return None
+
+    def close(self):
+        if self._open:
+            self._open = False
+            try:
+                self.connection.close()
+            except Exception:
+                pass  # The server may already have dropped it
+
+    def drain_batch(self):
+        """Send one claimed batch; returns ``(sent, retried, failed)``, or None when nothing is due."""
+        messages = self.claim()
+        if not messages:
+            return None
+        sent, retried, failed = [], 0, 0
+        leased_at = monotonic()
+        held = None  # Every claimed message, until the first renewal
+        for index, message in enumerate(messages):
+            if monotonic() - leased_at >= self.lease / 2:
+                held = self.renew(messages[index:])
+                leased_at = monotonic()
+            if held is not None and message.pk not in held:
+                continue  # The lease ran out and another worker claimed it
+            error = self.send(message)
+            if error is None:
+                sent.append(message.pk)
+                continue
+            message.attempts += 1
+            message.claim = None
+            message.last_error = f"{type(error).__name__}: {error}"
+            if message.attempts >= self.max_attempts:
+                message.status = 'failed'
+                message.body = ''
+                failed += 1
+            else:
+                message.next_attempt_at = timezone.now() + timedelta(seconds=backoff(message.attempts))
+                retried += 1
+            message.save(update_fields=['attempts', 'claim', 'last_error', 'status', 'next_attempt_at', 'body'])
+        OutboxEmail.objects.filter(pk__in=sent).update(
+            status='sent', sent_at=timezone.now(), attempts=F('attempts') + 1, claim=None, body='',
+        )
+        return len(sent), retried, failed
+
+    def drain(self):
+        """Send everything that is due, then close the connection; returns the totals."""
+        totals = [0, 0, 0]
+        try:
+            while (counts := self.drain_batch()) is not None:
+                totals = [total + count for total, count in zip(totals, counts)]
+        finally:
+            self.close()
+        return tuple(totals)
@@ -0,0 +1,199 @@
+"""
+Profile photo pipeline.
+
+Uploads used to be served exactly as sent: full size, in whatever format,
+with their EXIF metadata (camera, often GPS position).  After an upload
+commits, ``submit`` hands the user to a thread pool (``PROFILE_PHOTO_WORKERS``
+threads; Pillow releases the GIL while decoding and encoding) that:
+
+* decodes the image once (JPEGs via ``draft`` at the largest size needed),
+  applies its EXIF orientation and drops all metadata;
+* encodes a ``full`` rendition (at most ``FULL_SIZE`` px on the longer side)
+  and square ``RENDITIONS`` crops, each as WebP and JPEG;
+* stores them content-addressed, under ``profile_photos/<sha256 of the
+  upload>/``, so users uploading the same file share one set of files and
+  a known hash costs no image work at all;
+* points ``profile_photo`` at the ``full`` JPEG and deletes the upload.
+
+Serializers turn a processed photo's URL into the rendition the client asks
+for with ``?photo_size=`` (one of ``SIZES``, default
+``PROFILE_PHOTO_DEFAULT_SIZE``) and ``?photo_format=`` (``webp`` or ``jpeg``).
+Photos not processed yet keep their original URL.
+"""
+import hashlib
+import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+FULL = 'full'
+FULL_SIZE = 1024
+# Square crops, in pixels
+RENDITIONS = {
+    'small': 64,
+    'medium': 256,
+    'large': 512,
+}
+SIZES = (*RENDITIONS, FULL)
+# format -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+STORED_FORMAT = 'jpeg'  # Format of the rendition ``profile_photo`` points at
+
+photo_field = User._meta.get_field('profile_photo')
+UPLOAD_TO = photo_field.upload_to
+PROCESSED = re.compile(rf'^(?P<base>(?:.*/)?{re.escape(UPLOAD_TO)}[0-9a-f]{{64}}/){FULL}\.{STORED_FORMAT}$')
+
+
+def is_processed(name):
+    return bool(PROCESSED.match(name))
+
+
+def rendition_name(digest, size, format):
+    return f'{UPLOAD_TO}{digest}/{size}.{format}'
+
+
+def requested_rendition(request):
+    """``(size, format)`` asked for in the query string, falling back to the defaults."""
+    size = request.query_params.get('photo_size')
+    if size not in SIZES:
+        size = getattr(settings, 'PROFILE_PHOTO_DEFAULT_SIZE', 'medium')
+    format = request.query_params.get('photo_format')
+    if format not in FORMATS:
+        format = 'webp'
+    return size, format
+
+
+def sized_url(url, request=None):
+    """The URL of the rendition ``request`` asks for; unchanged without a request or for unprocessed photos."""
+    if not url or request is None:
+        return url
+    match = PROCESSED.match(url)
+    if match is None:
+        return url
+    size, format = requested_rendition(request)
+    return f'{match["base"]}{size}.{format}'
+
+
+def photo_url(photo, request=None):
+    """``sized_url`` of a ``profile_photo`` field value, or None when there is no photo."""
+    return sized_url(photo.url, request) if photo else None
+
+
+def _encode(image, format):
+    pillow_format, options = FORMATS[format]
+    if pillow_format == 'JPEG' and image.mode != 'RGB':
+        # JPEG has no alpha: flatten transparent images onto white.
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    output = BytesIO()
+    image.save(output, pillow_format, **options)  # No exif= or icc_profile=: metadata is dropped
+    return output.getvalue()
+
+
+def render(data):
+    """Every rendition of an uploaded image, as ``{(size, format): bytes}``."""
+    with Image.open(BytesIO(data)) as image:
+        image.draft('RGB', (FULL_SIZE, FULL_SIZE))  # JPEG only: decode at a reduced scale
+        image = ImageOps.exif_transpose(image)
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent else 'RGB')
+
+    pictures = {FULL: image.copy()}
+    pictures[FULL].thumbnail((FULL_SIZE, FULL_SIZE), Image.LANCZOS)
+    # Largest first, each crop resized from the full rendition rather than the upload.
+    for size, pixels in sorted(RENDITIONS.items(), key=lambda item: -item[1]):
+        pictures[size] = ImageOps.fit(pictures[FULL], (pixels, pixels), Image.LANCZOS)
+    return {(size, format): _encode(picture, format) for size, picture in pictures.items() for format in FORMATS}
+
+
+def process_profile_photo(user_id):
+    """Replace a user's uploaded photo with its renditions; returns the new name, or None if there was nothing to do."""
+    name = User.objects.filter(pk=user_id).values_list('profile_photo', flat=True).first()
+    if not name or is_processed(name):
+        return None
+    storage = photo_field.storage
+    with storage.open(name, 'rb') as upload:
+        data = upload.read()
+    digest = hashlib.sha256(data).hexdigest()
+    stored = rendition_name(digest, FULL, STORED_FORMAT)
+
+    if not storage.exists(stored):  # Otherwise someone uploaded this file before
+        renditions = render(data)
+        # The stored rendition goes last, so its presence means the set is complete.
+        for (size, format), content in sorted(renditions.items(), key=lambda item: item[0] == (FULL, STORED_FORMAT)):
+            target = rendition_name(digest, size, format)
+            if not storage.exists(target):
+                storage.save(target, ContentFile(content))
+
+    with transaction.atomic():
+        user = User.objects.select_for_update().filter(pk=user_id, profile_photo=name).first()
+        if user is None:
+            return None  # Replaced meanwhile; the processor runs again for the new upload
+        user.profile_photo = stored
+        user.save(update_fields=['profile_photo', 'updated_at'])
+        transaction.on_commit(lambda: storage.delete(name))
+    return stored
+
+
+class PhotoProcessor:
+    """
+    The pool processing uploads off the request thread, one task per user at
+    a time.  An upload submitted while its user's task runs marks the user
+    dirty, and the task runs again once it is done, for the newest upload.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers if workers is not None else getattr(settings, 'PROFILE_PHOTO_WORKERS', 2)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+        self._dirty = set()
+
+    def submit(self, user_id):
+        if self.workers <= 0:
+            return self._process(user_id)
+        with self._lock:
+            if user_id in self._pending:
+                self._dirty.add(user_id)
+                return None
+            self._pending.add(user_id)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='profile-photos')
+            return self._executor.submit(self._run, user_id)
+
+    def _process(self, user_id):
+        try:
+            return process_profile_photo(user_id)
+        except Exception:
+            # The upload stays in place and is served as it is.
+            logger.exception("Could not process the profile photo of user %s", user_id)
+
+    def _run(self, user_id):
+        try:
+            while True:
+                result = self._process(user_id)
+                with self._lock:
+                    if user_id not in self._dirty:
+                        self._pending.discard(user_id)
+                        return result
+                    self._dirty.discard(user_id)
+        finally:
+            connections.close_all()  # This thread's connections
+
+
+photo_processor = PhotoProcessor()
@@ -4,9 +4,21 @@ from .models import User,PasswordReset
 from django.contrib.auth import authenticate
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from .tokens import RefreshToken
+from .photos import photo_url
+
+
+class ProfilePhotoField(serializers.ImageField):
+    """Represents a processed profile photo by the rendition the request asks for (see ``photos.py``)."""
+
+    def to_representation(self, value):
+        return photo_url(value, self.context.get('request'))
 
 
 class UserDetailSerializer(serializers.ModelSerializer):
+    profile_photo = ProfilePhotoField(required=False, allow_null=True)
+
     class Meta:
         model = User
         fields = ['id', 'email', 'full_name', 'role', 'number', 'profile_photo']
@@ -49,6 +61,7 @@ class UserLoginSerializer(serializers.Serializer):
     
 class UserUpdateSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(required=True)
+    profile_photo = ProfilePhotoField(required=False, allow_null=True)
 
     class Meta:
         model = User
@@ -117,3 +130,8 @@ class PasswordResetConfirmSerializer(serializers.Serializer):
             raise serializers.ValidationError("OTP has expired.")
         return data
     
+
+
+class RefreshTokenSerializer(TokenRefreshSerializer):
+    """Refreshes through ``tokens.RefreshToken``, so rotation checks the blacklist via the Bloom filter."""
+    token_class = RefreshToken
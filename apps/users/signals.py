@@ -0,0 +1,51 @@
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from .blacklist import token_blacklist
+from .cache import user_cache
+from .photos import is_processed, photo_processor
+
+User = get_user_model()
+
+
+def _invalidate(user_id):
+    # Drop the entry now for this request, and after commit everywhere, so that
+    # a concurrent request that reloaded the old row in between does not keep it.
+    user_cache.invalidate(user_id)
+    transaction.on_commit(lambda: user_cache.changed(user_id))
+
+
+@receiver([post_save, post_delete], sender=User)
+def user_changed(sender, instance, **kwargs):
+    _invalidate(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def profile_photo_uploaded(sender, instance, **kwargs):
+    name = instance.profile_photo.name
+    if name and not is_processed(name):
+        transaction.on_commit(partial(photo_processor.submit, instance.pk))
+
+
+@receiver([post_save, post_delete], sender='doctors.Doctor')
+@receiver([post_save, post_delete], sender='patients.Patient')
+def profile_changed(sender, instance, **kwargs):
+    _invalidate(instance.user_id)
+
+
+@receiver(post_delete, sender='authtoken.Token')
+def token_deleted(sender, instance, **kwargs):
+    user_cache.invalidate_token(instance.key)
+    transaction.on_commit(lambda: user_cache.invalidate_token(instance.key))
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    # Adding before commit is safe: a rolled back row only costs a false positive.
+    if created:
+        token_blacklist.add(instance.token.jti)
@@ -1,3 +1,292 @@
-from django.test import TestCase
+import tempfile
+import uuid
+from io import BytesIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+
+from core.conditional import versions
+from . import photos
+from .cache import user_cache, user_version
+from .models import LoginThrottleWindow, OutboxEmail, User
+from .outbox import OutboxWorker, enqueue
+from .photos import FORMATS, SIZES, PhotoProcessor, process_profile_photo, rendition_name
+from . import throttling
+from .throttling import DatabaseWindows, windows
+from .tokens import RefreshToken
+
+LOCMEM_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+class FailingBackend(EmailBackend):
+    def send_messages(self, messages):
+        raise SMTPException("Connection unexpectedly closed")
+
+
+@override_settings(LOGIN_THROTTLE_IP_RATE='', LOGIN_THROTTLE_EMAIL_RATE='')
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        windows.clear()
+        self.addCleanup(windows.clear)
+        User.objects.create_user('patient@example.com', 'password', role='patient')
+        self.client = APIClient()
+
+    def login(self, email='patient@example.com', password='wrong', **headers):
+        return self.client.post(reverse('login'), {'email': email, 'password': password}, format='json', **headers)
+
+    @override_settings(LOGIN_THROTTLE_IP_RATE='3/min')
+    def test_attempts_per_address(self):
+        responses = [self.login(f'user{n}@example.com') for n in range(4)]
+        self.assertEqual([response.status_code for response in responses], [400, 400, 400, 429])
+        self.assertIn('Retry-After', responses[-1])
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 400)
+
+    @override_settings(LOGIN_THROTTLE_IP_RATE='3/min')
+    def test_forwarded_for_is_not_trusted_without_proxies(self):
+        codes = [self.login(HTTP_X_FORWARDED_FOR=f'10.0.1.{n}').status_code for n in range(4)]
+        self.assertEqual(codes, [400, 400, 400, 429])
+
+    @override_settings(LOGIN_THROTTLE_EMAIL_RATE='2/min')
+    def test_failed_logins_per_email(self):
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.1').status_code, 400)
+        self.assertEqual(self.login(REMOTE_ADDR='10.0.0.2').status_code, 400)
+        # Refused before the password is checked, even the right one.
+        self.assertEqual(self.login('Patient@Example.com', 'password', REMOTE_ADDR='10.0.0.3').status_code, 429)
+        self.assertEqual(self.login('other@example.com').status_code, 400)
+
+    @override_settings(LOGIN_THROTTLE_EMAIL_RATE='2/min')
+    def test_successful_logins_are_not_counted(self):
+        for _ in range(3):
+            self.assertEqual(self.login(password='password').status_code, 200)
+        self.assertEqual(self.login().status_code, 400)
+
+
+class DatabaseWindowsTests(TestCase):
+    def setUp(self):
+        self.windows = DatabaseWindows()
+        self.now = 6000.0  # The start of a one-minute window
+
+    def test_counts_up_to_the_limit(self):
+        self.assertEqual([self.windows.acquire('key', 60, self.now, 3) for _ in range(4)], [True] * 3 + [False])
+        self.assertEqual(self.windows.count('key', 60, self.now), (3, 0))
+        self.windows.release('key', 60, self.now)
+        self.assertTrue(self.windows.acquire('key', 60, self.now, 3))
+        self.assertTrue(self.windows.acquire('other', 60, self.now, 3))
+
+    def test_previous_window_counts_by_its_overlap(self):
+        for _ in range(4):
+            self.windows.acquire('key', 60, self.now, 4)
+        # A quarter into the next window, 3 of the previous 4 attempts still count.
+        later = self.now + 75
+        self.assertEqual([self.windows.acquire('key', 60, later, 4) for _ in range(2)], [True, False])
+        self.assertEqual(self.windows.count('key', 60, later), (1, 4))
+
+    def test_expired_rows_are_swept(self):
+        self.windows.acquire('key', 60, self.now, 3)
+        with mock.patch.object(DatabaseWindows, 'SWEEP_EVERY', 1):
+            self.windows.acquire('other', 60, self.now + 120, 3)
+        self.assertEqual(list(LoginThrottleWindow.objects.values_list('key', flat=True)), ['other'])
+
+    @override_settings(LOGIN_THROTTLE_EMAIL_RATE='2/min', LOGIN_THROTTLE_IP_RATE='')
+    def test_login_throttle(self):
+        User.objects.create_user('patient@example.com', 'password', role='patient')
+        client = APIClient()
+        with mock.patch.object(throttling, 'windows', self.windows):
+            codes = [
+                client.post(reverse('login'), {'email': 'patient@example.com', 'password': password}).status_code
+                for password in ('password', 'wrong', 'wrong', 'password')
+            ]
+        self.assertEqual(codes, [200, 400, 400, 429])
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.user = User.objects.create_user('patient@example.com', 'password', role='patient', full_name='Patient')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+
+    def details(self, **headers):
+        return self.client.get(reverse('details'), **headers)
+
+    def write_elsewhere(self, **values):
+        """A write of another process, without this process's signals."""
+        User.objects.filter(pk=self.user.pk).update(updated_at=timezone.now(), **values)
+
+    def test_update_keeps_columns_changed_since_the_snapshot(self):
+        self.assertEqual(self.details().status_code, 200)
+        self.write_elsewhere(is_active=False, profile_photo='profile_photos/photo.png')
+        response = self.client.put(reverse('user-update'), {'full_name': 'New Name'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(
+            (self.user.full_name, self.user.is_active, self.user.profile_photo.name),
+            ('New Name', False, 'profile_photos/photo.png'),
+        )
+
+    def test_password_change_keeps_columns_changed_since_the_snapshot(self):
+        self.details()
+        self.write_elsewhere(full_name='Changed Elsewhere')
+        response = self.client.put(reverse('change-password'), {
+            'old_password': 'password', 'new_password': 'new-password', 'confirm_password': 'new-password',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.full_name, 'Changed Elsewhere')
+        self.assertTrue(self.user.check_password('new-password'))
+
+    def test_change_committed_in_another_process_is_seen(self):
+        etag = self.details()['ETag']
+        self.write_elsewhere(full_name='Changed Elsewhere')
+        self.assertEqual(self.details(HTTP_IF_NONE_MATCH=etag).status_code, 304)  # Still the snapshot
+
+        versions.bump(user_version(self.user.pk))  # What the other process's signal does after commit
+        response = self.details(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['full_name'], 'Changed Elsewhere')
+
+    def test_save_bumps_the_shared_version(self):
+        before, = versions.get(user_version(self.user.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertNotEqual(versions.get(user_version(self.user.pk)), [before])
+
+
+class OutboxTests(TestCase):
+    def setUp(self):
+        self.message = enqueue('Your code', 'OTP 123456', ['patient@example.com'])
+
+    def reload(self):
+        return OutboxEmail.objects.get(pk=self.message.pk)
+
+    def test_drain_sends_and_blanks_the_body(self):
+        self.assertEqual(OutboxWorker(LOCMEM_BACKEND).drain(), (1, 0, 0))
+        self.assertEqual([(sent.subject, sent.body, sent.to) for sent in mail.outbox],
+                         [('Your code', 'OTP 123456', ['patient@example.com'])])
+        message = self.reload()
+        self.assertEqual((message.status, message.attempts, message.body, message.claim), ('sent', 1, '', None))
+        self.assertEqual(OutboxWorker(LOCMEM_BACKEND).drain(), (0, 0, 0))
+
+    def test_claimed_messages_wait_for_the_lease(self):
+        first, second = OutboxWorker(LOCMEM_BACKEND), OutboxWorker(LOCMEM_BACKEND)
+        self.assertEqual([message.pk for message in first.claim()], [self.message.pk])
+        self.assertEqual(second.claim(), [])
+        # The first worker died; once its lease ran out the message is due again.
+        OutboxEmail.objects.filter(pk=self.message.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual([message.pk for message in second.claim()], [self.message.pk])
+
+    def test_renewal_skips_messages_claimed_by_another_worker(self):
+        worker = OutboxWorker(LOCMEM_BACKEND)
+        messages = worker.claim()
+        self.assertEqual(worker.renew(messages), {self.message.pk})
+        OutboxEmail.objects.filter(pk=self.message.pk).update(claim=uuid.uuid4())
+        self.assertEqual(worker.renew(messages), set())
+
+    def test_failed_send_is_retried_later(self):
+        started = timezone.now()
+        self.assertEqual(OutboxWorker('apps.users.tests.FailingBackend').drain(), (0, 1, 0))
+        message = self.reload()
+        self.assertEqual((message.status, message.attempts, message.claim), ('pending', 1, None))
+        self.assertEqual(message.body, 'OTP 123456')
+        self.assertIn('SMTPException', message.last_error)
+        self.assertGreater(message.next_attempt_at, started)
+
+        OutboxEmail.objects.filter(pk=self.message.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(OutboxWorker(LOCMEM_BACKEND).drain(), (1, 0, 0))
+        self.assertEqual(self.reload().attempts, 2)
+
+    def test_message_fails_after_max_attempts(self):
+        self.assertEqual(OutboxWorker('apps.users.tests.FailingBackend', max_attempts=1).drain(), (0, 0, 1))
+        message = self.reload()
+        self.assertEqual((message.status, message.body), ('failed', ''))
+
+
+def png(color):
+    output = BytesIO()
+    Image.new('RGB', (300, 200), color).save(output, 'PNG')
+    return output.getvalue()
+
+
+class ProfilePhotoTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings = override_settings(MEDIA_ROOT=media.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.storage = photos.photo_field.storage
+
+    def upload(self, email, data):
+        user = User.objects.create_user(email, 'password', role='patient')
+        user.profile_photo.save('photo.png', ContentFile(data))
+        return user
+
+    def process(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return process_profile_photo(user.pk)
+
+    def test_renditions_replace_the_upload(self):
+        user = self.upload('first@example.com', png('red'))
+        upload = user.profile_photo.name
+        stored = self.process(user)
+        user.refresh_from_db()
+        self.assertEqual(user.profile_photo.name, stored)
+        self.assertTrue(photos.is_processed(stored))
+        self.assertFalse(self.storage.exists(upload))
+        digest = stored.split('/')[-2]
+        for size in SIZES:
+            for format in FORMATS:
+                self.assertTrue(self.storage.exists(rendition_name(digest, size, format)))
+        with Image.open(self.storage.open(stored)) as image:
+            self.assertEqual(image.size, (300, 200))
+        self.assertIsNone(self.process(user))
+
+    def test_same_upload_is_rendered_once(self):
+        first = self.upload('first@example.com', png('red'))
+        second = self.upload('second@example.com', png('red'))
+        other = self.upload('other@example.com', png('blue'))
+        with mock.patch.object(photos, 'render', wraps=photos.render) as render:
+            stored = self.process(first)
+            self.assertEqual(self.process(second), stored)
+            self.assertNotEqual(self.process(other), stored)
+        self.assertEqual(render.call_count, 2)
+
+    def test_replaced_upload_is_left_alone(self):
+        user = self.upload('first@example.com', png('red'))
+        name = user.profile_photo.name
+
+        def render(data):
+            User.objects.filter(pk=user.pk).update(profile_photo='profile_photos/newer.png')
+            return {}
+
+        with mock.patch.object(photos, 'render', side_effect=render):
+            self.assertIsNone(self.process(user))
+        user.refresh_from_db()
+        self.assertEqual(user.profile_photo.name, 'profile_photos/newer.png')
+        self.assertTrue(self.storage.exists(name))
+
+    def test_upload_during_processing_is_processed_after(self):
+        processor = PhotoProcessor(workers=1)
+        calls, resubmitted = [], []
+
+        def process(user_id):
+            calls.append(user_id)
+            if len(calls) == 1:
+                resubmitted.append(processor.submit(user_id))  # Marks the running user dirty
+            return f'run {len(calls)}'
+
+        with mock.patch.object(photos, 'process_profile_photo', side_effect=process):
+            self.assertEqual(processor.submit('user').result(), 'run 2')
+            self.assertEqual(processor.submit('user').result(), 'run 3')
+        processor._executor.shutdown()
+        self.assertEqual(resubmitted, [None])
+        self.assertEqual(calls, ['user'] * 3)
@@ -0,0 +1,289 @@
+"""
+Brute-force throttling of logins.
+
+Checking a password is deliberately slow, so a credential-stuffing burst
+would keep every worker hashing.  The throttles here run in DRF's
+``initial()``, before the login serializer calls ``authenticate()``, and turn
+abusive requests away with a 429 without hashing anything:
+
+* ``LoginIPThrottle`` counts every login attempt per client address
+  (``LOGIN_THROTTLE_IP_RATE``), taken from ``REMOTE_ADDR`` unless
+  ``NUM_PROXIES`` says how many trusted proxies append to
+  ``X-Forwarded-For``, so clients cannot pick their own address;
+* ``LoginEmailThrottle`` counts failed logins per email
+  (``LOGIN_THROTTLE_EMAIL_RATE``), so one account cannot be guessed at from
+  many addresses.  Every attempt is counted before hashing, so parallel
+  requests cannot all pass the check, and the view gives a successful one
+  back through ``record_login_success``.
+
+Counts are sliding-window counters: the current and the previous fixed
+window of each key, the previous one weighted by how much of it still
+overlaps the sliding window.  That is two integers per key instead of a
+timestamp per request.  Checking and counting an attempt is one step
+(``acquire``), which must be atomic, or parallel attempts all pass the check.
+``LOGIN_THROTTLE_STORE`` picks where the counters live:
+
+* ``'memory'``   - this process, under a lock;
+* ``'database'`` - ``LoginThrottleWindow`` rows shared by all processes,
+  counted with a conditional UPDATE;
+* an alias in ``CACHES`` - shared too, but only atomic on caches whose
+  ``incr`` is (Memcached, Redis); the file, database and local memory caches
+  read and write back, and lose counts under concurrency.
+"""
+import threading
+import time
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from rest_framework.throttling import BaseThrottle
+
+from .models import LoginThrottleWindow
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+KEY_PREFIX = 'login-throttle'
+
+
+def estimate(current, previous, period, now):
+    """Attempts in the sliding window ending at ``now``."""
+    return current + previous * (1 - (now % period) / period)
+
+
+def parse_rate(rate):
+    """``'5/min'`` -> ``(5, 60)``, in DRF's rate format; None means no limit."""
+    if not rate:
+        return None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+class MemoryWindows:
+    """Sliding-window counters held in this process."""
+
+    SWEEP_EVERY = 4096  # Hits between sweeps of keys idle for two windows
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows = {}  # key -> (period, window index, current count, previous count)
+        self._hits = 0
+
+    def _counts(self, key, period, now):
+        window = int(now // period)
+        entry = self._windows.get(key)
+        if entry is None or entry[1] < window - 1:
+            return window, 0, 0
+        if entry[1] == window - 1:
+            return window, 0, entry[2]
+        return window, entry[2], entry[3]
+
+    def count(self, key, period, now):
+        with self._lock:
+            _, current, previous = self._counts(key, period, now)
+        return current, previous
+
+    def acquire(self, key, period, now, limit):
+        """Count an attempt unless the sliding count already reached ``limit``; returns whether it was counted."""
+        with self._lock:
+            window, current, previous = self._counts(key, period, now)
+            if estimate(current, previous, period, now) >= limit:
+                return False
+            self._windows[key] = (period, window, current + 1, previous)
+            self._hits += 1
+            if self._hits % self.SWEEP_EVERY == 0:
+                self._windows = {
+                    key: entry for key, entry in self._windows.items() if entry[1] >= int(now // entry[0]) - 1
+                }
+            return True
+
+    def release(self, key, period, now):
+        """Take back an attempt counted at ``now``."""
+        with self._lock:
+            entry = self._windows.get(key)
+            window = int(now // period)
+            if entry is None or entry[1] not in (window, window + 1):
+                return  # Already outside the sliding window
+            if entry[1] == window:
+                self._windows[key] = (period, window, max(entry[2] - 1, 0), entry[3])
+            else:
+                self._windows[key] = (period, entry[1], entry[2], max(entry[3] - 1, 0))
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+
+
+class DatabaseWindows:
+    """Sliding-window counters in ``LoginThrottleWindow`` rows, one per key and fixed window."""
+
+    SWEEP_EVERY = 4096  # Attempts between deletions of expired rows, per process
+
+    def __init__(self):
+        self._hits = 0
+
+    def _rows(self, key, window):
+        return LoginThrottleWindow.objects.filter(key=key, window=window)
+
+    def count(self, key, period, now):
+        window = int(now // period)
+        counts = dict(LoginThrottleWindow.objects.filter(
+            key=key, window__in=(window, window - 1)
+        ).values_list('window', 'count'))
+        return counts.get(window, 0), counts.get(window - 1, 0)
+
+    def acquire(self, key, period, now, limit):
+        """
+        Count an attempt unless the sliding count already reached ``limit``.
+        The previous window no longer grows, so the check is a bound on the
+        current count, applied by the UPDATE that increments it.
+        """
+        window = int(now // period)
+        previous = self._rows(key, window - 1).values_list('count', flat=True).first() or 0
+        # estimate(current, previous) < limit, solved for current
+        bound = limit - previous * (1 - (now % period) / period)
+        self._sweep(now)
+        rows = self._rows(key, window)
+        if rows.filter(count__lt=bound).update(count=F('count') + 1):
+            return True
+        if bound <= 0 or rows.exists():
+            return False
+        try:
+            with transaction.atomic():
+                LoginThrottleWindow.objects.create(
+                    key=key, window=window, count=1,
+                    expires_at=datetime.fromtimestamp((window + 2) * period, timezone.utc),
+                )
+            return True
+        except IntegrityError:
+            # Another attempt created the row first; count against it instead.
+            return bool(rows.filter(count__lt=bound).update(count=F('count') + 1))
+
+    def release(self, key, period, now):
+        """Take back an attempt counted at ``now``."""
+        self._rows(key, int(now // period)).filter(count__gt=0).update(count=F('count') - 1)
+
+    def _sweep(self, now):
+        self._hits += 1
+        if self._hits % self.SWEEP_EVERY == 0:
+            LoginThrottleWindow.objects.filter(expires_at__lte=datetime.fromtimestamp(now, timezone.utc)).delete()
+
+
+class CacheWindows:
+    """
+    Sliding-window counters in a Django cache, one key per fixed window.
+    Needs a cache with an atomic ``incr``, such as Memcached or Redis.
+    """
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def count(self, key, period, now):
+        window = int(now // period)
+        found = self.cache.get_many([f'{KEY_PREFIX}:{key}:{window}', f'{KEY_PREFIX}:{key}:{window - 1}'])
+        return found.get(f'{KEY_PREFIX}:{key}:{window}', 0), found.get(f'{KEY_PREFIX}:{key}:{window - 1}', 0)
+
+    def acquire(self, key, period, now, limit):
+        """
+        Count an attempt unless the sliding count already reached ``limit``.
+        The increment comes first, so with an atomic ``incr`` concurrent
+        attempts each see the others; one that went over the limit is taken back.
+        """
+        window = int(now // period)
+        cache_key = f'{KEY_PREFIX}:{key}:{window}'
+        # Kept through the next window, where it is the previous count.
+        self.cache.add(cache_key, 0, 2 * period)
+        try:
+            current = self.cache.incr(cache_key)
+        except ValueError:  # Expired between add and incr
+            self.cache.set(cache_key, 1, 2 * period)
+            current = 1
+        previous = self.cache.get(f'{KEY_PREFIX}:{key}:{window - 1}', 0)
+        if estimate(current - 1, previous, period, now) >= limit:
+            self.release(key, period, now)
+            return False
+        return True
+
+    def release(self, key, period, now):
+        """Take back an attempt counted at ``now``."""
+        try:
+            self.cache.decr(f'{KEY_PREFIX}:{key}:{int(now // period)}')
+        except ValueError:  # Expired meanwhile
+            pass
+
+
+def _store():
+    alias = getattr(settings, 'LOGIN_THROTTLE_STORE', 'memory')
+    if alias == 'memory':
+        return MemoryWindows()
+    if alias == 'database':
+        return DatabaseWindows()
+    return CacheWindows(alias)
+
+
+windows = _store()
+
+
+class LoginThrottle(BaseThrottle):
+    rate_setting = None
+    default_rate = None
+    # Whether a successful login takes its attempt back, so only failures count.
+    counts_failures_only = False
+
+    def __init__(self):
+        self.rate = parse_rate(getattr(settings, self.rate_setting, self.default_rate))
+        self.retry_after = None
+
+    def get_key(self, request):
+        raise NotImplementedError
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_key(request)
+        if key is None:
+            return True
+        limit, period = self.rate
+        now = time.time()
+        if not windows.acquire(f'{key}:{period}', period, now, limit):
+            # By the end of the current fixed window the count has started to decay.
+            self.retry_after = period - now % period
+            return False
+        if self.counts_failures_only:
+            # Remembered for record_login_success.
+            request.login_attempts = getattr(request, 'login_attempts', []) + [(f'{key}:{period}', period, now)]
+        return True
+
+    def wait(self):
+        return self.retry_after
+
+
+class LoginIPThrottle(LoginThrottle):
+    rate_setting = 'LOGIN_THROTTLE_IP_RATE'
+    default_rate = '20/min'
+
+    def get_key(self, request):
+        # DRF's get_ident only trusts X-Forwarded-For as far as NUM_PROXIES allows.
+        return f'ip:{self.get_ident(request)}'
+
+
+class LoginEmailThrottle(LoginThrottle):
+    rate_setting = 'LOGIN_THROTTLE_EMAIL_RATE'
+    default_rate = '5/min'
+    counts_failures_only = True
+
+    def get_key(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str) or not email:
+            return None
+        return f'email:{email.strip().lower()}'
+
+
+def record_login_success(request):
+    """Give back the attempts a successful login was counted for by throttles that count failures."""
+    for key, period, now in getattr(request, 'login_attempts', ()):
+        windows.release(key, period, now)
@@ -0,0 +1,14 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken as BaseRefreshToken
+
+from .blacklist import token_blacklist
+
+
+class RefreshToken(BaseRefreshToken):
+    """``RefreshToken`` whose blacklist check goes through the Bloom filter first."""
+
+    def check_blacklist(self):
+        if token_blacklist.is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
@@ -1,6 +1,7 @@
 # urls.py
 from django.urls import path
-from .views import UserRegistrationView,UserDetailView, UserLoginView, UserUpdateView, LogoutView, ChangePasswordView, PasswordResetRequestView, PasswordResetConfirmView
+from .views import UserRegistrationView,UserDetailView, UserLoginView, UserUpdateView, LogoutView, ChangePasswordView, PasswordResetRequestView, PasswordResetConfirmView, UserCacheStatsView, TokenBlacklistStatsView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 urlpatterns = [
     path('details/', UserDetailView.as_view(), name='details'),
@@ -11,4 +12,7 @@ urlpatterns = [
     path('password-reset/', PasswordResetRequestView.as_view(), name='password_reset_request'),
     path('password-reset/confirm/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'),
     path('logout/', LogoutView.as_view(), name='logout'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/blacklist/stats/', TokenBlacklistStatsView.as_view(), name='token-blacklist-stats'),
+    path('cache/stats/', UserCacheStatsView.as_view(), name='user-cache-stats'),
 ]
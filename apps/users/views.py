@@ -4,20 +4,33 @@ from rest_framework.response import Response
 from rest_framework import status
 from .serializers import UserRegistrationSerializer,UserDetailSerializer, UserLoginSerializer, UserUpdateSerializer, PasswordChangeSerializer,PasswordResetRequestSerializer, PasswordResetConfirmSerializer
 from .models import PasswordReset
-from django.core.mail import send_mail
+from django.db import transaction
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError
+from core.conditional import conditional
+from .cache import user_cache
+from .blacklist import token_blacklist
+from . import outbox
+from .photos import photo_url
+from .throttling import LoginEmailThrottle, LoginIPThrottle, record_login_success
+
+
+def user_token(request, *args, **kwargs):
+    # The authenticated user is already loaded, so this costs no query.
+    updated_at = request.user.updated_at.timestamp()
+    return (str(request.user.pk), updated_at), updated_at
 
 
 class UserDetailView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @conditional('user-details', user_token, private=True)
     def get(self, request, *args, **kwargs):
         user = request.user  # The logged-in user
-        serializer = UserDetailSerializer(user)
+        serializer = UserDetailSerializer(user, context={'request': request})
         return Response(serializer.data)
     
 class UserRegistrationView(APIView):
@@ -41,10 +54,14 @@ class UserRegistrationView(APIView):
 
 
 class UserLoginView(APIView):
+    # Checked before the serializer hashes anything.
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
+
     def post(self, request, *args, **kwargs):
         serializer = UserLoginSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.validated_data['user']
+            record_login_success(request)  # Only failures count against the email
 
             # Generate JWT token
             refresh = RefreshToken.for_user(user)
@@ -57,7 +74,7 @@ class UserLoginView(APIView):
                 'full_name': user.full_name,
                 'role': user.role,
                 'number': user.number,
-                'profile_photo': user.profile_photo.url if user.profile_photo else None,  # Include profile photo URL if available
+                'profile_photo': photo_url(user.profile_photo, request),  # The requested rendition, if there is a photo
             }
 
             return Response({
@@ -78,8 +95,9 @@ class UserUpdateView(APIView):
     permission_classes = [IsAuthenticated]
 
     def put(self, request, *args, **kwargs):
-        user = request.user  # The user making the request
-        serializer = UserUpdateSerializer(user, data=request.data, partial=True)
+        # The row itself: request.user may be a cached snapshot, whose columns a save would write back.
+        user = get_user_model().objects.get(pk=request.user.pk)
+        serializer = UserUpdateSerializer(user, data=request.data, partial=True, context={'request': request})
 
         if serializer.is_valid():
             serializer.save()
@@ -98,12 +116,12 @@ class ChangePasswordView(APIView):
         serializer = PasswordChangeSerializer(data=request.data, context={'request': request})
         
         if serializer.is_valid():
-            user = request.user
+            user = get_user_model().objects.get(pk=request.user.pk)  # Not the cached snapshot; see UserUpdateView
             new_password = serializer.validated_data['new_password']
             
             # Set the new password
             user.set_password(new_password)
-            user.save()
+            user.save(update_fields=['password', 'updated_at'])
 
             return Response({"message": "Password changed successfully."}, status=status.HTTP_200_OK)
 
@@ -116,15 +134,16 @@ class PasswordResetRequestView(APIView):
         if serializer.is_valid():
             email = serializer.validated_data['email']
             user = get_user_model().objects.get(email=email)
-            password_reset = PasswordReset(user=user)
-            password_reset.generate_otp()
-            send_mail(
-                'Password Reset OTP',
-                f'Your OTP is {password_reset.otp}. It expires in 5 minutes.',
-                'from@example.com',
-                [user.email],
-                fail_silently=False,
-            )
+            # The OTP and its email commit together; the outbox worker sends it.
+            with transaction.atomic():
+                password_reset = PasswordReset(user=user)
+                password_reset.generate_otp()
+                outbox.enqueue(
+                    'Password Reset OTP',
+                    f'Your OTP is {password_reset.otp}. It expires in 5 minutes.',
+                    [user.email],
+                    from_email='from@example.com',
+                )
             return Response({"message": "OTP sent to your email."}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -168,4 +187,23 @@ class LogoutView(APIView):
         except Exception as e:
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         
-        
\ No newline at end of file
+        
+
+class UserCacheStatsView(APIView):
+    """Hit rates of this process's authenticated-user cache. Admins only."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view user cache statistics."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(user_cache.stats(), status=status.HTTP_200_OK)
+
+
+class TokenBlacklistStatsView(APIView):
+    """How often refresh-token blacklist checks were answered by the Bloom filter. Admins only."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view token blacklist statistics."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(token_blacklist.stats(), status=status.HTTP_200_OK)
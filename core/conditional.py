@@ -0,0 +1,181 @@
+"""
+Conditional GET for endpoints that clients poll.
+
+A view's ``get`` decorated with ``conditional`` first computes a cheap version
+token for the resource (a few cache reads, or fields of an already loaded
+object), answers ``If-None-Match``/``If-Modified-Since`` with 304 when it
+matches, and only otherwise runs the handler and its serializers.  Full
+responses carry ``ETag``, ``Last-Modified`` and ``Cache-Control: no-cache`` so
+clients revalidate every time instead of guessing a freshness lifetime.
+
+Resources without an ``updated_at`` use change counters kept in the Django
+cache (``CONDITIONAL_CACHE``): each key holds the ``time_ns()`` of its last
+change, bumped by model signals after commit.  A missing or expired key is
+recreated with the current time, which only costs clients one full response.
+The default cache is shared by all worker processes (see ``CACHES``), so a
+bump is seen by every one of them; counters still expire after
+``CONDITIONAL_VERSION_TTL`` seconds, which bounds staleness should the
+cache be configured per process.
+"""
+import hashlib
+import threading
+import time
+from collections import defaultdict
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+KEY_PREFIX = 'conditional-version'
+
+
+class VersionCounters:
+    """Per-key change counters holding the time of the last change."""
+
+    def __init__(self, cache_alias=None, ttl=None):
+        self.cache_alias = cache_alias or getattr(settings, 'CONDITIONAL_CACHE', 'default')
+        self.ttl = ttl or getattr(settings, 'CONDITIONAL_VERSION_TTL', 3600)
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def get(self, *keys):
+        """Versions of the given keys, in the same order."""
+        cache_keys = [f'{KEY_PREFIX}:{key}' for key in keys]
+        found = self.cache.get_many(cache_keys)
+        missing = {key: time.time_ns() for key in cache_keys if key not in found}
+        if missing:
+            self.cache.set_many(missing, self.ttl)
+            found.update(missing)
+        return [found[key] for key in cache_keys]
+
+    def bump(self, *keys):
+        if keys:
+            now = time.time_ns()
+            self.cache.set_many({f'{KEY_PREFIX}:{key}': now for key in keys}, self.ttl)
+
+    def token(self, *keys):
+        """``(etag parts, last modified timestamp)`` for a resource built from ``keys``."""
+        versions = self.get(*keys)
+        return versions, max(versions) / 1e9
+
+
+class ConditionalStats:
+    """Per-process counters of full and 304 responses, per resource."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resources = defaultdict(lambda: {
+            'full': 0, 'not_modified': 0, 'full_bytes': 0, 'full_seconds': 0.0, 'not_modified_seconds': 0.0,
+        })
+
+    def record(self, resource, not_modified, seconds, size=0):
+        with self._lock:
+            counters = self._resources[resource]
+            if not_modified:
+                counters['not_modified'] += 1
+                counters['not_modified_seconds'] += seconds
+            else:
+                counters['full'] += 1
+                counters['full_seconds'] += seconds
+                counters['full_bytes'] += size
+
+    def stats(self):
+        """Hit rates, plus the bytes and handler time the 304s saved (from the averages of full responses)."""
+        with self._lock:
+            resources = {resource: dict(counters) for resource, counters in self._resources.items()}
+        report = {}
+        for resource, counters in resources.items():
+            full, not_modified = counters['full'], counters['not_modified']
+            average_bytes = counters['full_bytes'] / full if full else 0
+            average_ms = 1000 * counters['full_seconds'] / full if full else 0
+            average_304_ms = 1000 * counters['not_modified_seconds'] / not_modified if not_modified else 0
+            report[resource] = {
+                'requests': full + not_modified,
+                'not_modified': not_modified,
+                'hit_rate': round(not_modified / (full + not_modified), 4) if full + not_modified else None,
+                'average_full_ms': round(average_ms, 3),
+                'average_not_modified_ms': round(average_304_ms, 3),
+                'bytes_saved': round(not_modified * average_bytes),
+                'ms_saved': round(not_modified * max(average_ms - average_304_ms, 0), 1),
+            }
+        return report
+
+
+versions = VersionCounters()
+conditional_stats = ConditionalStats()
+
+
+def conditional(resource, token, private=False):
+    """
+    Decorate an ``APIView.get`` so it answers conditional requests.
+
+    ``token(request, *args, **kwargs)`` returns ``(parts, last_modified)``,
+    where ``parts`` changes whenever the response would and ``last_modified``
+    is a POSIX timestamp, or None to skip conditional handling.  ``private``
+    marks responses that depend on the authenticated user.
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(view, request, *args, **kwargs):
+            started = time.perf_counter()
+            found = token(request, *args, **kwargs)
+            if found is None:
+                return get(view, request, *args, **kwargs)
+            parts, last_modified = found
+            renderer = getattr(request, 'accepted_renderer', None)
+            digest = hashlib.md5(repr((resource, renderer and renderer.format, parts)).encode()).hexdigest()
+            etag = quote_etag(digest)
+
+            response = get_conditional_response(request, etag=etag, last_modified=int(last_modified))
+            if response is not None:
+                _tag(response, etag, last_modified, private)
+                conditional_stats.record(resource, True, time.perf_counter() - started)
+                return response
+
+            response = get(view, request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            _tag(response, etag, last_modified, private)
+            if hasattr(response, 'add_post_render_callback'):
+                response.add_post_render_callback(
+                    lambda rendered: conditional_stats.record(resource, False, time.perf_counter() - started, len(rendered.content))
+                )
+            else:
+                conditional_stats.record(resource, False, time.perf_counter() - started, len(response.content))
+            return response
+        return wrapper
+    return decorator
+
+
+def _tag(response, etag, last_modified, private):
+    response['ETag'] = etag
+    # HTTP dates have one-second precision: a change later in the same second
+    # would go unnoticed by If-Modified-Since, so recent versions rely on the ETag.
+    if time.time() - last_modified >= 1:
+        response['Last-Modified'] = http_date(int(last_modified))
+    if private:
+        patch_cache_control(response, no_cache=True, private=True)
+        patch_vary_headers(response, ('Authorization',))
+    else:
+        patch_cache_control(response, no_cache=True)
+
+
+class ConditionalStatsView(APIView):
+    """
+    How often polled endpoints answered 304 in this process, and the bytes
+    and handler time that saved. Admins only.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if request.user.role != 'admin':
+            return Response({"error": "Only admins can view conditional request statistics."}, status=status.HTTP_403_FORBIDDEN)
+        return Response(conditional_stats.stats(), status=status.HTTP_200_OK)
@@ -84,8 +84,8 @@ WSGI_APPLICATION = 'core.wsgi.application'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
-        'rest_framework.authentication.TokenAuthentication',
+        'apps.users.authentication.CachedJWTAuthentication',
+        'apps.users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PARSER_CLASSES': [
         # 'rest_framework.permissions.IsAuthenticated',
@@ -94,6 +94,8 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Trusted proxies appending to X-Forwarded-For; with 0, throttles key on REMOTE_ADDR.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
 }
 
 AUTH_USER_MODEL = 'users.User'
@@ -106,6 +108,7 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),     # Refresh token lifetime (1 day)
     'ROTATE_REFRESH_TOKENS': True,                    # Rotate refresh tokens on login
     'BLACKLIST_AFTER_ROTATION': True,                 # Blacklist refresh tokens after use
+    'TOKEN_REFRESH_SERIALIZER': 'apps.users.serializers.RefreshTokenSerializer',  # Bloom-filtered blacklist check
 }
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -117,6 +120,26 @@ DATABASES = {
     }
 }
 
+# Cache shared by every worker process, so that invalidations of the doctor
+# directory and the conditional GET counters reach all of them.  The database
+# cache lives in the CACHE_LOCATION table, created by `manage.py migrate`
+# (run `manage.py createcachetable` after switching to it); point
+# CACHE_BACKEND and CACHE_LOCATION at Memcached or Redis instead for atomic
+# increments and no cache writes on the database.  Entries: about four per
+# doctor (summary, dated details, ETag counter) and one per active user.
+# `manage.py test` swaps every alias for a local memory cache.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.db.DatabaseCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'django_cache'),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),  # Culled past this, a third at a time
+        },
+    }
+}
+
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -174,3 +197,101 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', 587))  # Default 587
 EMAIL_USE_TLS = os.getenv('EMAIL_USE_TLS', 'True') == 'True'
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 30))  # Seconds before a stalled SMTP call fails; well below OUTBOX_LEASE
+
+
+# Appointment booking (apps.appointments.availability, apps.appointments.booking)
+APPOINTMENT_INDEX_MAX_DAYS = int(os.getenv('APPOINTMENT_INDEX_MAX_DAYS', 10000))  # Cached (doctor, date) entries
+APPOINTMENT_INDEX_TTL = int(os.getenv('APPOINTMENT_INDEX_TTL', 300))  # Seconds before an entry is reloaded
+APPOINTMENT_BOOKING_LOCK_STRIPES = int(os.getenv('APPOINTMENT_BOOKING_LOCK_STRIPES', 256))  # In-process locks shared by (doctor, date) keys
+
+# Temporary slot holds (apps.appointments.holds)
+SLOT_HOLD_BACKEND = os.getenv('SLOT_HOLD_BACKEND', 'local')  # 'local' (per process) or 'sqlite' (shared by processes)
+SLOT_HOLD_SQLITE_PATH = os.getenv('SLOT_HOLD_SQLITE_PATH', BASE_DIR / 'slot_holds.sqlite3')
+SLOT_HOLD_TTL = int(os.getenv('SLOT_HOLD_TTL', 300))  # Default hold lifetime in seconds
+SLOT_HOLD_MAX_TTL = int(os.getenv('SLOT_HOLD_MAX_TTL', 900))
+
+# Calendar feeds (apps.appointments.authentication)
+CALENDAR_FEED_KEY_MAX_AGE = int(os.getenv('CALENDAR_FEED_KEY_MAX_AGE', 90 * 24 * 3600))  # Seconds a signed feed URL works
+
+# Waitlist (apps.appointments.waitlist)
+WAITLIST_MAX_WINDOW_DAYS = int(os.getenv('WAITLIST_MAX_WINDOW_DAYS', 31))  # Longest date window of one entry
+WAITLIST_OFFER_TTL = int(os.getenv('WAITLIST_OFFER_TTL', 900))  # Seconds an offered slot stays held
+WAITLIST_QUEUE_TTL = int(os.getenv('WAITLIST_QUEUE_TTL', 300))  # Seconds before a doctor's queue is rebuilt
+
+# Doctor unavailability calendar (apps.appointments.unavailability)
+DOCTOR_UNAVAILABILITY_HORIZON_DAYS = int(os.getenv('DOCTOR_UNAVAILABILITY_HORIZON_DAYS', 365))  # Days covered by each doctor's bitset
+DOCTOR_UNAVAILABILITY_TTL = int(os.getenv('DOCTOR_UNAVAILABILITY_TTL', 300))  # Seconds before a bitset is rebuilt
+
+# Schedule generation and templates (apps.doctors.scheduling)
+SCHEDULE_GENERATION_CHUNK_SIZE = int(os.getenv('SCHEDULE_GENERATION_CHUNK_SIZE', 5000))  # Rows written per transaction
+SCHEDULE_GENERATION_MAX_DOCTOR_DAYS = int(os.getenv('SCHEDULE_GENERATION_MAX_DOCTOR_DAYS', 10000))  # Rows one API request may write
+SCHEDULE_TEMPLATE_HORIZON_DAYS = int(os.getenv('SCHEDULE_TEMPLATE_HORIZON_DAYS', 28))  # Days of templates shown in doctor details
+
+# Doctor directory cache (apps.doctors.directory)
+DOCTOR_DIRECTORY_CACHE = os.getenv('DOCTOR_DIRECTORY_CACHE', 'default')  # Alias in CACHES
+DOCTOR_DIRECTORY_TTL = int(os.getenv('DOCTOR_DIRECTORY_TTL', 3600))  # Seconds before a document is rebuilt
+
+# Doctor search (apps.doctors.search)
+DOCTOR_SEARCH_BACKEND = os.getenv('DOCTOR_SEARCH_BACKEND', 'auto')  # 'auto', 'fts5' (SQLite) or 'memory'
+DOCTOR_SEARCH_TTL = int(os.getenv('DOCTOR_SEARCH_TTL', 300))  # Seconds before the in-memory index is rebuilt
+
+# Doctor facets (apps.doctors.facets)
+DOCTOR_FACETS_TTL = int(os.getenv('DOCTOR_FACETS_TTL', 300))  # Seconds before the facet bitsets are rebuilt
+
+# Conditional GET (core.conditional)
+CONDITIONAL_CACHE = os.getenv('CONDITIONAL_CACHE', 'default')  # Alias in CACHES holding the change counters
+CONDITIONAL_VERSION_TTL = int(os.getenv('CONDITIONAL_VERSION_TTL', 3600))  # Seconds before a counter is reset
+
+# Bulk doctor import (apps.doctors.importer)
+DOCTOR_IMPORT_CHUNK_SIZE = int(os.getenv('DOCTOR_IMPORT_CHUNK_SIZE', 1000))  # Rows validated and written per transaction
+DOCTOR_IMPORT_HASH_WORKERS = int(os.getenv('DOCTOR_IMPORT_HASH_WORKERS', os.cpu_count() or 1))  # Password hashing processes; 1 hashes in-process
+
+# Authenticated user cache (apps.users.cache)
+USER_CACHE_SIZE = int(os.getenv('USER_CACHE_SIZE', 10000))  # Users kept per process
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 60))  # Seconds before a user is reloaded
+
+# Refresh-token blacklist (apps.users.blacklist)
+TOKEN_BLACKLIST_BLOOM_CAPACITY = int(os.getenv('TOKEN_BLACKLIST_BLOOM_CAPACITY', 100000))  # Tokens the filter is sized for
+TOKEN_BLACKLIST_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_BLACKLIST_BLOOM_ERROR_RATE', 0.001))  # False positive rate at capacity
+TOKEN_BLACKLIST_SYNC_INTERVAL = float(os.getenv('TOKEN_BLACKLIST_SYNC_INTERVAL', 1))  # Seconds between reads of tokens blacklisted elsewhere
+TOKEN_BLACKLIST_BLOOM_TTL = int(os.getenv('TOKEN_BLACKLIST_BLOOM_TTL', 3600))  # Seconds before the filter is rebuilt
+TOKEN_PRUNE_CHUNK_SIZE = int(os.getenv('TOKEN_PRUNE_CHUNK_SIZE', 2000))  # Expired tokens deleted per transaction
+
+# Login throttling (apps.users.throttling)
+LOGIN_THROTTLE_STORE = os.getenv('LOGIN_THROTTLE_STORE', 'memory')  # 'memory' (per process), 'database' (shared) or a CACHES alias with an atomic incr (Memcached, Redis)
+LOGIN_THROTTLE_IP_RATE = os.getenv('LOGIN_THROTTLE_IP_RATE', '20/min')  # Login attempts per client address
+LOGIN_THROTTLE_EMAIL_RATE = os.getenv('LOGIN_THROTTLE_EMAIL_RATE', '5/min')  # Failed logins per email
+
+# Password hashing (django.contrib.auth.hashers)
+# New passwords are hashed with PASSWORD_HASHER; the other hashers still
+# verify existing hashes, and a successful login with one of them rehashes the
+# password with PASSWORD_HASHER, so switching needs no migration. 'argon2' and
+# 'bcrypt_sha256' need the argon2-cffi and bcrypt packages. Compare them with
+# `python manage.py bench_login` before switching.
+PASSWORD_HASHER_CLASSES = {
+    'pbkdf2_sha256': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'pbkdf2_sha1': 'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt_sha256': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2_sha256')  # Algorithm for new and upgraded hashes
+PASSWORD_HASHERS = [PASSWORD_HASHER_CLASSES[PASSWORD_HASHER]] + [
+    path for algorithm, path in PASSWORD_HASHER_CLASSES.items() if algorithm != PASSWORD_HASHER
+]
+
+# Email outbox (apps.users.outbox)
+OUTBOX_EMAIL_BACKEND = os.getenv('OUTBOX_EMAIL_BACKEND') or None  # Backend the worker sends with; EMAIL_BACKEND when unset
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 100))  # Messages claimed per batch
+OUTBOX_LEASE = int(os.getenv('OUTBOX_LEASE', 300))  # Seconds a claimed batch is held before other workers may retry it
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 8))  # Sends tried before a message is marked failed
+OUTBOX_RETRY_BASE = int(os.getenv('OUTBOX_RETRY_BASE', 30))  # Seconds before the first retry, doubled per attempt
+OUTBOX_RETRY_MAX = int(os.getenv('OUTBOX_RETRY_MAX', 3600))  # Longest wait between retries
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', 5))  # Seconds send_outbox sleeps when the outbox is empty
+OUTBOX_RETENTION_DAYS = int(os.getenv('OUTBOX_RETENTION_DAYS', 7))  # Days sent and failed messages are kept
+OUTBOX_PRUNE_CHUNK_SIZE = int(os.getenv('OUTBOX_PRUNE_CHUNK_SIZE', 2000))  # Messages deleted per transaction
+
+# Profile photo renditions (apps.users.photos)
+PROFILE_PHOTO_WORKERS = int(os.getenv('PROFILE_PHOTO_WORKERS', 2))  # Threads processing uploads; 0 processes them inline after commit
+PROFILE_PHOTO_DEFAULT_SIZE = os.getenv('PROFILE_PHOTO_DEFAULT_SIZE', 'medium')  # Rendition served without ?photo_size=
@@ -0,0 +1,26 @@
+"""
+Test runner keeping tests out of the shared cache.
+
+``CACHES`` points at a cache every worker process shares, and tests would
+otherwise read and write the server's entries, e.g. doctor directory id
+lists built from the test database.  Like Django's runner does for
+``EMAIL_BACKEND``, this one swaps every cache alias for a local memory cache
+while the tests run.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES={
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'tests-{alias}'}
+            for alias in settings.CACHES
+        })
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
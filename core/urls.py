@@ -16,11 +16,13 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.conditional import ConditionalStatsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path("users/", include("apps.users.urls")),
     path('doctors/', include('apps.doctors.urls')),
     path('patients/', include('apps.patients.urls')),
+    path('conditional/stats/', ConditionalStatsView.as_view(), name='conditional-stats'),
     path('', include('apps.appointments.urls')),
 ]